@@ -4,7 +4,7 @@ All sensitive credentials are loaded from environment variables (.env file)
 """
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import List
+from typing import List, Optional
 from pathlib import Path
 
 # Get the directory where this config file is located
@@ -26,6 +26,19 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     DB_POOL_SIZE: int = 10
     DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0  # Wait for a free pooled connection
+    DB_POOL_RECYCLE_SECONDS: int = 3600  # Recycle before MySQL's wait_timeout drops idle connections
+    DB_QUERY_TIMEOUT_SECONDS: float = 30.0  # Per-query limit for generated SQL (0 disables)
+    DB_HEALTH_CHECK_TIMEOUT_SECONDS: float = 5.0
+
+    # Optional read replica for generated analytics queries (unset: everything uses DATABASE_URL)
+    DATABASE_REPLICA_URL: Optional[str] = None
+    DB_REPLICA_POOL_SIZE: int = 10
+    DB_REPLICA_MAX_OVERFLOW: int = 20
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0  # Fall back to the primary above this lag
+    DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 2.0
+    DB_REPLICA_LAG_QUERY: Optional[str] = None  # Custom lag query (e.g. a heartbeat table) instead of SHOW REPLICA STATUS
+    DISCONNECT_POLL_INTERVAL_SECONDS: float = 0.5  # How often to check for a client disconnect
 
     # OpenAI - NO HARDCODED API KEY
     # Pydantic will automatically load from .env file
@@ -33,6 +46,35 @@ class Settings(BaseSettings):
     OPENAI_MODEL: str = "gpt-4o-mini"
     OPENAI_TEMPERATURE: float = 0.3
     OPENAI_MAX_TOKENS: int = 2000
+    # Optional base URL override (e.g., a proxy or a local stub server for benchmarks)
+    OPENAI_BASE_URL: Optional[str] = None
+
+    # Async OpenAI transport - shared connection pool and concurrency limits
+    OPENAI_MAX_CONCURRENCY: int = 32  # Max in-flight LLM calls per worker
+    OPENAI_MAX_CONNECTIONS: int = 64
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 32
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    OPENAI_MAX_RETRIES: int = 2
+
+    # Rate-limit scheduler (per-minute budgets; 0 disables a limit)
+    OPENAI_RPM_LIMIT: int = 500
+    OPENAI_TPM_LIMIT: int = 200000
+    OPENAI_EMBEDDING_RPM_LIMIT: int = 3000
+    OPENAI_EMBEDDING_TPM_LIMIT: int = 1000000
+    OPENAI_SCHEDULER_MAX_QUEUE: int = 100  # Waiting calls per lane before fast 429s
+    OPENAI_SCHEDULER_MAX_WAIT_SECONDS: float = 20.0
+
+    # SQL safety validation - the LLM check only runs when the SQL parser fails
+    SQL_VALIDATION_LLM_FALLBACK: bool = True
+
+    # Local repair of misspelled table/column names before falling back to an LLM retry
+    SQL_REPAIR_ENABLED: bool = True
+    SQL_REPAIR_MAX_DISTANCE: int = 3  # Upper bound on edit distance (scaled down for short names)
+    SQL_REPAIR_LOG_PATH: str = str(Path(__file__).resolve().parent / "logs" / "sql_repairs.jsonl")
+
+    # Source for the schema catalog: "sql" (pms.sql) or "information_schema" (live database)
+    SCHEMA_CATALOG_SOURCE: str = "sql"
 
     # Path to transcript file used for role-specific prompts (e.g., docs/transcript.pdf)
     TRANSCRIPT_PATH: str = str(Path(__file__).resolve().parent.parent / "docs" / "transcript.pdf")
@@ -57,6 +99,86 @@ class Settings(BaseSettings):
     RAG_TOP_K: int = 5  # Number of relevant chunks to retrieve
     RAG_ENABLED: bool = True  # Toggle RAG on/off
 
+    # Prompt token budgets per section
+    PROMPT_BUDGET_SCHEMA_TOKENS: int = 3000
+    PROMPT_BUDGET_EXAMPLES_TOKENS: int = 800
+    PROMPT_BUDGET_DOCS_TOKENS: int = 600
+    PROMPT_BUDGET_TRANSCRIPT_TOKENS: int = 800
+    PROMPT_BUDGET_ROLE_TOKENS: int = 400
+
+    # Embedding cache (in-memory LRU + on-disk SQLite store)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = str(Path(__file__).resolve().parent / "data" / "embedding_cache.sqlite3")
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 2048
+    EMBEDDING_CACHE_DISK_ITEMS: int = 50000
+
+    # Micro-batching of concurrent single-text embedding requests
+    EMBEDDING_BATCH_ENABLED: bool = True
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # Collection window after the first queued request
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+
+    # Semantic NL-to-SQL cache
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # Minimum cosine similarity to reuse cached SQL
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+
+    # EXPLAIN-based cost guard for generated SQL
+    COST_GUARD_ENABLED: bool = True
+    COST_GUARD_MAX_ROWS: int = 1000000  # Estimated rows examined before the action applies
+    COST_GUARD_ACTION: str = "rewrite"  # reject | limit (MAX_EXECUTION_TIME hint) | rewrite (then limit)
+    COST_GUARD_MAX_EXECUTION_MS: int = 10000
+    COST_GUARD_PLAN_TTL_SECONDS: int = 300
+
+    # Index advisor (records EXPLAIN plans of executed queries, recommends indexes)
+    INDEX_ADVISOR_ENABLED: bool = True
+    INDEX_ADVISOR_PATH: str = str(Path(__file__).resolve().parent / "data" / "index_advisor.sqlite3")
+    INDEX_ADVISOR_EXPLAIN_INTERVAL_SECONDS: int = 3600  # Re-EXPLAIN a fingerprint at most this often
+
+    # LIMIT enforcement and paging of generated SQL (/agentic/query/{result_id}/next)
+    PAGINATION_ENABLED: bool = True
+    QUERY_DEFAULT_LIMIT: int = 100  # Injected when generated SQL has no LIMIT (page size)
+    QUERY_MAX_LIMIT: int = 1000  # Larger LIMITs are clamped
+    PAGINATION_TTL_SECONDS: int = 1800
+    PAGINATION_MAX_ENTRIES: int = 1000
+
+    # Rollup summary tables for hot aggregates (run database/migrations/add_rollup_tables.sql first)
+    ROLLUP_ENABLED: bool = False
+    ROLLUP_REFRESH_INTERVAL_SECONDS: float = 60.0
+    ROLLUP_MIN_REFRESH_INTERVAL_SECONDS: float = 15.0  # Floor between refreshes triggered by table changes
+    ROLLUP_FULL_REFRESH_INTERVAL_SECONDS: int = 21600  # Periodic rebuild (hard deletes, partition key changes)
+    ROLLUP_REFRESH_LOOKBACK_SECONDS: int = 300  # Re-scan window for rows committed late by long transactions
+    ROLLUP_MAX_INCREMENTAL_PARTITIONS: int = 500  # More changed partitions than this triggers a full rebuild
+    ROLLUP_MAX_STALENESS_SECONDS: float = 300.0  # Older rollups are not used to answer queries
+
+    # Result cache for executed SQL (keyed by normalized SQL fingerprint)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL_SECONDS: int = 60
+    RESULT_CACHE_MAX_ENTRIES: int = 1000
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Approximate serialized size of all cached rows
+    RESULT_CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024  # Larger result sets are not cached
+
+    # Table change watermarks (versions embedded in result cache keys)
+    WATERMARK_ENABLED: bool = True
+    WATERMARK_POLL_INTERVAL_SECONDS: float = 5.0
+    WATERMARK_TABLE_IDLE_SECONDS: float = 900.0  # Stop polling tables no query referenced for this long
+    WATERMARK_MAX_TABLES: int = 200
+
+    # Single-flight coalescing of identical concurrent agentic queries
+    AGENTIC_COALESCE_ENABLED: bool = True
+
+    # Streaming query execution (server-side cursor; SSE and NDJSON responses)
+    STREAM_ROWS_CHUNK_SIZE: int = 100
+    QUERY_STREAM_MAX_ROWS: int = 100000
+    QUERY_STREAM_MAX_BYTES: int = 50 * 1024 * 1024
+    RESULT_SAMPLE_ROWS: int = 200  # Rows handed to visualization and explanation
+
+    # Deferred (background) explanations
+    EXPLANATION_MAX_CONCURRENCY: int = 4
+    EXPLANATION_CACHE_TTL_SECONDS: int = 3600
+    EXPLANATION_CACHE_MAX_ENTRIES: int = 1000
+    EXPLANATION_MAX_WAIT_SECONDS: int = 30  # Upper bound for long-poll waits
+
     @property
     def cors_origins_list(self) -> List[str]:
         """Convert CORS_ORIGINS string to list"""
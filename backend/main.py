@@ -10,9 +10,17 @@ import time
 
 from backend.config import settings
 from backend.routers import agentic, health, conversation, rag
-from backend.models.database import test_connection
+from backend.models.database import engine
 from backend.utils.schema_loader import DB_SCHEMA
+from backend.utils.schema_catalog import schema_catalog
+from backend.utils.transcript_index import get_transcript_index
 from backend.services.vector_db_service import vector_db_service
+from backend.services.database_service import database_service
+from backend.services.database_router import database_router
+from backend.services.openai_client import openai_transport
+from backend.services.explanation_service import explanation_service
+from backend.services.watermark_service import watermark_tracker
+from backend.services.rollup_service import rollup_service
 
 # Configure logging
 logging.basicConfig(
@@ -30,10 +38,19 @@ async def lifespan(app: FastAPI):
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     
     # Test database connection
-    if test_connection():
+    if await database_service.test_connection():
         logger.info("✓ Database connection successful")
     else:
         logger.error("✗ Database connection failed")
+
+    # Check the read replica used for generated analytics queries
+    if database_router.replica_configured:
+        lag = await database_router.replica_lag(force=True)
+        if lag is not None and lag <= database_router.max_lag_seconds:
+            logger.info(f"✓ Read replica available (lag {lag:g}s)")
+        else:
+            reason = database_router.get_stats()["lag_error"] or f"lag {lag}s"
+            logger.warning(f"✗ Read replica not usable, analytics queries use the primary ({reason})")
     
     # Check OpenAI configuration
     if settings.OPENAI_API_KEY:
@@ -41,6 +58,15 @@ async def lifespan(app: FastAPI):
     else:
         logger.warning("✗ OpenAI API key not configured")
 
+    # Optionally rebuild the schema catalog from the live database
+    if settings.SCHEMA_CATALOG_SOURCE == "information_schema":
+        try:
+            with engine.connect() as conn:
+                schema_catalog.load_from_information_schema(conn)
+            logger.info(f"✓ Schema catalog loaded from INFORMATION_SCHEMA ({len(schema_catalog.tables)} tables)")
+        except Exception as e:
+            logger.warning(f"✗ Failed to load schema catalog from INFORMATION_SCHEMA, using pms.sql: {e}")
+
     # Check schema loading
     if DB_SCHEMA and len(DB_SCHEMA) > 100:
         table_count = DB_SCHEMA.count("Table:")
@@ -48,6 +74,22 @@ async def lifespan(app: FastAPI):
     else:
         logger.warning("✗ Database schema not loaded properly")
 
+    # Build the transcript knowledge index (steps and definitions)
+    try:
+        transcript_stats = get_transcript_index(rebuild=True).get_stats()
+        logger.info(f"✓ Transcript index built ({transcript_stats['step_blocks']} step blocks, "
+                    f"{transcript_stats['definitions']} definitions)")
+    except Exception as e:
+        logger.warning(f"✗ Failed to build transcript index: {e}")
+
+    # Start polling table change watermarks for cache freshness
+    if settings.WATERMARK_ENABLED:
+        watermark_tracker.start()
+
+    # Keep rollup summary tables refreshed (generated aggregates are answered from them)
+    if settings.ROLLUP_ENABLED:
+        rollup_service.start()
+
     # Initialize Vector Database for RAG
     if settings.RAG_ENABLED:
         try:
@@ -80,6 +122,11 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down application")
+    await explanation_service.close()
+    await watermark_tracker.stop()
+    await rollup_service.stop()
+    await openai_transport.close()
+    await database_router.dispose()
 
 
 # Create FastAPI app
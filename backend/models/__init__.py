@@ -1,5 +1,5 @@
 """Models package"""
-from backend.models.database import get_db, engine, SessionLocal
+from backend.models.database import get_db, engine, async_engine, replica_async_engine, SessionLocal
 from backend.models.schemas import (
     AgenticQueryRequest,
     AgenticQueryResponse,
@@ -10,6 +10,8 @@ from backend.models.schemas import (
 __all__ = [
     "get_db",
     "engine",
+    "async_engine",
+    "replica_async_engine",
     "SessionLocal",
     "AgenticQueryRequest",
     "AgenticQueryResponse",
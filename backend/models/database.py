@@ -2,10 +2,12 @@
 Database connection and session management
 """
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
-from typing import Generator
+from typing import Generator, Optional
 import logging
 
 from backend.config import settings
@@ -22,6 +24,44 @@ engine = create_engine(
     echo=settings.DEBUG,  # Log SQL queries in debug mode
 )
 
+
+
+def get_async_database_url(database_url: str) -> URL:
+    """
+    Map the configured MySQL URL (mysql+pymysql://...) onto the aiomysql driver
+
+    Non-MySQL URLs are returned unchanged so their own async driver must be named explicitly.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == "mysql" and url.get_driver_name() != "aiomysql":
+        url = url.set(drivername="mysql+aiomysql")
+    return url
+
+
+# Async engine for request handlers (query execution, conversations, health checks).
+# The sync engine above stays for scripts and startup-time schema introspection.
+async_engine: AsyncEngine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=True,
+    echo=settings.DEBUG,
+)
+
+# Optional read replica for generated analytics queries (see services/database_router.py).
+# Writes, conversations and consistency-critical reads stay on the primary above.
+replica_async_engine: Optional[AsyncEngine] = create_async_engine(
+    get_async_database_url(settings.DATABASE_REPLICA_URL),
+    pool_size=settings.DB_REPLICA_POOL_SIZE,
+    max_overflow=settings.DB_REPLICA_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=True,
+    echo=settings.DEBUG,
+) if settings.DATABASE_REPLICA_URL else None
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
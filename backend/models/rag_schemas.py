@@ -83,6 +83,7 @@ class SearchResponse(BaseModel):
     query: str
     results: RAGContext
     total_results: int
+    timings_ms: Dict[str, float] = Field(default_factory=dict, description="Embedding and per-collection search latency")
 
 
 class IndexResponse(BaseModel):
@@ -16,12 +16,34 @@ class QueryType(str, Enum):
     GENERAL = "general"
 
 
+class ExplanationMode(str, Enum):
+    """When the result explanation is generated"""
+    INLINE = "inline"
+    DEFERRED = "deferred"
+
+
+class ResultFormat(str, Enum):
+    """How /agentic/query returns result rows"""
+    ROWS = "rows"  # List of row objects (default)
+    COLUMNAR = "columnar"  # Column names once plus one value array per column
+    NDJSON = "ndjson"  # Streamed: response envelope line, then one JSON row per line
+    CSV = "csv"  # Streamed CSV download
+
+
 class AgenticQueryRequest(BaseModel):
     """Request schema for agentic query"""
     query: str = Field(..., min_length=1, max_length=500, description="Natural language query")
     user_id: Optional[int] = Field(None, description="User ID making the query")
     include_explanation: bool = Field(True, description="Include AI explanation of results")
+    explanation: ExplanationMode = Field(
+        ExplanationMode.INLINE,
+        description="'inline' waits for the explanation; 'deferred' returns an explanation_id to fetch later"
+    )
     speak_response: bool = Field(False, description="Generate TTS response")
+    format: ResultFormat = Field(
+        ResultFormat.ROWS,
+        description="'rows', 'columnar' (columns + column_values), 'ndjson' stream or 'csv' download"
+    )
     # Optional role to tailor prompts (e.g., 'fms-admin', 'hit-admin', 'recurring-admin')
     role: Optional[str] = Field(None, description="Optional role for role-specific prompts (e.g., 'fms-admin')")
     
@@ -57,11 +79,17 @@ class AgenticQueryResponse(BaseModel):
     query: str = Field(..., description="Original user query")
     sql_query: Optional[str] = Field(None, description="Generated SQL query")
     results: List[Dict[str, Any]] = Field(default_factory=list, description="Query results")
+    columns: Optional[List[str]] = Field(None, description="Result column names (columnar format)")
+    column_values: Optional[List[List[Any]]] = Field(
+        None, description="One value array per column, aligned with columns (columnar format)"
+    )
     explanation: Optional[str] = Field(None, description="AI-generated explanation")
+    explanation_id: Optional[str] = Field(None, description="Handle for fetching a deferred explanation")
     result_count: int = Field(0, description="Number of results returned")
     execution_time_ms: float = Field(0, description="Query execution time in milliseconds")
     error: Optional[str] = Field(None, description="Error message if query failed")
     chart_config: Optional[ChartConfig] = Field(None, description="Recommended chart configuration")
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="Pipeline diagnostics (cache hits, timings)")
 
     class Config:
         json_schema_extra = {
@@ -84,6 +112,14 @@ class AgenticQueryResponse(BaseModel):
         }
 
 
+class ExplanationResponse(BaseModel):
+    """Response schema for a deferred explanation"""
+    id: str = Field(..., description="Explanation handle")
+    status: str = Field(..., description="pending, ready or failed")
+    explanation: Optional[str] = Field(None, description="AI-generated explanation once ready")
+    error: Optional[str] = Field(None, description="Error message if generation failed")
+
+
 class QueryHistoryItem(BaseModel):
     """Schema for query history"""
     id: int
@@ -1,25 +1,70 @@
 """
 API Routes for Agentic AI functionality
 """
-from fastapi import APIRouter, HTTPException, Depends, Header
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Optional, List
+import json
+import asyncio
 import logging
 
+from backend.config import settings
 from backend.models.schemas import (
     AgenticQueryRequest,
     AgenticQueryResponse,
-    ErrorResponse
+    ExplanationResponse,
+    ErrorResponse,
+    ResultFormat
 )
 from backend.services.agentic_service import agentic_service
+from backend.services.explanation_service import explanation_service
+from backend.services.openai_scheduler import RateLimitExceeded
+from backend.utils.disconnect import cancel_on_disconnect
+from backend.utils.result_formats import FastJSONResponse, iter_csv, iter_ndjson, to_columnar
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/agentic", tags=["Agentic AI"])
 
 
+def _render_query_response(response: AgenticQueryResponse, result_format: ResultFormat):
+    """
+    Serialize a pipeline response in the requested result format
+
+    The envelope is dumped without the rows, which are attached (or transposed /
+    streamed) as-is and encoded by pydantic-core instead of jsonable_encoder.
+    """
+    envelope = response.model_dump(exclude={"results", "columns", "column_values"})
+    results = response.results
+
+    if result_format == ResultFormat.COLUMNAR:
+        columns, column_values = to_columnar(results)
+        return FastJSONResponse({**envelope, "columns": columns, "column_values": column_values})
+
+    if result_format == ResultFormat.NDJSON:
+        envelope["columns"] = list(results[0]) if results else []
+        return StreamingResponse(iter_ndjson(envelope, results), media_type="application/x-ndjson")
+
+    if result_format == ResultFormat.CSV and response.success:
+        return StreamingResponse(
+            iter_csv(results),
+            media_type="text/csv",
+            headers={
+                "Content-Disposition": 'attachment; filename="query_results.csv"',
+                "X-Result-Count": str(response.result_count),
+                "X-Execution-Time-Ms": f"{response.execution_time_ms:.2f}"
+            }
+        )
+
+    # Rows (and failed CSV requests, which have no rows to download)
+    return FastJSONResponse({**envelope, "results": results})
+
+
 @router.post("/query", response_model=AgenticQueryResponse)
 async def process_agentic_query(
     request: AgenticQueryRequest,
+    http_request: Request,
     x_session_id: Optional[str] = Header(None, description="Chat session ID for conversation tracking")
 ):
     """
@@ -31,10 +76,27 @@ async def process_agentic_query(
         "query": "How many help tickets are pending by all users, give names",
         "user_id": 1,
         "include_explanation": true,
-        "speak_response": false
+        "explanation": "inline",
+        "speak_response": false,
+        "format": "rows"
     }
     ```
 
+    **Result formats (`format`):**
+    - `rows` (default): `results` is a list of row objects
+    - `columnar`: `columns` lists the column names once and `column_values[i]` holds
+      the values of `columns[i]` (no repeated keys; much smaller for wide results)
+    - `ndjson`: `application/x-ndjson` stream; the first line is the response without
+      rows (plus `columns`), each following line is one row object
+    - `csv`: `text/csv` download with a header row (`X-Result-Count` /
+      `X-Execution-Time-Ms` headers); failures return the JSON response
+
+    If the client disconnects before the response is ready, processing is
+    cancelled (including the running database query).
+
+    Set `"explanation": "deferred"` to return immediately with an `explanation_id`
+    and fetch the explanation later from `GET /agentic/explanations/{explanation_id}`.
+
     **Headers:**
     - X-Session-Id: Optional session ID for conversation tracking
 
@@ -54,14 +116,147 @@ async def process_agentic_query(
     """
     try:
         logger.info(f"Received query request: {request.query} (session: {x_session_id})")
-        response = await agentic_service.process_query(request, session_id=x_session_id)
-        return response
+        response = await cancel_on_disconnect(
+            http_request,
+            agentic_service.process_query(request, session_id=x_session_id)
+        )
+        return _render_query_response(response, request.format)
 
+    except HTTPException:
+        raise
+    except RateLimitExceeded as e:
+        logger.warning(f"Rate limited query request: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.error(f"Error in query endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/query/{result_id}/next", response_model=AgenticQueryResponse)
+async def get_next_page(
+    result_id: str,
+    http_request: Request,
+    cursor: Optional[str] = Query(None, description="metadata.pagination.next_cursor of a previous page"),
+    format: ResultFormat = Query(ResultFormat.ROWS, description="Result format (see /agentic/query)")
+):
+    """
+    Fetch the next page of an earlier query without generating SQL again
+
+    Generated SQL runs with an enforced LIMIT (the page size); responses carry
+    `metadata.pagination` with `result_id`, `has_more` and `next_cursor`. This
+    endpoint re-runs the stored SQL for the page the cursor names, using a
+    keyset predicate on the ORDER BY columns where possible and OFFSET
+    otherwise. Without `cursor` it returns the page after the furthest one
+    fetched so far.
+
+    **Example:** `GET /agentic/query/3f2c.../next?cursor=2`
+    """
+    try:
+        response = await cancel_on_disconnect(http_request, agentic_service.next_page(result_id, cursor))
+        if response is None:
+            raise HTTPException(status_code=404, detail="Result not found, expired or has no further pages")
+        return _render_query_response(response, format)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching next page: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/query/stream")
+async def stream_agentic_query(
+    request: AgenticQueryRequest,
+    x_session_id: Optional[str] = Header(None, description="Chat session ID for conversation tracking")
+):
+    """
+    Process a natural language query, streaming each stage as server-sent events
+
+    **Events (in order):**
+    - `sql`: `{"sql_query": "...", "metadata": {...}}`
+    - `rows`: `{"offset": 0, "rows": [...]}` (repeated per chunk)
+    - `rows_complete`: `{"result_count": 42, "byte_count": 5120, "truncated": false, "truncated_reason": null, "execution_time_ms": 45.2}`
+    - `chart_config`: `{"chart_config": {...} | null}`
+    - `explanation`: `{"delta": "..."}` (repeated per token chunk)
+    - `done`: `{"success": true, "result_count": 42, "execution_time_ms": 45.2, "truncated": false}`
+    - `error`: `{"error": "..."}` (ends the stream)
+
+    Rows are read from a server-side cursor and forwarded as they arrive, up to
+    QUERY_STREAM_MAX_ROWS / QUERY_STREAM_MAX_BYTES (`truncated` is set when a cap
+    was hit).
+    """
+    logger.info(f"Received streaming query request: {request.query} (session: {x_session_id})")
+
+    async def event_stream():
+        async for event, payload in agentic_service.process_query_stream(request, session_id=x_session_id):
+            data = json.dumps(jsonable_encoder(payload), default=str)
+            yield f"event: {event}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/query/ndjson")
+async def stream_agentic_query_ndjson(
+    request: AgenticQueryRequest,
+    x_session_id: Optional[str] = Header(None, description="Chat session ID for conversation tracking")
+):
+    """
+    Process a natural language query, streaming each stage as newline-delimited JSON
+
+    Emits the same events as `/agentic/query/stream`, one JSON object per line:
+    `{"event": "rows", "data": {"offset": 0, "rows": [...]}}`. Suited to clients
+    that parse large result sets incrementally without an SSE reader.
+    """
+    logger.info(f"Received NDJSON query request: {request.query} (session: {x_session_id})")
+
+    async def line_stream():
+        async for event, payload in agentic_service.process_query_stream(request, session_id=x_session_id):
+            yield json.dumps({"event": event, "data": jsonable_encoder(payload)}, default=str) + "\n"
+
+    return StreamingResponse(
+        line_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/explanations/stats", response_model=Dict[str, Any])
+async def get_explanation_stats():
+    """
+    Get deferred explanation job and cache statistics
+    """
+    return explanation_service.get_stats()
+
+
+@router.get("/explanations/{explanation_id}", response_model=ExplanationResponse)
+async def get_explanation(
+    explanation_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to long-poll while the explanation is pending")
+):
+    """
+    Fetch a deferred explanation by the explanation_id returned from /agentic/query
+
+    With `wait`, the request is held until the explanation is ready or the wait
+    elapses (capped by EXPLANATION_MAX_WAIT_SECONDS). `status` is `pending`,
+    `ready` or `failed`.
+    """
+    try:
+        timeout = min(wait, settings.EXPLANATION_MAX_WAIT_SECONDS)
+        entry = await explanation_service.wait(explanation_id, timeout=timeout)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Explanation not found or expired")
+        return entry
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting explanation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/examples", response_model=Dict[str, Any])
 async def get_example_queries():
     """
@@ -86,6 +281,146 @@ async def get_example_queries():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_sql_cache_stats():
+    """
+    Get hit-rate metrics for the semantic NL-to-SQL cache, request coalescing
+    counters, the memoized prompt prefix cache, the SQL result cache
+    (including per-fingerprint hits and misses), table change watermarks, the
+    EXPLAIN cost guard and LIMIT enforcement / paging
+    """
+    try:
+        from backend.services.semantic_cache import semantic_cache
+        from backend.services.result_cache import result_cache
+        from backend.services.watermark_service import watermark_tracker
+        from backend.services.cost_guard import cost_guard
+        from backend.services.pagination_service import pagination_service
+        from backend.utils.prompts import get_prompt_cache_stats
+
+        return {
+            **semantic_cache.get_stats(),
+            "coalescing": agentic_service.get_coalescing_stats(),
+            "prompts": get_prompt_cache_stats(),
+            "results": result_cache.get_stats(),
+            "watermarks": watermark_tracker.get_stats(),
+            "cost_guard": cost_guard.get_stats(),
+            "pagination": pagination_service.get_stats()
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting cache stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/cache/invalidate", response_model=Dict[str, Any])
+async def invalidate_sql_cache():
+    """
+    Drop all cached NL-to-SQL entries, memoized prompt prefixes and cached query results
+    """
+    try:
+        from backend.services.semantic_cache import semantic_cache
+        from backend.services.result_cache import result_cache
+        from backend.utils.prompts import invalidate_prompt_cache
+
+        semantic_cache.invalidate("manual")
+        invalidate_prompt_cache("manual")
+        result_cache.invalidate("manual")
+        return semantic_cache.get_stats()
+
+    except Exception as e:
+        logger.error(f"Error invalidating cache: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/cache/results/invalidate", response_model=Dict[str, Any])
+async def invalidate_result_cache(
+    tables: Optional[List[str]] = Query(None, description="Tables whose cached results should be dropped (all if omitted)")
+):
+    """
+    Drop cached query results, either for queries reading the given tables or entirely
+
+    **Example:** `POST /agentic/cache/results/invalidate?tables=hit_tickets&tables=users`
+    """
+    try:
+        from backend.services.result_cache import result_cache
+
+        if tables:
+            dropped = result_cache.invalidate_tables(tables, reason="manual")
+        else:
+            dropped = result_cache.get_stats(top=0)["size"]
+            result_cache.invalidate("manual")
+        return {"dropped": dropped, "tables": tables}
+
+    except Exception as e:
+        logger.error(f"Error invalidating result cache: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/index-advisor/report", response_model=Dict[str, Any])
+async def get_index_advisor_report(
+    limit: int = Query(20, ge=1, le=200, description="Maximum number of candidate indexes")
+):
+    """
+    Candidate indexes ranked by estimated impact across the observed query workload
+
+    Queries are aggregated by table and predicate shape; shapes whose plans
+    show full scans, filesorts or temporary tables contribute executions x
+    rows examined to the impact of the index that would serve them.
+    """
+    try:
+        from backend.services.index_advisor import index_advisor
+
+        report = await asyncio.to_thread(index_advisor.report, limit)
+        return {**report, "stats": index_advisor.get_stats()}
+
+    except Exception as e:
+        logger.error(f"Error building index advisor report: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/rollups", response_model=Dict[str, Any])
+async def get_rollup_stats():
+    """
+    Freshness, refresh counters and rewrite counts of the rollup summary tables
+    """
+    try:
+        from backend.services.rollup_service import rollup_service
+
+        return rollup_service.get_stats()
+
+    except Exception as e:
+        logger.error(f"Error getting rollup stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/rollups/refresh", response_model=Dict[str, Any])
+async def refresh_rollups(
+    rollup: Optional[str] = Query(None, description="Rollup to refresh (all if omitted)"),
+    full: bool = Query(False, description="Rebuild instead of recomputing changed partitions")
+):
+    """
+    Refresh rollup summary tables now
+
+    **Example:** `POST /agentic/rollups/refresh?rollup=hit_ticket_status&full=true`
+    """
+    try:
+        from backend.services.rollup_service import rollup_service
+
+        if rollup is None:
+            return {"refreshed": await rollup_service.refresh_all(full=full)}
+        if rollup not in rollup_service.rollups:
+            raise HTTPException(status_code=404, detail=f"Unknown rollup: {rollup}")
+        summary = await rollup_service.refresh(rollup, full=full)
+        await rollup_service.load_state()
+        return {"refreshed": [summary]}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error refreshing rollups: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/validate-query")
 async def validate_sql_query(sql_query: str):
     """
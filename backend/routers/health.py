@@ -64,3 +64,30 @@ async def ping():
     """Simple ping endpoint"""
     return {"message": "pong", "timestamp": datetime.now()}
 
+
+
+@router.get("/health/openai")
+async def openai_status():
+    """
+    OpenAI transport concurrency and rate-limit scheduler status (per-lane
+    capacity, queue depth, waits and rejections)
+    """
+    from backend.services.openai_client import openai_transport
+    from backend.services.openai_scheduler import openai_scheduler
+
+    return {
+        "transport": openai_transport.get_stats(),
+        "scheduler": openai_scheduler.get_stats()
+    }
+
+
+@router.get("/health/database")
+async def database_status():
+    """
+    Primary / read replica routing status (replica lag, fallbacks to the
+    primary and per-target query counts)
+    """
+    from backend.services.database_router import database_router
+
+    await database_router.replica_lag()
+    return database_router.get_stats()
@@ -2,6 +2,7 @@
 RAG (Retrieval-Augmented Generation) API Router
 Provides endpoints for managing the vector database and RAG system
 """
+import asyncio
 import logging
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from typing import Optional
@@ -50,6 +51,21 @@ async def get_rag_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cache/stats")
+async def get_embedding_cache_stats():
+    """
+    Get hit/miss counters and sizes of the query embedding cache, plus
+    batch fill and queueing delay of the embedding micro-batcher
+    """
+    try:
+        from backend.services.embedding_service import embedding_service
+
+        return {**embedding_service.get_cache_stats(), "batching": embedding_service.get_batch_stats()}
+    except Exception as e:
+        logger.error(f"Error getting embedding cache stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/index/schema", response_model=IndexResponse)
 async def index_schema(request: IndexSchemaRequest, background_tasks: BackgroundTasks):
     """
@@ -189,44 +205,34 @@ async def search_vector_db(request: SearchRequest):
         if not vector_db_service.is_initialized():
             raise HTTPException(status_code=400, detail="Vector DB not initialized")
 
-        results = RAGContext(
-            relevant_tables=[],
-            similar_examples=[],
-            relevant_docs=[]
+        # Embed once and search the requested collections concurrently
+        context = await asyncio.to_thread(
+            vector_db_service.retrieve,
+            query=request.query,
+            role=request.role,
+            top_k=request.top_k,
+            include_schema=request.collection in ("all", "schema"),
+            include_examples=request.collection in ("all", "examples"),
+            include_docs=request.collection in ("all", "docs")
         )
 
-        total_results = 0
-
-        # Search based on collection parameter
-        if request.collection in ("all", "schema"):
-            schema_results = vector_db_service.search_relevant_schema(
-                query=request.query,
-                top_k=request.top_k
-            )
-            results.relevant_tables = schema_results
-            total_results += len(schema_results)
+        results = RAGContext(
+            relevant_tables=context["relevant_tables"],
+            similar_examples=context["similar_examples"],
+            relevant_docs=context["relevant_docs"]
+        )
 
-        if request.collection in ("all", "examples"):
-            example_results = vector_db_service.search_similar_examples(
-                query=request.query,
-                top_k=request.top_k
-            )
-            results.similar_examples = example_results
-            total_results += len(example_results)
-
-        if request.collection in ("all", "docs"):
-            doc_results = vector_db_service.search_docs(
-                query=request.query,
-                top_k=request.top_k,
-                role_filter=request.role
-            )
-            results.relevant_docs = doc_results
-            total_results += len(doc_results)
+        total_results = (
+            len(context["relevant_tables"]) +
+            len(context["similar_examples"]) +
+            len(context["relevant_docs"])
+        )
 
         return SearchResponse(
             query=request.query,
             results=results,
-            total_results=total_results
+            total_results=total_results,
+            timings_ms=context["timings_ms"]
         )
 
     except HTTPException:
@@ -0,0 +1,148 @@
+"""
+Benchmark concurrent OpenAI chat throughput against a local stub server
+
+Compares the old blocking path (sync OpenAI client called from async code)
+with the shared async transport used by OpenAIService.
+
+Usage:
+    python backend/scripts/benchmark_openai.py --requests 50 --latency-ms 200
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any
+
+# Setup path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# The stub server does not check credentials
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-stub")
+
+from openai import OpenAI
+
+from backend.services.openai_client import OpenAITransport
+
+
+def make_stub_handler(latency_s: float):
+    """Create a request handler that mimics /v1/chat/completions with a fixed latency"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(latency_s)
+
+            payload = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "SELECT 1"},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+            }).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stub server with a listen backlog large enough for concurrent clients"""
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def start_stub_server(latency_s: float) -> ThreadingHTTPServer:
+    """Start the stub server on a free local port in a background thread"""
+    server = StubServer(("127.0.0.1", 0), make_stub_handler(latency_s))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+MESSAGES = [{"role": "user", "content": "How many help tickets are pending?"}]
+
+
+async def run_blocking(base_url: str, total: int) -> float:
+    """Old path: async def wrapping the synchronous client"""
+    client = OpenAI(api_key="sk-benchmark-stub", base_url=base_url, max_retries=0)
+
+    async def call():
+        return client.chat.completions.create(model="stub", messages=MESSAGES)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(total)))
+    return time.perf_counter() - start
+
+
+async def run_async(base_url: str, total: int, concurrency: int) -> float:
+    """New path: shared AsyncOpenAI transport"""
+    transport = OpenAITransport(api_key="sk-benchmark-stub", base_url=base_url, max_concurrency=concurrency)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            transport.chat_completion(model="stub", messages=MESSAGES) for _ in range(total)
+        ))
+        return time.perf_counter() - start
+    finally:
+        await transport.close()
+
+
+def benchmark(total: int = 50, latency_ms: int = 200, concurrency: int = 32) -> Dict[str, Any]:
+    """
+    Run both paths against the stub server
+
+    Returns:
+        Dictionary with elapsed seconds and requests/second for each path
+    """
+    server = start_stub_server(latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    try:
+        blocking_s = asyncio.run(run_blocking(base_url, total))
+        async_s = asyncio.run(run_async(base_url, total, concurrency))
+    finally:
+        server.shutdown()
+
+    return {
+        "requests": total,
+        "latency_ms": latency_ms,
+        "concurrency": concurrency,
+        "blocking": {"elapsed_s": round(blocking_s, 3), "rps": round(total / blocking_s, 2)},
+        "async": {"elapsed_s": round(async_s, 3), "rps": round(total / async_s, 2)},
+        "speedup": round(blocking_s / async_s, 2)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark OpenAI transport throughput")
+    parser.add_argument("--requests", type=int, default=50, help="Total concurrent requests")
+    parser.add_argument("--latency-ms", type=int, default=200, help="Simulated LLM latency per call")
+    parser.add_argument("--concurrency", type=int, default=32, help="Async transport concurrency limit")
+    args = parser.parse_args()
+
+    result = benchmark(args.requests, args.latency_ms, args.concurrency)
+    print(f"\n{'='*50}")
+    print("OPENAI TRANSPORT BENCHMARK")
+    print(f"{'='*50}")
+    print(f"Requests: {result['requests']} @ {result['latency_ms']}ms simulated latency")
+    print(f"Blocking client: {result['blocking']['elapsed_s']}s ({result['blocking']['rps']} req/s)")
+    print(f"Async transport: {result['async']['elapsed_s']}s ({result['async']['rps']} req/s)")
+    print(f"Speedup: {result['speedup']}x")
@@ -0,0 +1,54 @@
+"""
+Print candidate indexes recommended from the observed query workload
+
+Reads the index advisor store (INDEX_ADVISOR_PATH) written by the running API
+and ranks candidate indexes by estimated impact.
+
+Usage:
+    python backend/scripts/index_advisor_report.py --limit 10
+    python backend/scripts/index_advisor_report.py --json > report.json
+"""
+import os
+import sys
+import json
+import argparse
+
+# Setup path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.index_advisor import IndexAdvisor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank candidate indexes from the observed query workload")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of candidates to list")
+    parser.add_argument("--path", default=None, help="Index advisor store (defaults to INDEX_ADVISOR_PATH)")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    report = IndexAdvisor(path=args.path).report(limit=args.limit)
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+        sys.exit(0)
+
+    workload = report.get("workload", {})
+    print(f"\n{'='*50}")
+    print("INDEX ADVISOR REPORT")
+    print(f"{'='*50}")
+    print(f"Workload: {workload.get('fingerprints', 0)} queries, "
+          f"{workload.get('executions', 0)} executions, {workload.get('total_ms', 0)}ms total")
+    print(f"Flagged shapes: {len(report['flagged_shapes'])}")
+
+    if not report["candidates"]:
+        print("\nNo candidate indexes.")
+        sys.exit(0)
+
+    for rank, candidate in enumerate(report["candidates"], start=1):
+        print(f"\n{rank}. {candidate['ddl']};")
+        print(f"   Impact: {candidate['impact']:,} (rows examined x executions), "
+              f"executions: {candidate['executions']}")
+        print(f"   Shapes: {'; '.join(candidate['shapes'])}")
+        if candidate["existing_indexes"]:
+            existing = ", ".join("(" + ", ".join(index) + ")" for index in candidate["existing_indexes"])
+            print(f"   Existing indexes with the same leading column: {existing}")
+        print(f"   Example: {candidate['example_sql'][:200]}")
@@ -282,6 +282,10 @@ def index_docs(force_reindex: bool = False) -> Dict[str, Any]:
         result["docs_indexed"] = indexed_count
         result["message"] = f"Successfully indexed {indexed_count} documentation chunks"
 
+        # Keep the transcript step/definition index in sync with the re-indexed docs
+        from backend.utils.transcript_index import get_transcript_index
+        get_transcript_index(settings.TRANSCRIPT_PATH, rebuild=True)
+
         logger.info(f"Docs indexing complete: {indexed_count} chunks indexed")
         return result
 
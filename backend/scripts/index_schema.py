@@ -2,7 +2,6 @@
 Script to index database schema into ChromaDB vector database
 """
 import os
-import re
 import logging
 from typing import Dict, List, Any
 
@@ -11,6 +10,9 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from backend.services.vector_db_service import vector_db_service, SCHEMA_COLLECTION
+from backend.services.semantic_cache import semantic_cache
+from backend.utils.schema_catalog import schema_catalog, build_schema_catalog
+from backend.utils.prompts import invalidate_prompt_cache
 
 logger = logging.getLogger(__name__)
 
@@ -72,25 +74,9 @@ def parse_sql_file(sql_file_path: str) -> Dict[str, List[Dict[str, str]]]:
     Returns:
         Dictionary mapping table names to their column definitions
     """
-    schema_dict = {}
-
     try:
-        with open(sql_file_path, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
-
-        # Pattern to match CREATE TABLE statements
-        table_pattern = r'CREATE TABLE `?(\w+)`?\s*\((.*?)\)\s*ENGINE'
-
-        matches = re.finditer(table_pattern, sql_content, re.DOTALL | re.IGNORECASE)
-
-        for match in matches:
-            table_name = match.group(1)
-            columns_section = match.group(2)
-
-            columns = parse_columns(columns_section)
-            if columns:
-                schema_dict[table_name] = columns
-
+        catalog = build_schema_catalog(sql_file_path)
+        schema_dict = catalog.to_schema_dict()
         logger.info(f"Parsed {len(schema_dict)} tables from SQL file")
         return schema_dict
 
@@ -99,38 +85,13 @@ def parse_sql_file(sql_file_path: str) -> Dict[str, List[Dict[str, str]]]:
         return {}
 
 
-def parse_columns(columns_section: str) -> List[Dict[str, str]]:
-    """Parse column definitions from CREATE TABLE statement"""
-    columns = []
-
-    lines = columns_section.split('\n')
-
-    for line in lines:
-        line = line.strip()
-
-        # Skip non-column lines
-        if not line or line.startswith('PRIMARY KEY') or line.startswith('KEY') or \
-           line.startswith('UNIQUE') or line.startswith('CONSTRAINT') or line.startswith('FOREIGN'):
-            continue
-
-        # Extract column name and type
-        col_match = re.match(r'`?(\w+)`?\s+(\w+(?:\([^)]+\))?)', line)
-
-        if col_match:
-            col_name = col_match.group(1)
-            col_type = col_match.group(2)
-
-            # Extract comment if present
-            comment_match = re.search(r"COMMENT\s+'([^']+)'", line)
-            comment = comment_match.group(1) if comment_match else ""
-
-            columns.append({
-                'name': col_name,
-                'type': col_type,
-                'comment': comment
-            })
-
-    return columns
+def get_table_relationships(table_name: str) -> List[str]:
+    """Curated relationships merged with the tables this one references in the schema catalog"""
+    related = list(TABLE_RELATIONSHIPS.get(table_name, []))
+    for other in schema_catalog.get_relationships(table_name, include_reverse=False):
+        if other not in related:
+            related.append(other)
+    return related
 
 
 def create_schema_text(table_name: str, columns: List[Dict[str, str]]) -> str:
@@ -164,8 +125,9 @@ def create_schema_text(table_name: str, columns: List[Dict[str, str]]) -> str:
         lines.append(f"  - {col['name']} ({col['type']}){comment_str}")
 
     # Add relationship info if available
-    if table_name in TABLE_RELATIONSHIPS:
-        lines.append(f"\nRelated tables: {', '.join(TABLE_RELATIONSHIPS[table_name])}")
+    relationships = get_table_relationships(table_name)
+    if relationships:
+        lines.append(f"\nRelated tables: {', '.join(relationships)}")
 
     return "\n".join(lines)
 
@@ -235,7 +197,7 @@ def index_schema(sql_file_path: str = None, force_reindex: bool = False) -> Dict
                     "table_name": table_name,
                     "schema_text": schema_text,
                     "columns": [col["name"] for col in columns],
-                    "relationships": TABLE_RELATIONSHIPS.get(table_name, []),
+                    "relationships": get_table_relationships(table_name),
                     "category": get_table_category(table_name)
                 })
 
@@ -248,7 +210,7 @@ def index_schema(sql_file_path: str = None, force_reindex: bool = False) -> Dict
                     "table_name": table_name,
                     "schema_text": schema_text,
                     "columns": [col["name"] for col in columns],
-                    "relationships": TABLE_RELATIONSHIPS.get(table_name, []),
+                    "relationships": get_table_relationships(table_name),
                     "category": get_table_category(table_name)
                 })
 
@@ -259,6 +221,10 @@ def index_schema(sql_file_path: str = None, force_reindex: bool = False) -> Dict
         result["tables_indexed"] = indexed_count
         result["message"] = f"Successfully indexed {indexed_count} tables"
 
+        # Cached SQL may reference tables/columns that changed
+        semantic_cache.invalidate("schema re-indexed")
+        invalidate_prompt_cache("schema re-indexed")
+
         logger.info(f"Schema indexing complete: {indexed_count} tables indexed")
         return result
 
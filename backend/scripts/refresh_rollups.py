@@ -0,0 +1,55 @@
+"""
+Refresh the rollup summary tables
+
+Builds or incrementally refreshes the rollups defined in
+backend/services/rollup_service.py. Run once with --full after applying
+database/migrations/add_rollup_tables.sql, or from cron when the API's
+background refresh (ROLLUP_ENABLED) is not used.
+
+Usage:
+    python backend/scripts/refresh_rollups.py --full
+    python backend/scripts/refresh_rollups.py --rollup hit_ticket_status
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+# Setup path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.models.database import async_engine
+from backend.services.rollup_service import rollup_service, ROLLUPS
+
+
+async def refresh(names, full: bool):
+    try:
+        summaries = []
+        for name in names:
+            summaries.append(await rollup_service.refresh(name, full=full))
+        await rollup_service.load_state()
+        return summaries
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh rollup summary tables")
+    parser.add_argument("--rollup", choices=sorted(ROLLUPS), action="append", help="Rollup to refresh (repeatable; all by default)")
+    parser.add_argument("--full", action="store_true", help="Rebuild instead of recomputing changed partitions")
+    parser.add_argument("--json", action="store_true", help="Print the refresh summaries as JSON")
+    args = parser.parse_args()
+
+    summaries = asyncio.run(refresh(args.rollup or list(ROLLUPS), args.full))
+    if args.json:
+        print(json.dumps(summaries, indent=2, default=str))
+        sys.exit(0)
+
+    for summary in summaries:
+        if "skipped" in summary:
+            print(f"{summary['rollup']}: skipped ({summary['skipped']})")
+            continue
+        partitions = "" if summary["partitions"] is None else f", {summary['partitions']} partitions"
+        print(f"{summary['rollup']}: {summary['mode']}{partitions}, "
+              f"{summary['row_count']:,} rows, {summary['refresh_ms']}ms")
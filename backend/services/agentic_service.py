@@ -1,13 +1,23 @@
 """
 Main Agentic AI Service - Orchestrates the entire query flow
 """
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, AsyncIterator, List
+from backend.config import settings
 from backend.services.openai_service import openai_service
+from backend.services.embedding_service import embedding_service
+from backend.services.semantic_cache import semantic_cache
 from backend.services.database_service import database_service
+from backend.services.database_router import QueryRoute
 from backend.services.visualization_service import visualization_service
 from backend.services.conversation_service import conversation_service
-from backend.models.schemas import AgenticQueryRequest, AgenticQueryResponse
+from backend.services.explanation_service import explanation_service
+from backend.services.cost_guard import cost_guard, CostAction
+from backend.services.pagination_service import pagination_service
+from backend.services.rollup_service import rollup_service
+from backend.services.openai_scheduler import RateLimitExceeded
+from backend.models.schemas import AgenticQueryRequest, AgenticQueryResponse, ExplanationMode
 from backend.utils.prompt_validator import is_meaningful_prompt
 
 from backend.models.conversation import (
@@ -22,13 +32,104 @@ logger = logging.getLogger(__name__)
 class AgenticService:
     """Main service for handling agentic AI queries"""
 
+    def __init__(self):
+        # In-flight pipeline executions keyed by coalescing key (single-flight)
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self._inflight_waiters: Dict[Tuple, int] = {}
+        self.pipeline_runs = 0
+        self.coalesced_requests = 0
+
+    @staticmethod
+    def _coalescing_key(request: AgenticQueryRequest) -> Tuple:
+        """Requests with the same key can share one pipeline execution"""
+        return (
+            " ".join(request.query.lower().split()),
+            (request.role or "").strip().lower(),
+            request.include_explanation,
+            request.explanation
+        )
+
     async def process_query(self, request: AgenticQueryRequest, session_id: Optional[str] = None) -> AgenticQueryResponse:
         """
         Process a natural language query end-to-end
+
+        Concurrent identical requests (same normalized query, role and explanation
+        options) share one in-flight pipeline execution; conversation history is
+        still saved for each caller's session.
         
         Args:
             request: AgenticQueryRequest with user query
+            session_id: Optional chat session ID for conversation tracking
             
+        Returns:
+            AgenticQueryResponse with results and explanation
+        """
+        coalesced = False
+        if settings.AGENTIC_COALESCE_ENABLED:
+            key = self._coalescing_key(request)
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._run_pipeline(request))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+                self.pipeline_runs += 1
+            else:
+                coalesced = True
+                self.coalesced_requests += 1
+                logger.info(f"Coalescing with in-flight pipeline for: {request.query}")
+            # Shield so one caller disconnecting does not cancel the shared execution;
+            # it is only cancelled once every caller waiting on it has gone
+            self._inflight_waiters[key] = self._inflight_waiters.get(key, 0) + 1
+            try:
+                response = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if self._inflight_waiters.get(key) == 1 and not task.done():
+                    logger.info(f"Last caller cancelled, stopping pipeline for: {request.query}")
+                    task.cancel()
+                raise
+            finally:
+                self._inflight_waiters[key] -= 1
+                if not self._inflight_waiters[key]:
+                    del self._inflight_waiters[key]
+        else:
+            self.pipeline_runs += 1
+            response = await self._run_pipeline(request)
+
+        response = response.model_copy(update={
+            "query": request.query,
+            "metadata": {**response.metadata, "coalesced": coalesced}
+        })
+
+        # Save to conversation history if session_id provided
+        if session_id and response.success:
+            await self._save_conversation(
+                session_id,
+                request,
+                response.sql_query,
+                response.results,
+                response.execution_time_ms,
+                response.chart_config,
+                response.explanation
+            )
+
+        return response
+
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Get single-flight coalescing statistics"""
+        return {
+            "enabled": settings.AGENTIC_COALESCE_ENABLED,
+            "in_flight": len(self._inflight),
+            "pipeline_runs": self.pipeline_runs,
+            "coalesced_requests": self.coalesced_requests
+        }
+
+    async def _run_pipeline(self, request: AgenticQueryRequest) -> AgenticQueryResponse:
+        """
+        Run generation, validation, execution, visualization and explanation once
+
+        Args:
+            request: AgenticQueryRequest with user query
+
         Returns:
             AgenticQueryResponse with results and explanation
         """
@@ -52,11 +153,10 @@ class AgenticService:
                 error=f"Invalid input: {reason} {request.query}"
                 )
             
-            # Step 1: Generate SQL query from natural language (role-aware when provided)
-            sql_query = await openai_service.generate_sql_query(request.query, role=request.role)
-            
-            # Step 2: Validate the generated query
-            is_safe, validation_reason = await openai_service.validate_query(sql_query)
+            metadata: Dict[str, Any] = {}
+
+            # Steps 1-2: Generate and validate SQL (served from the semantic cache when possible)
+            sql_query, is_safe, validation_reason = await self._generate_validated_sql(request, metadata)
             
             if not is_safe:
                 logger.warning(f"Unsafe query detected: {validation_reason}")
@@ -68,69 +168,82 @@ class AgenticService:
                     explanation=None,
                     result_count=0,
                     execution_time_ms=0,
-                    error=f"Query validation failed: {validation_reason} {request.query}"
+                    error=f"Query validation failed: {validation_reason} {request.query}",
+                    metadata=metadata
                 )
             
-            # Step 3: Execute the query
-            results, execution_time_ms = await database_service.execute_query(sql_query)
+            # Answer from a rollup summary table when the query matches one
+            sql_query = rollup_service.rewrite(sql_query, metadata)
+
+            # Step 3: Check the plan cost, then execute the query
+            sql_query, timeout, plan_rows, cost_error = await self._apply_cost_guard(request, sql_query, metadata)
+            if cost_error:
+                return AgenticQueryResponse(
+                    success=False,
+                    query=request.query,
+                    sql_query=sql_query,
+                    results=[],
+                    explanation=None,
+                    result_count=0,
+                    execution_time_ms=0,
+                    error=cost_error,
+                    metadata=metadata
+                )
+
+            # Enforce the LIMIT (after the cost guard, so a rewritten query is paged too). Every page
+            # keeps the guard's timeout, and its EXPLAIN is reused by the index advisor for the paged SQL
+            sql_query, page_plan = pagination_service.prepare(sql_query, timeout=timeout, plan_rows=plan_rows)
+
+            results, execution_time_ms = await database_service.execute_query(
+                sql_query, timeout=timeout, use_cache=True, metadata=metadata,
+                route=QueryRoute.ANALYTICS, plan_rows=plan_rows
+            )
+            if page_plan is not None:
+                metadata["pagination"] = pagination_service.register(page_plan, request.query, results)
+
+            # Visualization and explanation only look at a bounded sample of the rows
+            sample = results[:settings.RESULT_SAMPLE_ROWS]
 
             # Step 4: Analyze results for visualization 
             chart_config = None
             if results and len(results) > 0:
-                logger.info(f"Analyzing visualization for {len(results)} results")
+                logger.info(f"Analyzing visualization for {len(sample)} of {len(results)} results")
                 chart_config = visualization_service.analyze_and_suggest_chart(
                     request.query,
-                    results,
+                    sample,
                     sql_query
                 )
 
             # Step 5: Analyze results and generate explanation if requested
             explanation = None
-            if request.include_explanation:
+            explanation_id = None
+            if request.include_explanation and request.explanation == ExplanationMode.DEFERRED:
+                explanation_id = explanation_service.submit(request.query, sample, sql_query, len(results))
+            elif request.include_explanation:
                 explanation = await openai_service.explain_results(
                     request.query,
-                    results,
-                    sql_query
+                    sample,
+                    sql_query,
+                    len(results)
                 )
 
-            # Step 6: Save to conversation history if session_id provided
-            if session_id:
-                try:
-                    # Save user message
-                    await conversation_service.add_message(ConversationMessageCreate(
-                        session_id=session_id,
-                        message_type=MessageType.USER,
-                        content=request.query,
-                        query=request.query
-                    ))
-
-                    # Save assistant response
-                    await conversation_service.add_message(ConversationMessageCreate(
-                        session_id=session_id,
-                        message_type=MessageType.ASSISTANT,
-                        content=explanation or f"Found {len(results)} results",
-                        query=request.query,
-                        sql_query=sql_query,
-                        result_count=len(results),
-                        execution_time_ms=execution_time_ms,
-                        chart_config=chart_config.model_dump() if chart_config else None
-                    ))
-                except Exception as conv_error:
-                    logger.warning(f"Failed to save conversation history: {conv_error}")
-
-            # Step 7: Return response
+            # Step 6: Return response (conversation history is saved per caller in process_query)
             return AgenticQueryResponse(
                 success=True,
                 query=request.query,
                 sql_query=sql_query,
                 results=results,
                 explanation=explanation,
+                explanation_id=explanation_id,
                 result_count=len(results),
                 execution_time_ms=execution_time_ms,
                 error=None,
-                chart_config=chart_config
+                chart_config=chart_config,
+                metadata=metadata
             )
-            
+
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error processing query: {e}")
             return AgenticQueryResponse(
@@ -144,6 +257,296 @@ class AgenticService:
                 error=str(e) + " " + request.query
             )
     
+    async def process_query_stream(
+        self,
+        request: AgenticQueryRequest,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Process a natural language query, yielding each stage as soon as it completes
+
+        Events are yielded in order: sql, rows (one event per chunk), rows_complete,
+        chart_config, explanation (one event per streamed token delta), then done.
+        A failure at any stage yields a single error event and ends the stream.
+
+        Rows are read through a server-side cursor and forwarded chunk by chunk
+        (capped by QUERY_STREAM_MAX_ROWS / QUERY_STREAM_MAX_BYTES); visualization
+        and explanation are computed from a bounded sample of the rows.
+
+        Args:
+            request: AgenticQueryRequest with user query
+            session_id: Optional chat session ID for conversation tracking
+
+        Yields:
+            Tuples of (event name, event payload)
+        """
+        try:
+            logger.info(f"Streaming query: {request.query}")
+
+            is_valid, reason = is_meaningful_prompt(request.query)
+            if not is_valid:
+                logger.warning(f"Invalid prompt blocked: {reason}")
+                yield "error", {"error": f"Invalid input: {reason} {request.query}"}
+                return
+
+            metadata: Dict[str, Any] = {}
+            sql_query, is_safe, validation_reason = await self._generate_validated_sql(request, metadata)
+
+            if not is_safe:
+                logger.warning(f"Unsafe query detected: {validation_reason}")
+                yield "error", {
+                    "error": f"Query validation failed: {validation_reason} {request.query}",
+                    "sql_query": sql_query,
+                    "metadata": metadata
+                }
+                return
+
+            sql_query = rollup_service.rewrite(sql_query, metadata)
+            sql_query, timeout, _, cost_error = await self._apply_cost_guard(request, sql_query, metadata)
+            if cost_error:
+                yield "error", {"error": cost_error, "sql_query": sql_query, "metadata": metadata}
+                return
+
+            yield "sql", {"sql_query": sql_query, "metadata": metadata}
+
+            stream = database_service.stream_query(sql_query, timeout=timeout, route=QueryRoute.ANALYTICS)
+            offset = 0
+            async for rows in stream.chunks():
+                yield "rows", {"offset": offset, "rows": rows}
+                offset += len(rows)
+            yield "rows_complete", stream.summary()
+
+            sample = stream.sample
+            result_count = stream.row_count
+            execution_time_ms = stream.execution_time_ms
+
+            chart_config = None
+            if sample:
+                chart_config = visualization_service.analyze_and_suggest_chart(
+                    request.query,
+                    sample,
+                    sql_query
+                )
+            yield "chart_config", {"chart_config": chart_config}
+
+            explanation = None
+            if request.include_explanation:
+                deltas: List[str] = []
+                async for delta in openai_service.stream_explanation(request.query, sample, sql_query, result_count):
+                    deltas.append(delta)
+                    yield "explanation", {"delta": delta}
+                explanation = "".join(deltas)
+
+            if session_id:
+                await self._save_conversation(
+                    session_id, request, sql_query, sample, execution_time_ms, chart_config, explanation,
+                    result_count=result_count
+                )
+
+            yield "done", {
+                "success": True,
+                "result_count": result_count,
+                "execution_time_ms": execution_time_ms,
+                "truncated": stream.truncated
+            }
+
+        except RateLimitExceeded as e:
+            logger.warning(f"Rate limited while streaming query: {e}")
+            yield "error", {"error": str(e), "retry_after": e.retry_after}
+        except Exception as e:
+            logger.error(f"Error streaming query: {e}")
+            yield "error", {"error": str(e) + " " + request.query}
+
+    async def _save_conversation(
+        self,
+        session_id: str,
+        request: AgenticQueryRequest,
+        sql_query: str,
+        results: list,
+        execution_time_ms: float,
+        chart_config,
+        explanation: Optional[str],
+        result_count: Optional[int] = None
+    ):
+        """Save the user message and assistant response to conversation history"""
+        result_count = len(results) if result_count is None else result_count
+        try:
+            # Save user message
+            await conversation_service.add_message(ConversationMessageCreate(
+                session_id=session_id,
+                message_type=MessageType.USER,
+                content=request.query,
+                query=request.query
+            ))
+
+            # Save assistant response
+            await conversation_service.add_message(ConversationMessageCreate(
+                session_id=session_id,
+                message_type=MessageType.ASSISTANT,
+                content=explanation or f"Found {result_count} results",
+                query=request.query,
+                sql_query=sql_query,
+                result_count=result_count,
+                execution_time_ms=execution_time_ms,
+                chart_config=chart_config.model_dump() if chart_config else None
+            ))
+        except Exception as conv_error:
+            logger.warning(f"Failed to save conversation history: {conv_error}")
+
+    async def _generate_validated_sql(
+        self,
+        request: AgenticQueryRequest,
+        metadata: Dict[str, Any]
+    ) -> Tuple[str, bool, str]:
+        """
+        Generate and validate SQL, consulting the semantic cache first
+
+        Args:
+            request: AgenticQueryRequest with user query and role
+            metadata: Response metadata dict to record cache diagnostics in
+
+        Returns:
+            Tuple of (sql_query, is_safe, validation_reason)
+        """
+        query_embedding = None
+        if settings.SEMANTIC_CACHE_ENABLED:
+            try:
+                query_embedding = await asyncio.to_thread(embedding_service.embed_text, request.query)
+                cached = semantic_cache.lookup(request.query, query_embedding, request.role)
+                if cached:
+                    logger.info(f"Semantic cache hit (similarity {cached['similarity']:.4f}) for: {request.query}")
+                    metadata["sql_cache"] = {
+                        "hit": True,
+                        "similarity": round(cached["similarity"], 4),
+                        "matched_question": cached["question"]
+                    }
+                    return cached["sql_query"], cached["is_safe"], cached["reason"]
+                metadata["sql_cache"] = {"hit": False}
+            except Exception as cache_error:
+                logger.warning(f"Semantic cache lookup failed: {cache_error}")
+
+        # Step 1: Generate SQL query from natural language (role-aware when provided)
+        sql_query = await openai_service.generate_sql_query(request.query, role=request.role, metadata=metadata)
+
+        # Step 2: Validate the generated query
+        is_safe, validation_reason = await openai_service.validate_query(sql_query)
+
+        if query_embedding is not None:
+            semantic_cache.store(
+                question=request.query,
+                embedding=query_embedding,
+                role=request.role,
+                sql_query=sql_query,
+                is_safe=is_safe,
+                reason=validation_reason
+            )
+
+        return sql_query, is_safe, validation_reason
+
+    async def _apply_cost_guard(
+        self,
+        request: AgenticQueryRequest,
+        sql_query: str,
+        metadata: Dict[str, Any]
+    ) -> Tuple[str, Optional[float], Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        EXPLAIN the query and act on plans above COST_GUARD_MAX_ROWS
+
+        Depending on COST_GUARD_ACTION the query is rejected, limited with a
+        MAX_EXECUTION_TIME hint (plus a matching client-side timeout), or
+        regenerated once with the plan as feedback; a rewrite that is unsafe or
+        still too expensive falls back to the limit. The plan summary and the
+        outcome are recorded in metadata["query_plan"].
+
+        Returns:
+            Tuple of (sql_query to execute, execution timeout or None for the default,
+            EXPLAIN rows of the query to execute or None, rejection error or None)
+        """
+        if not settings.COST_GUARD_ENABLED:
+            return sql_query, None, None, None
+
+        plan = await cost_guard.check(sql_query)
+        if plan is None:
+            metadata["query_plan"] = {"action": "unchecked"}
+            return sql_query, None, None, None
+        metadata["query_plan"] = plan
+        if not plan["over_threshold"]:
+            plan["action"] = "allowed"
+            cost_guard.record("allowed")
+            return sql_query, None, cost_guard.plan_rows(sql_query), None
+
+        logger.warning(
+            f"Query plan over cost threshold ({plan['estimated_rows']} > {plan['threshold']} rows, "
+            f"full scans: {plan['full_scans']}): {sql_query}"
+        )
+
+        if cost_guard.action == CostAction.REJECT:
+            plan["action"] = "rejected"
+            cost_guard.record("rejected")
+            scans = f" Full table scans on: {', '.join(map(str, plan['full_scans']))}." if plan["full_scans"] else ""
+            return sql_query, None, None, (
+                f"Query too expensive: an estimated {plan['estimated_rows']:,} rows would be examined "
+                f"(limit {plan['threshold']:,}).{scans} Try narrowing the question, e.g. by date, status or department."
+            )
+
+        if cost_guard.action == CostAction.REWRITE:
+            scans = ", ".join(map(str, plan["full_scans"])) or "none"
+            feedback = (
+                "IMPORTANT: The previous SQL was too expensive to run:\n"
+                f"{sql_query}\n"
+                f"EXPLAIN estimates {plan['estimated_rows']:,} rows examined (limit {plan['threshold']:,}); "
+                f"full table scans on: {scans}. Rewrite it to answer the same question more cheaply: filter on "
+                "indexed columns, avoid leading-wildcard LIKE '%...%' patterns, drop joins that are not needed "
+                "and aggregate before joining where possible."
+            )
+            try:
+                rewritten = await openai_service.generate_sql_query(request.query, role=request.role, feedback=feedback)
+                is_safe, _ = await openai_service.validate_query(rewritten)
+                rewrite_plan = await cost_guard.check(rewritten) if is_safe else None
+                if rewrite_plan is not None and not rewrite_plan["over_threshold"]:
+                    logger.info(f"Using cheaper rewrite ({rewrite_plan['estimated_rows']} rows): {rewritten}")
+                    plan["action"] = "rewritten"
+                    plan["original_sql"] = sql_query
+                    plan["rewrite"] = rewrite_plan
+                    cost_guard.record("rewritten")
+                    return rewritten, None, cost_guard.plan_rows(rewritten), None
+                plan["rewrite"] = rewrite_plan or {"rejected": True}
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                logger.warning(f"Cost rewrite failed, limiting original query: {e}")
+
+        limited = cost_guard.limit(sql_query)
+        plan["action"] = "limited"
+        plan["max_execution_ms"] = cost_guard.max_execution_ms
+        plan["hint"] = limited["hint"]
+        cost_guard.record("limited")
+        return limited["sql_query"], limited["timeout_seconds"], cost_guard.plan_rows(sql_query), None
+
+    async def next_page(self, result_id: str, cursor: Optional[str] = None) -> Optional[AgenticQueryResponse]:
+        """
+        Fetch another page of an earlier query by re-running its stored SQL (no LLM call)
+
+        Args:
+            result_id: metadata.pagination.result_id of the first page
+            cursor: metadata.pagination.next_cursor of a previous page (defaults to the next unseen page)
+
+        Returns:
+            AgenticQueryResponse with the page's rows, or None when the result or cursor is unknown or expired
+        """
+        page = await pagination_service.next_page(result_id, cursor)
+        if page is None:
+            return None
+        return AgenticQueryResponse(
+            success=True,
+            query=page["question"],
+            sql_query=page["sql_query"],
+            results=page["results"],
+            result_count=len(page["results"]),
+            execution_time_ms=page["execution_time_ms"],
+            metadata=page["metadata"]
+        )
+
     async def get_example_queries(self) -> Dict[str, list]:
         """Get example queries for different categories"""
         return {
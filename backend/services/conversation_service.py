@@ -5,7 +5,7 @@ import logging
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from sqlalchemy import text
-from backend.models.database import engine
+from backend.models.database import async_engine
 from backend.models.conversation import (
     ChatSessionCreate,
     ChatSessionResponse,
@@ -30,7 +30,7 @@ class ConversationService:
     async def create_session(self, session_data: ChatSessionCreate) -> ChatSessionResponse:
         """Create a new chat session"""
         try:
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 query = text("""
                     INSERT INTO chat_sessions (id, user_id, title, message_count, is_active)
                     VALUES (:id, :user_id, :title, 0, 1)
@@ -39,12 +39,12 @@ class ConversationService:
                         updated_at = CURRENT_TIMESTAMP
                 """)
                 
-                conn.execute(query, {
+                await conn.execute(query, {
                     "id": session_data.session_id,
                     "user_id": session_data.user_id,
                     "title": session_data.title
                 })
-                conn.commit()
+                await conn.commit()
                 
                 return await self.get_session(session_data.session_id)
                 
@@ -55,14 +55,14 @@ class ConversationService:
     async def get_session(self, session_id: str) -> Optional[ChatSessionResponse]:
         """Get a chat session by ID"""
         try:
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 query = text("""
                     SELECT id, user_id, title, created_at, updated_at, message_count, is_active
                     FROM chat_sessions
                     WHERE id = :session_id
                 """)
                 
-                result = conn.execute(query, {"session_id": session_id})
+                result = await conn.execute(query, {"session_id": session_id})
                 row = result.fetchone()
                 
                 if row:
@@ -84,7 +84,7 @@ class ConversationService:
     async def list_sessions(self, user_id: Optional[int] = None, limit: int = 50) -> SessionListResponse:
         """List chat sessions for a user"""
         try:
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 if user_id:
                     query = text("""
                         SELECT id, user_id, title, created_at, updated_at, message_count, is_active
@@ -93,7 +93,7 @@ class ConversationService:
                         ORDER BY updated_at DESC
                         LIMIT :limit
                     """)
-                    result = conn.execute(query, {"user_id": user_id, "limit": limit})
+                    result = await conn.execute(query, {"user_id": user_id, "limit": limit})
                 else:
                     query = text("""
                         SELECT id, user_id, title, created_at, updated_at, message_count, is_active
@@ -102,7 +102,7 @@ class ConversationService:
                         ORDER BY updated_at DESC
                         LIMIT :limit
                     """)
-                    result = conn.execute(query, {"limit": limit})
+                    result = await conn.execute(query, {"limit": limit})
                 
                 rows = result.fetchall()
                 sessions = [
@@ -128,17 +128,17 @@ class ConversationService:
     async def store_error(self, message_data: ConversationErrorCreate) -> ConversationErrorResponse:
         """Store an error message in the conversation"""
         try:
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 query = text("""
                     INSERT INTO conversation_errors
                     (session_id, error_message)
                     VALUES (:session_id, :error_message)
                 """)
-                result = conn.execute(query, {
+                result = await conn.execute(query, {
                     "session_id": message_data.session_id,
                     "error_message": message_data.error_message
                 })
-                conn.commit()
+                await conn.commit()
                 return ConversationErrorResponse(error=message_data.error_message, id=result.lastrowid)
         except Exception as e:
             logger.error(f"Error storing error: {e}")
@@ -148,7 +148,7 @@ class ConversationService:
     async def add_message(self, message_data: ConversationMessageCreate) -> ConversationMessageResponse:
         """Add a message to a conversation"""
         try:
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 # Convert chart_config and metadata to JSON strings
                 chart_config_json = json.dumps(message_data.chart_config) if message_data.chart_config else None
                 metadata_json = json.dumps(message_data.metadata) if message_data.metadata else None
@@ -161,7 +161,7 @@ class ConversationService:
                             :result_count, :execution_time_ms, :chart_config, :metadata)
                 """)
 
-                result = conn.execute(query, {
+                result = await conn.execute(query, {
                     "session_id": message_data.session_id,
                     "message_type": message_data.message_type.value,
                     "content": message_data.content,
@@ -182,9 +182,9 @@ class ConversationService:
                         updated_at = CURRENT_TIMESTAMP
                     WHERE id = :session_id
                 """)
-                conn.execute(update_query, {"session_id": message_data.session_id})
+                await conn.execute(update_query, {"session_id": message_data.session_id})
 
-                conn.commit()
+                await conn.commit()
 
                 # Fetch and return the created message
                 return await self.get_message(message_id)
@@ -196,7 +196,7 @@ class ConversationService:
     async def get_message(self, message_id: int) -> Optional[ConversationMessageResponse]:
         """Get a message by ID"""
         try:
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 query = text("""
                     SELECT id, session_id, message_type, content, query, sql_query,
                            result_count, execution_time_ms, chart_config, metadata, created_at
@@ -204,7 +204,7 @@ class ConversationService:
                     WHERE id = :message_id
                 """)
 
-                result = conn.execute(query, {"message_id": message_id})
+                result = await conn.execute(query, {"message_id": message_id})
                 row = result.fetchone()
 
                 if row:
@@ -234,7 +234,7 @@ class ConversationService:
             if not session:
                 raise ValueError(f"Session {session_id} not found")
 
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 query = text("""
                     SELECT id, session_id, message_type, content, query, sql_query,
                            result_count, execution_time_ms, chart_config, metadata, created_at
@@ -244,7 +244,7 @@ class ConversationService:
                     LIMIT :limit
                 """)
 
-                result = conn.execute(query, {"session_id": session_id, "limit": limit})
+                result = await conn.execute(query, {"session_id": session_id, "limit": limit})
                 rows = result.fetchall()
 
                 messages = [
@@ -273,7 +273,7 @@ class ConversationService:
     async def save_context(self, context_data: ConversationContextCreate) -> ConversationContextResponse:
         """Save or update conversation context"""
         try:
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 query = text("""
                     INSERT INTO conversation_context (session_id, context_key, context_value)
                     VALUES (:session_id, :context_key, :context_value)
@@ -282,12 +282,12 @@ class ConversationService:
                         updated_at = CURRENT_TIMESTAMP
                 """)
 
-                conn.execute(query, {
+                await conn.execute(query, {
                     "session_id": context_data.session_id,
                     "context_key": context_data.context_key,
                     "context_value": context_data.context_value
                 })
-                conn.commit()
+                await conn.commit()
 
                 # Fetch the context
                 return await self.get_context(context_data.session_id, context_data.context_key)
@@ -299,14 +299,14 @@ class ConversationService:
     async def get_context(self, session_id: str, context_key: str) -> Optional[ConversationContextResponse]:
         """Get a specific context value"""
         try:
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 query = text("""
                     SELECT id, session_id, context_key, context_value, created_at, updated_at
                     FROM conversation_context
                     WHERE session_id = :session_id AND context_key = :context_key
                 """)
 
-                result = conn.execute(query, {"session_id": session_id, "context_key": context_key})
+                result = await conn.execute(query, {"session_id": session_id, "context_key": context_key})
                 row = result.fetchone()
 
                 if row:
@@ -327,14 +327,14 @@ class ConversationService:
     async def get_all_context(self, session_id: str) -> Dict[str, str]:
         """Get all context for a session as a dictionary"""
         try:
-            with engine.connect() as conn:
+            async with async_engine.connect() as conn:
                 query = text("""
                     SELECT context_key, context_value
                     FROM conversation_context
                     WHERE session_id = :session_id
                 """)
 
-                result = conn.execute(query, {"session_id": session_id})
+                result = await conn.execute(query, {"session_id": session_id})
                 rows = result.fetchall()
 
                 return {row[0]: row[1] for row in rows}
@@ -0,0 +1,210 @@
+"""
+EXPLAIN-based cost guard for generated SQL
+
+Before generated SQL is executed, its MySQL plan is inspected: the estimated
+rows examined (product of per-table row estimates within each SELECT, summed
+across SELECTs) and the tables read by full scan. Plans above
+COST_GUARD_MAX_ROWS are rejected, limited with a MAX_EXECUTION_TIME optimizer
+hint, or sent back to the generator for a cheaper rewrite, depending on
+COST_GUARD_ACTION. Plan summaries are memoized per SQL fingerprint for a
+short while so hot dashboard queries do not pay for EXPLAIN every time.
+"""
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from enum import Enum
+from typing import Dict, Any, List, Optional
+
+from backend.config import settings
+from backend.services.database_service import database_service
+from backend.services.database_router import QueryRoute
+from backend.utils.sql_fingerprint import fingerprint_sql
+
+logger = logging.getLogger(__name__)
+
+LEADING_SELECT = re.compile(r"^(\s*(?:\(\s*)*SELECT\b)", re.I)
+MAX_PLAN_CACHE_ENTRIES = 500
+
+
+class CostAction(str, Enum):
+    """What to do with a query whose plan exceeds the cost threshold"""
+    REJECT = "reject"
+    LIMIT = "limit"
+    REWRITE = "rewrite"
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def summarize_plan(plan_rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Condense tabular EXPLAIN output into a plan summary
+
+    Args:
+        plan_rows: Rows of `EXPLAIN <query>` (id, table, type, key, rows, filtered, Extra, ...)
+
+    Returns:
+        Dict with estimated_rows, full_scans and per-table access details
+    """
+    per_select: Dict[Any, float] = defaultdict(lambda: 1.0)
+    tables = []
+    full_scans = []
+    for row in plan_rows:
+        row = {str(key).lower(): value for key, value in row.items()}
+        if row.get("table") is None and not row.get("rows"):
+            continue
+        rows = _number(row.get("rows"))
+        # Nested-loop joins examine (roughly) the product of the row estimates
+        per_select[row.get("id")] *= max(rows, 1.0)
+        access = row.get("type")
+        if access == "ALL":
+            full_scans.append(row.get("table"))
+        tables.append({
+            "table": row.get("table"),
+            "type": access,
+            "key": row.get("key"),
+            "rows": int(rows),
+            "filtered": _number(row.get("filtered")) if row.get("filtered") is not None else None,
+            "extra": row.get("extra")
+        })
+    return {
+        "estimated_rows": int(sum(per_select.values())) if per_select else 0,
+        "full_scans": full_scans,
+        "tables": tables
+    }
+
+
+def add_max_execution_time_hint(sql_query: str, max_execution_ms: int) -> Optional[str]:
+    """
+    Insert a MAX_EXECUTION_TIME optimizer hint after the leading SELECT
+
+    Returns:
+        Hinted SQL, or None when the statement does not start with SELECT
+        (e.g. WITH ...), where the hint placement would be ambiguous
+    """
+    if "MAX_EXECUTION_TIME" in sql_query.upper():
+        return sql_query
+    match = LEADING_SELECT.match(sql_query)
+    if not match:
+        return None
+    return f"{match.group(1)} /*+ MAX_EXECUTION_TIME({int(max_execution_ms)}) */{sql_query[match.end():]}"
+
+
+class QueryCostGuard:
+    """Estimates query cost with EXPLAIN and applies the configured action above the threshold"""
+
+    def __init__(
+        self,
+        max_rows: Optional[int] = None,
+        action: Optional[str] = None,
+        max_execution_ms: Optional[int] = None,
+        plan_ttl_seconds: Optional[int] = None
+    ):
+        self.max_rows = max_rows or settings.COST_GUARD_MAX_ROWS
+        self.action = CostAction(action or settings.COST_GUARD_ACTION)
+        self.max_execution_ms = max_execution_ms or settings.COST_GUARD_MAX_EXECUTION_MS
+        self.plan_ttl_seconds = plan_ttl_seconds if plan_ttl_seconds is not None else settings.COST_GUARD_PLAN_TTL_SECONDS
+
+        self._plans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.explained = 0
+        self.plan_cache_hits = 0
+        self.explain_failures = 0
+        self.outcomes: Dict[str, int] = defaultdict(int)
+
+    async def explain(self, sql_query: str) -> Dict[str, Any]:
+        """
+        Plan summary for a query (memoized per fingerprint for plan_ttl_seconds)
+
+        Returns:
+            Plan summary (see summarize_plan) plus threshold, over_threshold and explain_ms
+        """
+        fingerprint = fingerprint_sql(sql_query)[0]
+        now = time.time()
+        with self._lock:
+            cached = self._plans.get(fingerprint)
+            if cached and now - cached["explained_at"] <= self.plan_ttl_seconds:
+                self._plans.move_to_end(fingerprint)
+                self.plan_cache_hits += 1
+                return {**cached["summary"], "cached": True}
+
+        start = time.time()
+        plan_rows, _ = await database_service.execute_query(
+            f"EXPLAIN {sql_query}", timeout=settings.DB_HEALTH_CHECK_TIMEOUT_SECONDS,
+            route=QueryRoute.ANALYTICS
+        )
+        summary = summarize_plan(plan_rows)
+        summary["explain_ms"] = round((time.time() - start) * 1000, 2)
+        summary["threshold"] = self.max_rows
+        summary["over_threshold"] = summary["estimated_rows"] > self.max_rows
+
+        with self._lock:
+            self.explained += 1
+            self._plans[fingerprint] = {"summary": summary, "plan_rows": plan_rows, "explained_at": now}
+            while len(self._plans) > MAX_PLAN_CACHE_ENTRIES:
+                self._plans.popitem(last=False)
+        return {**summary, "cached": False}
+
+    def plan_rows(self, sql_query: str) -> Optional[List[Dict[str, Any]]]:
+        """Raw EXPLAIN rows behind the memoized summary of a query (None when not explained or expired)"""
+        with self._lock:
+            cached = self._plans.get(fingerprint_sql(sql_query)[0])
+            if cached and time.time() - cached["explained_at"] <= self.plan_ttl_seconds:
+                return cached["plan_rows"]
+        return None
+
+    async def check(self, sql_query: str) -> Optional[Dict[str, Any]]:
+        """
+        Plan summary for a query, or None when EXPLAIN failed (the query then runs unguarded)
+        """
+        try:
+            return await self.explain(sql_query)
+        except Exception as e:
+            with self._lock:
+                self.explain_failures += 1
+            logger.warning(f"EXPLAIN failed, skipping cost guard: {e}")
+            return None
+
+    def limit(self, sql_query: str) -> Dict[str, Any]:
+        """
+        Cap execution time for an expensive query
+
+        Returns:
+            Dict with the SQL to run (hinted when possible), whether the hint was
+            applied and the matching client-side timeout in seconds
+        """
+        hinted = add_max_execution_time_hint(sql_query, self.max_execution_ms)
+        return {
+            "sql_query": hinted or sql_query,
+            "hint": hinted is not None,
+            "timeout_seconds": self.max_execution_ms / 1000
+        }
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get guard configuration, EXPLAIN counts and outcome counters"""
+        with self._lock:
+            return {
+                "enabled": settings.COST_GUARD_ENABLED,
+                "action": self.action.value,
+                "max_rows": self.max_rows,
+                "max_execution_ms": self.max_execution_ms,
+                "explained": self.explained,
+                "plan_cache_hits": self.plan_cache_hits,
+                "explain_failures": self.explain_failures,
+                "outcomes": dict(self.outcomes)
+            }
+
+
+# Create singleton instance
+cost_guard = QueryCostGuard()
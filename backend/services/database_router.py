@@ -0,0 +1,175 @@
+"""
+Routing between the primary database and an optional read replica
+
+Heavy LLM-generated reporting SELECTs are sent to the replica pool
+(DATABASE_REPLICA_URL) so they do not compete with the transactional PMS
+workload and our own conversation writes on the primary. Writes and
+consistency-critical reads always use the primary. Before analytics traffic
+is sent to the replica its replication lag is checked (cached for
+DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS); when the lag exceeds
+DB_REPLICA_MAX_LAG_SECONDS, replication is stopped or the replica is
+unreachable, analytics queries fall back to the primary.
+"""
+import time
+import asyncio
+import logging
+from enum import Enum
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from backend.config import settings
+from backend.models.database import async_engine, replica_async_engine
+
+logger = logging.getLogger(__name__)
+
+# Status columns reporting replica lag (MySQL 8.0.22+ / older MySQL and MariaDB)
+LAG_COLUMNS = ("Seconds_Behind_Source", "Seconds_Behind_Master")
+
+
+class QueryRoute(str, Enum):
+    """Which pool a statement should use"""
+    PRIMARY = "primary"  # Writes and consistency-critical reads
+    ANALYTICS = "analytics"  # Generated reporting SELECTs (replica when healthy)
+
+
+class DatabaseRouter:
+    """Chooses the engine for a route, checking replica lag before using the replica"""
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replica: Optional[AsyncEngine],
+        max_lag_seconds: Optional[float] = None,
+        check_interval_seconds: Optional[float] = None
+    ):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag_seconds = max_lag_seconds if max_lag_seconds is not None else settings.DB_REPLICA_MAX_LAG_SECONDS
+        self.check_interval_seconds = (
+            check_interval_seconds if check_interval_seconds is not None
+            else settings.DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS
+        )
+
+        self._lag: Optional[float] = None
+        self._lag_error: Optional[str] = None
+        self._checked_at = 0.0
+        self._check_lock: Optional[asyncio.Lock] = None
+
+        self.routed: Dict[str, int] = {"primary": 0, "replica": 0}
+        self.fallbacks = 0
+        self.lag_checks = 0
+        self.lag_check_failures = 0
+
+    @property
+    def replica_configured(self) -> bool:
+        return self.replica is not None
+
+    async def _measure_lag(self) -> Optional[float]:
+        """
+        Current replica lag in seconds
+
+        Returns:
+            Lag in seconds, or None when replication is not running (or the
+            replica reports no replication status at all)
+        """
+        async with self.replica.connect() as conn:
+            if settings.DB_REPLICA_LAG_QUERY:
+                value = (await conn.execute(text(settings.DB_REPLICA_LAG_QUERY))).scalar()
+                return float(value) if value is not None else None
+
+            try:
+                result = await conn.execute(text("SHOW REPLICA STATUS"))
+            except Exception:
+                # Servers before MySQL 8.0.22 / MariaDB 10.5 only know the legacy syntax
+                result = await conn.execute(text("SHOW SLAVE STATUS"))
+            row = result.mappings().first()
+            if row is None:
+                self._lag_error = "replica reports no replication status (set DB_REPLICA_LAG_QUERY)"
+                return None
+            for column in LAG_COLUMNS:
+                if column in row:
+                    return float(row[column]) if row[column] is not None else None
+            return None
+
+    async def replica_lag(self, force: bool = False) -> Optional[float]:
+        """
+        Replica lag in seconds (cached for check_interval_seconds; one check at a time)
+
+        Returns:
+            Lag in seconds, or None when unknown (replica down, replication stopped)
+        """
+        if not self.replica_configured:
+            return None
+        if not force and time.time() - self._checked_at < self.check_interval_seconds:
+            return self._lag
+
+        if self._check_lock is None:
+            self._check_lock = asyncio.Lock()
+        async with self._check_lock:
+            if not force and time.time() - self._checked_at < self.check_interval_seconds:
+                return self._lag
+            self._lag_error = None
+            try:
+                self._lag = await asyncio.wait_for(
+                    self._measure_lag(), timeout=settings.DB_HEALTH_CHECK_TIMEOUT_SECONDS
+                )
+            except Exception as e:
+                self.lag_check_failures += 1
+                self._lag = None
+                self._lag_error = str(e) or type(e).__name__
+                logger.warning(f"Replica lag check failed: {self._lag_error}")
+            self.lag_checks += 1
+            self._checked_at = time.time()
+            return self._lag
+
+    async def engine_for(self, route: QueryRoute = QueryRoute.PRIMARY) -> Tuple[AsyncEngine, Dict[str, Any]]:
+        """
+        Engine a statement on the given route should use
+
+        Returns:
+            Tuple of (engine, routing details with target, reason and lag_seconds)
+        """
+        if route != QueryRoute.ANALYTICS or not self.replica_configured:
+            self.routed["primary"] += 1
+            reason = "primary route" if route == QueryRoute.PRIMARY else "no replica configured"
+            return self.primary, {"target": "primary", "reason": reason}
+
+        lag = await self.replica_lag()
+        if lag is None or lag > self.max_lag_seconds:
+            self.routed["primary"] += 1
+            self.fallbacks += 1
+            reason = (
+                f"replica lag {lag:g}s exceeds {self.max_lag_seconds:g}s" if lag is not None
+                else f"replica lag unknown ({self._lag_error or 'replication stopped'})"
+            )
+            logger.info(f"Routing analytics query to primary: {reason}")
+            return self.primary, {"target": "primary", "reason": reason, "lag_seconds": lag}
+
+        self.routed["replica"] += 1
+        return self.replica, {"target": "replica", "reason": "replica healthy", "lag_seconds": lag}
+
+    async def dispose(self):
+        """Close both pools"""
+        await self.primary.dispose()
+        if self.replica is not None:
+            await self.replica.dispose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get replica health and routing counters"""
+        return {
+            "replica_configured": self.replica_configured,
+            "max_lag_seconds": self.max_lag_seconds,
+            "lag_seconds": self._lag,
+            "lag_error": self._lag_error,
+            "lag_checked_at": self._checked_at or None,
+            "lag_checks": self.lag_checks,
+            "lag_check_failures": self.lag_check_failures,
+            "routed": dict(self.routed),
+            "fallbacks": self.fallbacks
+        }
+
+
+# Create singleton instance
+database_router = DatabaseRouter(async_engine, replica_async_engine)
@@ -1,53 +1,289 @@
 """
 Database Service for executing queries
 """
+import asyncio
+import json
 import logging
 import time
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, AsyncIterator
 from sqlalchemy import text
-from backend.models.database import engine
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from backend.config import settings
+from backend.services.database_router import database_router, QueryRoute
+from backend.services.result_cache import result_cache
+from backend.services.index_advisor import index_advisor
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for the side connection that kills an abandoned statement
+KILL_QUERY_TIMEOUT_SECONDS = 5.0
+
+
+class QueryTimeout(Exception):
+    """Raised when a query exceeds its execution time limit"""
+
+
+class ResultStream:
+    """
+    Rows of one query read through an unbuffered server-side cursor
+
+    Iterate chunks() to receive lists of row dicts as they arrive; only one
+    chunk (plus the bounded sample) is held in memory at a time. Reading stops
+    once the row or byte cap is reached; row_count, byte_count, truncated and
+    sample are final once iteration ends.
+    """
+
+    def __init__(
+        self,
+        sql_query: str,
+        chunk_size: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sample_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        route: QueryRoute = QueryRoute.PRIMARY
+    ):
+        self.sql_query = sql_query
+        self.route = route
+        self.chunk_size = max(1, chunk_size or settings.STREAM_ROWS_CHUNK_SIZE)
+        self.max_rows = max_rows or settings.QUERY_STREAM_MAX_ROWS
+        self.max_bytes = max_bytes or settings.QUERY_STREAM_MAX_BYTES
+        self.sample_size = settings.RESULT_SAMPLE_ROWS if sample_size is None else sample_size
+        self.timeout = settings.DB_QUERY_TIMEOUT_SECONDS if timeout is None else timeout
+
+        self.columns: List[str] = []
+        self.row_count = 0
+        self.byte_count = 0
+        self.truncated = False
+        self.truncated_reason: Optional[str] = None
+        self.sample: List[Dict[str, Any]] = []
+        self.execution_time_ms = 0.0
+        self.routing: Dict[str, Any] = {}
+
+    async def _wait(self, awaitable, deadline: Optional[float]):
+        if deadline is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, timeout=max(0.0, deadline - time.time()))
+        except asyncio.TimeoutError:
+            raise QueryTimeout(f"Database query timed out after {self.timeout:g}s")
+
+    def _admit(self, record: Dict[str, Any]) -> bool:
+        """Account for one row, or mark the stream truncated if it would exceed a cap"""
+        size = len(json.dumps(record, default=str))
+        if self.row_count >= self.max_rows:
+            self.truncated_reason = "max_rows"
+        elif self.byte_count + size > self.max_bytes:
+            self.truncated_reason = "max_bytes"
+        if self.truncated_reason:
+            self.truncated = True
+            return False
+        self.row_count += 1
+        self.byte_count += size
+        if len(self.sample) < self.sample_size:
+            self.sample.append(record)
+        return True
+
+    async def chunks(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Execute the query and yield rows in chunks of chunk_size
+
+        Raises:
+            QueryTimeout: The query exceeded its time limit
+            Exception: Database query failed
+        """
+        start_time = time.time()
+        deadline = start_time + self.timeout if self.timeout else None
+        engine, self.routing = await database_router.engine_for(self.route)
+        logger.info(f"Streaming query ({self.routing['target']}): {self.sql_query}")
+
+        async with engine.connect() as conn:
+            thread_id = await DatabaseService._server_thread_id(conn)
+            exhausted = False
+            try:
+                result = await self._wait(conn.stream(text(self.sql_query)), deadline)
+                self.columns = list(result.keys())
+                while not self.truncated:
+                    rows = await self._wait(result.fetchmany(self.chunk_size), deadline)
+                    if not rows:
+                        exhausted = True
+                        break
+                    chunk = []
+                    for row in rows:
+                        record = dict(zip(self.columns, row))
+                        if not self._admit(record):
+                            break
+                        chunk.append(record)
+                    if chunk:
+                        yield chunk
+                if exhausted:
+                    await result.close()
+            except QueryTimeout:
+                logger.warning(f"Streaming query timed out after {self.timeout}s: {self.sql_query}")
+                raise
+            except Exception as e:
+                logger.error(f"Streaming query failed: {e}")
+                raise Exception(f"Database query failed: {str(e)}")
+            finally:
+                self.execution_time_ms = (time.time() - start_time) * 1000
+                if not exhausted:
+                    # Unread rows remain on the unbuffered cursor (cap reached, timeout, error or
+                    # the consumer went away): stop the statement rather than draining it
+                    await DatabaseService._kill_query(thread_id, engine)
+                    await conn.invalidate()
+
+        logger.info(
+            f"Query streamed. Rows: {self.row_count}, Bytes: {self.byte_count}, "
+            f"Truncated: {self.truncated_reason or False}, Time: {self.execution_time_ms:.2f}ms"
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        """Row/byte totals and truncation state (final once chunks() is exhausted)"""
+        return {
+            "result_count": self.row_count,
+            "byte_count": self.byte_count,
+            "truncated": self.truncated,
+            "truncated_reason": self.truncated_reason,
+            "execution_time_ms": self.execution_time_ms,
+            "database": self.routing.get("target")
+        }
+
 
 class DatabaseService:
     """Service for database operations"""
-    
-    async def execute_query(self, sql_query: str) -> Tuple[List[Dict[str, Any]], float]:
+
+    @staticmethod
+    async def _server_thread_id(conn: AsyncConnection) -> Optional[int]:
+        """MySQL connection id of the pooled connection (used to KILL QUERY on timeout)"""
+        try:
+            raw = await conn.get_raw_connection()
+            return raw.driver_connection.thread_id()
+        except Exception:
+            return None
+
+    @staticmethod
+    async def _kill_query(thread_id: Optional[int], engine: AsyncEngine):
+        """Stop a statement server-side; cancelling the client coroutine alone leaves it running"""
+        if thread_id is None:
+            return
+        try:
+            # Same server (engine) the statement runs on: connection ids are per server
+            async with engine.connect() as conn:
+                await asyncio.wait_for(
+                    conn.execute(text(f"KILL QUERY {int(thread_id)}")),
+                    timeout=KILL_QUERY_TIMEOUT_SECONDS
+                )
+            logger.info(f"Killed query on connection {thread_id}")
+        except Exception as e:
+            logger.warning(f"Failed to kill query on connection {thread_id}: {e}")
+
+    @staticmethod
+    async def _fetch_all(conn: AsyncConnection, sql_query: str) -> List[Dict[str, Any]]:
+        result = await conn.execute(text(sql_query))
+        columns = result.keys()
+        return [dict(zip(columns, row)) for row in result.fetchall()]
+
+    async def execute_query(
+        self,
+        sql_query: str,
+        timeout: Optional[float] = None,
+        use_cache: bool = False,
+        metadata: Optional[Dict[str, Any]] = None,
+        route: QueryRoute = QueryRoute.PRIMARY,
+        plan_rows: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[List[Dict[str, Any]], float]:
         """
         Execute SQL query and return results
-        
+
+        The query runs on the async engine, so a slow statement only suspends
+        this request. When it times out, or the calling task is cancelled (e.g.
+        the client disconnected), the statement is killed on the server and the
+        connection is discarded from the pool.
+
         Args:
             sql_query: SQL query to execute
-            
+            timeout: Execution time limit in seconds (defaults to DB_QUERY_TIMEOUT_SECONDS; 0 disables)
+            use_cache: Serve/store results through the SQL result cache (when RESULT_CACHE_ENABLED)
+            metadata: Optional dict that receives result cache ("result_cache") and routing ("database_route") details
+            route: QueryRoute.ANALYTICS for generated reporting SELECTs (read replica when
+                healthy); PRIMARY for writes and consistency-critical reads
+            plan_rows: EXPLAIN output already fetched for this statement (handed to the
+                index advisor so it does not EXPLAIN it again)
+
         Returns:
             Tuple of (results, execution_time_ms)
         """
+        timeout = settings.DB_QUERY_TIMEOUT_SECONDS if timeout is None else timeout
         start_time = time.time()
-        
+
+        use_cache = use_cache and settings.RESULT_CACHE_ENABLED
+        if use_cache:
+            fingerprint, cached = result_cache.lookup(sql_query)
+            if metadata is not None:
+                metadata["result_cache"] = {"hit": cached is not None, "fingerprint": fingerprint}
+            if cached is not None:
+                logger.info(f"Result cache hit ({fingerprint}), age {cached['age_seconds']}s")
+                if metadata is not None:
+                    metadata["result_cache"].update({
+                        "age_seconds": cached["age_seconds"],
+                        "original_execution_time_ms": cached["execution_time_ms"]
+                    })
+                return cached["results"], (time.time() - start_time) * 1000
+
         try:
-            logger.info(f"Executing query: {sql_query}")
-            
-            with engine.connect() as conn:
-                result = conn.execute(text(sql_query))
-                
-                # Convert to list of dictionaries
-                columns = result.keys()
-                rows = result.fetchall()
-                
-                results = [dict(zip(columns, row)) for row in rows]
-                
-                execution_time_ms = (time.time() - start_time) * 1000
-                
-                logger.info(f"Query executed successfully. Rows: {len(results)}, Time: {execution_time_ms:.2f}ms")
-                
-                return results, execution_time_ms
-                
-        except Exception as e:
+            engine, routing = await database_router.engine_for(route)
+            if metadata is not None:
+                metadata["database_route"] = routing
+            logger.info(f"Executing query ({routing['target']}): {sql_query}")
+
+            async with engine.connect() as conn:
+                thread_id = await self._server_thread_id(conn)
+                try:
+                    results = await asyncio.wait_for(self._fetch_all(conn, sql_query), timeout=timeout or None)
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    await self._kill_query(thread_id, engine)
+                    await conn.invalidate()
+                    raise
+
             execution_time_ms = (time.time() - start_time) * 1000
+
+            logger.info(f"Query executed successfully. Rows: {len(results)}, Time: {execution_time_ms:.2f}ms")
+
+            if use_cache:
+                # Replica rows are as of lag_seconds before the query started (plus however much the
+                # lag grew since it was sampled): a change seen in that window keeps them out of the cache
+                data_as_of = start_time
+                if routing["target"] == "replica":
+                    data_as_of -= (routing["lag_seconds"] or 0) + database_router.check_interval_seconds
+                result_cache.store(sql_query, results, execution_time_ms, started_at=data_as_of)
+            index_advisor.observe(sql_query, execution_time_ms, plan_rows=plan_rows)
+
+            return results, execution_time_ms
+
+        except asyncio.TimeoutError:
+            logger.warning(f"Query timed out after {timeout}s: {sql_query}")
+            raise QueryTimeout(f"Database query timed out after {timeout:g}s")
+        except asyncio.CancelledError:
+            logger.info(f"Query cancelled after {(time.time() - start_time) * 1000:.2f}ms")
+            raise
+        except Exception as e:
             logger.error(f"Query execution failed: {e}")
             raise Exception(f"Database query failed: {str(e)}")
-    
+
+    def stream_query(self, sql_query: str, **limits) -> ResultStream:
+        """
+        Prepare a streaming execution of a query (see ResultStream)
+
+        Args:
+            sql_query: SQL query to execute
+            **limits: Optional chunk_size, max_rows, max_bytes, sample_size, timeout overrides
+                and route
+
+        Returns:
+            ResultStream; iterate stream.chunks() to run the query
+        """
+        return ResultStream(sql_query, **limits)
+
     async def get_table_info(self, table_name: str) -> List[Dict[str, Any]]:
         """Get schema information for a table"""
         query = f"DESCRIBE {table_name}"
@@ -57,12 +293,12 @@ class DatabaseService:
         except Exception as e:
             logger.error(f"Failed to get table info for {table_name}: {e}")
             return []
-    
+
     async def test_connection(self) -> bool:
         """Test database connection"""
         try:
             query = "SELECT 1 as test"
-            results, _ = await self.execute_query(query)
+            results, _ = await self.execute_query(query, timeout=settings.DB_HEALTH_CHECK_TIMEOUT_SECONDS)
             return len(results) > 0
         except Exception as e:
             logger.error(f"Database connection test failed: {e}")
@@ -71,4 +307,3 @@ class DatabaseService:
 
 # Create singleton instance
 database_service = DatabaseService()
-
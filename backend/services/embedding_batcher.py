@@ -0,0 +1,123 @@
+"""
+Micro-batching dispatcher for embedding requests
+
+Single-text embed calls arriving from concurrent threads are queued, collected
+for a short window (or until the batch is full) and sent to the embeddings API
+as one array request. Each caller blocks only on its own future.
+"""
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Collects concurrent single-text embedding requests into batched API calls"""
+
+    def __init__(
+        self,
+        create_batch: Callable[[List[str]], List[List[float]]],
+        window_ms: Optional[float] = None,
+        max_batch: Optional[int] = None
+    ):
+        """
+        Args:
+            create_batch: Function embedding a list of texts, returning vectors in order
+            window_ms: How long to wait for more requests after the first one arrives
+            max_batch: Maximum number of texts per API call
+        """
+        self.create_batch = create_batch
+        self.window_ms = window_ms if window_ms is not None else settings.EMBEDDING_BATCH_WINDOW_MS
+        self.max_batch = max_batch or settings.EMBEDDING_BATCH_MAX_SIZE
+
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.batches = 0
+        self.requests = 0
+        self.api_texts = 0
+        self.failures = 0
+        self.total_queue_delay_ms = 0.0
+        self.max_queue_delay_ms = 0.0
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def embed(self, text: str) -> List[float]:
+        """Embed one text through the batcher, blocking until its batch completes"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        """Block for the first request, then gather more until the window closes or the batch is full"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            dispatched_at = time.perf_counter()
+
+            # Identical texts in one window share a single slot in the API request
+            unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+
+            try:
+                vectors = self.create_batch(unique_texts)
+                by_text = dict(zip(unique_texts, vectors))
+                for text, future, _ in batch:
+                    future.set_result(by_text[text])
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(unique_texts)} texts failed: {e}")
+                with self._stats_lock:
+                    self.failures += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+
+            delays = [(dispatched_at - enqueued_at) * 1000 for _, _, enqueued_at in batch]
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.api_texts += len(unique_texts)
+                self.total_queue_delay_ms += sum(delays)
+                self.max_queue_delay_ms = max(self.max_queue_delay_ms, max(delays))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batch fill and queueing delay metrics"""
+        with self._stats_lock:
+            return {
+                "window_ms": self.window_ms,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "requests": self.requests,
+                "api_texts": self.api_texts,
+                "failures": self.failures,
+                "queued": self._queue.qsize(),
+                "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "avg_batch_fill": round(self.api_texts / (self.batches * self.max_batch), 4) if self.batches else 0.0,
+                "avg_queue_delay_ms": round(self.total_queue_delay_ms / self.requests, 3) if self.requests else 0.0,
+                "max_queue_delay_ms": round(self.max_queue_delay_ms, 3)
+            }
@@ -0,0 +1,204 @@
+"""
+Two-tier cache for text embeddings
+
+Tier 1 is an in-memory LRU, tier 2 a SQLite file on disk. Entries are keyed by
+(model, dimensions, hash of the normalized text), so changing EMBEDDING_MODEL
+or EMBEDDING_DIMENSIONS never serves a stale vector.
+"""
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for cache keys (trim, collapse whitespace, case-fold)"""
+    return re.sub(r"\s+", " ", text.strip()).casefold()
+
+
+class EmbeddingCache:
+    """In-memory LRU backed by a size-bounded on-disk SQLite store"""
+
+    def __init__(
+        self,
+        model: str,
+        dimensions: int,
+        path: Optional[str] = None,
+        memory_items: Optional[int] = None,
+        disk_items: Optional[int] = None
+    ):
+        self.model = model
+        self.dimensions = dimensions
+        self.path = path or settings.EMBEDDING_CACHE_PATH
+        self.memory_items = memory_items or settings.EMBEDDING_CACHE_MEMORY_ITEMS
+        self.disk_items = disk_items or settings.EMBEDDING_CACHE_DISK_ITEMS
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+        self._open_disk_store()
+
+    # ==================== Disk Store ====================
+
+    def _open_disk_store(self):
+        """Open the SQLite store and drop entries written for another model/dimension"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_meta (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+
+            signature = f"{self.model}:{self.dimensions}"
+            row = self._conn.execute("SELECT value FROM cache_meta WHERE name = 'signature'").fetchone()
+            if row and row[0] != signature:
+                deleted = self._conn.execute("DELETE FROM embeddings").rowcount
+                logger.info(f"Embedding settings changed ({row[0]} -> {signature}), invalidated {deleted} cached vectors")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_meta (name, value) VALUES ('signature', ?)",
+                (signature,)
+            )
+            self._conn.commit()
+
+        except Exception as e:
+            logger.warning(f"Embedding disk cache unavailable, using memory only: {e}")
+            self._conn = None
+
+    def _disk_get(self, key: str) -> Optional[List[float]]:
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE embeddings SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def _disk_put(self, key: str, vector: List[float]):
+        if self._conn is None:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+            (key, array("f", vector).tobytes(), time.time())
+        )
+
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.disk_items:
+            # Evict the least recently used 10% in one pass to amortize the delete
+            overflow = count - self.disk_items + max(1, self.disk_items // 10)
+            self._conn.execute("""
+                DELETE FROM embeddings WHERE key IN (
+                    SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?
+                )
+            """, (overflow,))
+            self.disk_evictions += overflow
+        self._conn.commit()
+
+    # ==================== Public API ====================
+
+    def make_key(self, text: str) -> str:
+        """Build the cache key for a text under the current model and dimensions"""
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.model}:{self.dimensions}:{digest}"
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Look up an embedding, promoting disk hits into memory"""
+        key = self.make_key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+            try:
+                vector = self._disk_get(key)
+            except Exception as e:
+                logger.warning(f"Embedding disk cache read failed: {e}")
+                vector = None
+
+            if vector is not None:
+                self.disk_hits += 1
+                self._memory_put(key, vector)
+                return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vector: List[float]):
+        """Store an embedding in both tiers"""
+        key = self.make_key(text)
+        with self._lock:
+            self._memory_put(key, vector)
+            try:
+                self._disk_put(key, vector)
+            except Exception as e:
+                logger.warning(f"Embedding disk cache write failed: {e}")
+
+    def _memory_put(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self.memory_evictions += 1
+
+    def clear(self):
+        """Drop all cached embeddings from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss counters and sizes"""
+        with self._lock:
+            disk_size = 0
+            if self._conn is not None:
+                disk_size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model": self.model,
+                "dimensions": self.dimensions,
+                "memory_size": len(self._memory),
+                "memory_capacity": self.memory_items,
+                "disk_size": disk_size,
+                "disk_capacity": self.disk_items,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions
+            }
@@ -2,14 +2,18 @@
 Embedding Service for generating vector embeddings using OpenAI
 """
 import logging
-from typing import List, Optional
-from openai import OpenAI
+from typing import List, Optional, Dict, Any
+from openai import OpenAI, RateLimitError
 from backend.config import settings
+from backend.services.embedding_cache import EmbeddingCache
+from backend.services.embedding_batcher import EmbeddingBatcher
+from backend.services.openai_scheduler import openai_scheduler, Priority, RateLimitExceeded
+from backend.utils.token_counter import count_tokens
 
 logger = logging.getLogger(__name__)
 
 # Initialize OpenAI client
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
 
 
 class EmbeddingService:
@@ -20,6 +24,14 @@ class EmbeddingService:
         self.dimensions = settings.EMBEDDING_DIMENSIONS
         # Check if dimensions parameter is supported (OpenAI client >= 1.10.0)
         self._supports_dimensions = self._check_dimensions_support()
+        # Cache is keyed by model + dimensions, so settings changes invalidate it automatically
+        self.cache: Optional[EmbeddingCache] = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            self.cache = EmbeddingCache(self.model, self.dimensions)
+        # Cache misses from concurrent callers are coalesced into batched API calls
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if settings.EMBEDDING_BATCH_ENABLED:
+            self.batcher = EmbeddingBatcher(self._embed_texts)
 
     def _check_dimensions_support(self) -> bool:
         """Check if the OpenAI client supports the dimensions parameter"""
@@ -32,20 +44,30 @@ class EmbeddingService:
         except Exception:
             return False
 
-    def _create_embedding(self, input_data):
+    def _create_embedding(self, input_data, priority: Priority = Priority.INTERACTIVE):
         """Create embedding with or without dimensions based on API support"""
-        if self._supports_dimensions and self.model.startswith("text-embedding-3"):
-            return client.embeddings.create(
-                model=self.model,
-                input=input_data,
-                dimensions=self.dimensions
-            )
-        else:
-            # Fallback for older API versions or models that don't support dimensions
-            return client.embeddings.create(
-                model=self.model,
-                input=input_data
-            )
+        texts = input_data if isinstance(input_data, list) else [input_data]
+        openai_scheduler.acquire_sync("embeddings", sum(count_tokens(t, self.model) for t in texts), priority)
+        try:
+            if self._supports_dimensions and self.model.startswith("text-embedding-3"):
+                return client.embeddings.create(
+                    model=self.model,
+                    input=input_data,
+                    dimensions=self.dimensions
+                )
+            else:
+                # Fallback for older API versions or models that don't support dimensions
+                return client.embeddings.create(
+                    model=self.model,
+                    input=input_data
+                )
+        except RateLimitError as e:
+            raise RateLimitExceeded(f"OpenAI embeddings rate limit reached: {e}")
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts in one API call, returning vectors in input order"""
+        response = self._create_embedding(texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
 
     def embed_text(self, text: str) -> List[float]:
         """
@@ -64,9 +86,24 @@ class EmbeddingService:
                 logger.warning("Empty text provided for embedding")
                 return [0.0] * self.dimensions
 
-            response = self._create_embedding(text)
-            return response.data[0].embedding
+            if self.cache is not None:
+                cached = self.cache.get(text)
+                if cached is not None:
+                    return cached
+
+            if self.batcher is not None:
+                embedding = self.batcher.embed(text)
+            else:
+                response = self._create_embedding(text)
+                embedding = response.data[0].embedding
+
+            if self.cache is not None:
+                self.cache.put(text, embedding)
 
+            return embedding
+
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise Exception(f"Failed to generate embedding: {str(e)}")
@@ -91,17 +128,30 @@ class EmbeddingService:
             if not cleaned_texts:
                 return []
 
-            all_embeddings = []
+            all_embeddings: List[Optional[List[float]]] = [None] * len(cleaned_texts)
+
+            # Serve what we can from the cache and only embed the misses
+            missing_indexes = []
+            for idx, text in enumerate(cleaned_texts):
+                cached = self.cache.get(text) if self.cache is not None else None
+                if cached is not None:
+                    all_embeddings[idx] = cached
+                else:
+                    missing_indexes.append(idx)
 
             # Process in batches to avoid API limits
-            for i in range(0, len(cleaned_texts), batch_size):
-                batch = cleaned_texts[i:i + batch_size]
+            for i in range(0, len(missing_indexes), batch_size):
+                batch_indexes = missing_indexes[i:i + batch_size]
+                batch = [cleaned_texts[idx] for idx in batch_indexes]
 
-                response = self._create_embedding(batch)
+                # Bulk (indexing) embeddings yield to interactive traffic
+                response = self._create_embedding(batch, priority=Priority.BACKGROUND)
 
                 # Extract embeddings in order
-                batch_embeddings = [item.embedding for item in response.data]
-                all_embeddings.extend(batch_embeddings)
+                for idx, item in zip(batch_indexes, response.data):
+                    all_embeddings[idx] = item.embedding
+                    if self.cache is not None:
+                        self.cache.put(cleaned_texts[idx], item.embedding)
 
                 logger.info(f"Embedded batch {i // batch_size + 1}, {len(batch)} texts")
 
@@ -115,6 +165,18 @@ class EmbeddingService:
         """Get the dimension of embeddings"""
         return self.dimensions
 
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get embedding cache statistics"""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.get_stats()}
+
+    def get_batch_stats(self) -> Dict[str, Any]:
+        """Get micro-batching dispatcher statistics"""
+        if self.batcher is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.batcher.get_stats()}
+
 
 # Create singleton instance
 embedding_service = EmbeddingService()
@@ -0,0 +1,212 @@
+"""
+Deferred explanation service
+
+Generates result explanations off the request's critical path. Each job runs
+as a background task bounded by a semaphore; finished explanations are kept
+in a TTL + LRU cache and can be fetched (or long-polled) by handle.
+"""
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from backend.config import settings
+from backend.services.openai_service import openai_service
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+class ExplanationService:
+    """Background explanation jobs with bounded concurrency and a result cache"""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.max_concurrency = max_concurrency or settings.EXPLANATION_MAX_CONCURRENCY
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.EXPLANATION_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.EXPLANATION_CACHE_MAX_ENTRIES
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_content: Dict[str, str] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.submitted = 0
+        self.reused = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent background explanation calls"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @staticmethod
+    def _content_key(user_query: str, results: list, sql_query: Optional[str], total_count: Optional[int] = None) -> str:
+        """Key identical (question, SQL, results) triples to one explanation"""
+        payload = json.dumps([user_query, sql_query, results, total_count], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expire(self, now: float):
+        """Drop finished entries older than the TTL and trim to max_entries"""
+        expired = [
+            key for key, entry in self._entries.items()
+            if entry["status"] != STATUS_PENDING and now - entry["created_at"] > self.ttl_seconds
+        ]
+        for key in expired:
+            self._drop(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            if self._entries[oldest]["status"] == STATUS_PENDING:
+                break
+            self._drop(oldest)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry and self._by_content.get(entry["content_key"]) == key:
+            del self._by_content[entry["content_key"]]
+
+    def submit(
+        self,
+        user_query: str,
+        results: list,
+        sql_query: Optional[str] = None,
+        total_count: Optional[int] = None
+    ) -> str:
+        """
+        Schedule an explanation in the background
+
+        Args:
+            user_query: Original user query
+            results: Query results to explain (or a bounded sample of them)
+            sql_query: The SQL query that was executed
+            total_count: Total row count when results is a sample
+
+        Returns:
+            Explanation handle for get()/wait()
+        """
+        now = time.time()
+        self._expire(now)
+
+        content_key = self._content_key(user_query, results, sql_query, total_count)
+        existing = self._by_content.get(content_key)
+        if existing and self._entries.get(existing, {}).get("status") != STATUS_FAILED:
+            self._entries.move_to_end(existing)
+            self.reused += 1
+            return existing
+
+        explanation_id = uuid.uuid4().hex
+        self._entries[explanation_id] = {
+            "status": STATUS_PENDING,
+            "explanation": None,
+            "error": None,
+            "content_key": content_key,
+            "created_at": now,
+            "completed_at": None,
+            "event": asyncio.Event()
+        }
+        self._by_content[content_key] = explanation_id
+        self._tasks[explanation_id] = asyncio.create_task(
+            self._run(explanation_id, user_query, results, sql_query, total_count)
+        )
+        self.submitted += 1
+        return explanation_id
+
+    async def _run(
+        self,
+        explanation_id: str,
+        user_query: str,
+        results: list,
+        sql_query: Optional[str],
+        total_count: Optional[int]
+    ):
+        entry = self._entries[explanation_id]
+        try:
+            async with self.semaphore:
+                entry["explanation"] = await openai_service.explain_results(
+                    user_query, results, sql_query, total_count, raise_errors=True
+                )
+            entry["status"] = STATUS_READY
+            self.completed += 1
+        except Exception as e:
+            logger.error(f"Deferred explanation {explanation_id} failed: {e}")
+            entry["status"] = STATUS_FAILED
+            entry["error"] = str(e)
+            self.failed += 1
+        finally:
+            entry["completed_at"] = time.time()
+            entry["event"].set()
+            self._tasks.pop(explanation_id, None)
+
+    def get(self, explanation_id: str) -> Optional[Dict[str, Any]]:
+        """Get the current state of an explanation, or None if unknown/expired"""
+        entry = self._entries.get(explanation_id)
+        if entry is None:
+            return None
+        return {
+            "id": explanation_id,
+            "status": entry["status"],
+            "explanation": entry["explanation"],
+            "error": entry["error"]
+        }
+
+    async def wait(self, explanation_id: str, timeout: float = 0) -> Optional[Dict[str, Any]]:
+        """
+        Get an explanation, waiting up to timeout seconds for it to finish
+
+        Args:
+            explanation_id: Handle returned by submit()
+            timeout: Seconds to long-poll while the explanation is pending
+
+        Returns:
+            Explanation state (see get()) or None if unknown/expired
+        """
+        entry = self._entries.get(explanation_id)
+        if entry is None:
+            return None
+        if entry["status"] == STATUS_PENDING and timeout > 0:
+            try:
+                await asyncio.wait_for(entry["event"].wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(explanation_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get job and cache statistics"""
+        pending = sum(1 for entry in self._entries.values() if entry["status"] == STATUS_PENDING)
+        return {
+            "size": len(self._entries),
+            "pending": pending,
+            "max_entries": self.max_entries,
+            "max_concurrency": self.max_concurrency,
+            "ttl_seconds": self.ttl_seconds,
+            "submitted": self.submitted,
+            "reused": self.reused,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+    async def close(self):
+        """Cancel explanation jobs that are still running"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Create singleton instance
+explanation_service = ExplanationService()
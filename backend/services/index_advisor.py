@@ -0,0 +1,504 @@
+"""
+EXPLAIN-driven index advisor over the generated-query workload
+
+Every SELECT run through DatabaseService.execute_query is observed: its
+fingerprint and execution time are counted, and its EXPLAIN plan is recorded
+(at most once per fingerprint per INDEX_ADVISOR_EXPLAIN_INTERVAL_SECONDS,
+reusing the plan the cost guard already fetched when the caller passes it). Each table access is reduced
+to a predicate shape (equality, range, join, ORDER BY and GROUP BY columns)
+and flagged for full scans, filesorts and temporary tables. Observations are
+persisted in SQLite so the report covers the workload across restarts and
+workers. The report ranks candidate indexes by estimated impact: executions
+x rows examined of the flagged accesses they would serve.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.scope import traverse_scope, Scope
+
+from backend.config import settings
+from backend.utils.schema_catalog import schema_catalog
+from backend.utils.sql_fingerprint import fingerprint_sql, referenced_tables
+from backend.utils.sql_safety import parse_single_statement
+
+logger = logging.getLogger(__name__)
+
+QUERY_PREFIX = re.compile(r"^\s*(?:\(\s*)*(?:SELECT|WITH)\b", re.I)
+MAX_INDEX_COLUMNS = 4
+# In-memory bookkeeping (last EXPLAIN time, plans offered by the cost guard) is LRU-capped
+MAX_TRACKED_FINGERPRINTS = 5000
+SHAPE_KINDS = ("eq", "join", "range", "like", "order", "group")
+RANGE_EXPRESSIONS = (exp.GT, exp.GTE, exp.LT, exp.LTE, exp.Between)
+EQUALITY_EXPRESSIONS = (exp.EQ, exp.NullSafeEQ, exp.In, exp.Is)
+
+
+# ==================== Predicate Shapes ====================
+
+def _scope_tables(scope: Scope) -> Dict[str, str]:
+    """Alias -> table for the physical tables a scope reads directly (CTEs and derived tables excluded)"""
+    return {
+        alias.lower(): source.name.lower()
+        for alias, source in scope.sources.items()
+        if isinstance(source, exp.Table) and source.name
+    }
+
+
+def _resolver(scope: Scope):
+    """
+    Build a function mapping a column node to (table, column) within one scope
+
+    Qualified columns resolve through the aliases of the scope and then of the
+    enclosing scopes (correlated subqueries); unqualified ones through the
+    schema catalog, innermost scope first, as MySQL does.
+    """
+    chain: List[Dict[str, str]] = []
+    current: Optional[Scope] = scope
+    while current is not None:
+        chain.append(_scope_tables(current))
+        current = current.parent
+
+    def resolve(column: exp.Column) -> Optional[Tuple[str, str]]:
+        name = column.name.lower()
+        if not name or name == "*":
+            return None
+        qualifier = column.table.lower()
+        for aliases in chain:
+            if qualifier:
+                if qualifier in aliases:
+                    return aliases[qualifier], name
+                continue
+            tables = set(aliases.values())
+            owners = [table for table in tables if schema_catalog.has_column(table, name)]
+            if len(owners) == 1:
+                return owners[0], name
+            if len(owners) > 1:
+                return None
+            if len(tables) == 1 and aliases is chain[0]:
+                return next(iter(tables)), name
+        return None
+
+    return resolve
+
+
+def _columns(node: exp.Expression) -> List[exp.Column]:
+    return [node] if isinstance(node, exp.Column) else list(node.find_all(exp.Column))
+
+
+def _own(node: exp.Expression, select: exp.Expression) -> bool:
+    """Whether a node belongs to the SELECT itself rather than a subquery nested in it"""
+    return node.find_ancestor(exp.Select) is select
+
+
+def extract_predicate_shapes(tree: exp.Expression) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Reduce a SELECT to per-table predicate shapes
+
+    Each SELECT (including subqueries, CTEs and derived tables) is resolved in
+    its own scope. col IN (subquery) is a semi-join, so it is recorded as a
+    join between col and the subquery's selected column.
+
+    Returns:
+        {table: {"eq": [...], "join": [...], "range": [...], "like": [...], "order": [...], "group": [...]}}
+        with sorted, de-duplicated column names (ORDER BY keeps its order)
+    """
+    scopes = [scope for scope in traverse_scope(tree) if isinstance(scope.expression, exp.Select)]
+    resolvers = {id(scope.expression): _resolver(scope) for scope in scopes}
+    tables = {table for scope in scopes for table in _scope_tables(scope).values()}
+    shapes: Dict[str, Dict[str, List[str]]] = {table: {kind: [] for kind in SHAPE_KINDS} for table in tables}
+
+    def add(kind: str, column: exp.Column, resolve):
+        resolved = resolve(column)
+        if resolved and resolved[0] in shapes and resolved[1] not in shapes[resolved[0]][kind]:
+            shapes[resolved[0]][kind].append(resolved[1])
+
+    for scope in scopes:
+        select = scope.expression
+        resolve = resolvers[id(select)]
+
+        for predicate in select.find_all(*EQUALITY_EXPRESSIONS, *RANGE_EXPRESSIONS, exp.Like):
+            if not _own(predicate, select):
+                continue
+            left = predicate.this
+            if not isinstance(left, exp.Column):
+                continue
+            right = predicate.expression if "expression" in predicate.args else None
+            query = predicate.args.get("query") if isinstance(predicate, exp.In) else None
+            if query is not None:
+                inner = query.this if isinstance(query, exp.Subquery) else query
+                add("join", left, resolve)
+                if isinstance(inner, exp.Select) and id(inner) in resolvers and len(inner.selects) == 1:
+                    selected = inner.selects[0].unalias()
+                    if isinstance(selected, exp.Column):
+                        add("join", selected, resolvers[id(inner)])
+            elif isinstance(predicate, EQUALITY_EXPRESSIONS) and isinstance(right, exp.Column):
+                # column = column: a join condition (ON or WHERE-style)
+                add("join", left, resolve)
+                add("join", right, resolve)
+            elif isinstance(predicate, exp.Like):
+                pattern = right.this if isinstance(right, exp.Literal) else ""
+                add("like" if str(pattern).startswith("%") else "range", left, resolve)
+            elif isinstance(predicate, RANGE_EXPRESSIONS):
+                add("range", left, resolve)
+            else:
+                add("eq", left, resolve)
+
+        for order in select.find_all(exp.Order):
+            if _own(order, select):
+                for ordered in order.expressions:
+                    for column in _columns(ordered):
+                        add("order", column, resolve)
+        for group in select.find_all(exp.Group):
+            if _own(group, select):
+                for expression in group.expressions:
+                    for column in _columns(expression):
+                        add("group", column, resolve)
+
+    for shape in shapes.values():
+        for kind in SHAPE_KINDS:
+            if kind != "order":
+                shape[kind].sort()
+    return shapes
+
+
+def shape_key(shape: Dict[str, List[str]]) -> str:
+    """Compact string form of a predicate shape, e.g. 'eq(status) range(created_at) order(created_at)'"""
+    return " ".join(f"{kind}({','.join(shape[kind])})" for kind in SHAPE_KINDS if shape.get(kind)) or "none"
+
+
+def candidate_columns(shape: Dict[str, List[str]]) -> List[str]:
+    """
+    Index columns that would serve a predicate shape
+
+    Equality and join columns first, then the first range column; with no
+    range predicate, ORDER BY (or else GROUP BY) columns so the index also
+    avoids the filesort / temporary table.
+    """
+    columns: List[str] = []
+    for column in shape.get("eq", []) + shape.get("join", []):
+        if column not in columns:
+            columns.append(column)
+    if shape.get("range"):
+        columns.append(shape["range"][0])
+    else:
+        for column in shape.get("order") or shape.get("group") or []:
+            if column not in columns:
+                columns.append(column)
+    return columns[:MAX_INDEX_COLUMNS]
+
+
+def _existing_indexes(table: str) -> List[List[str]]:
+    meta = schema_catalog.get_table(table)
+    if not meta:
+        return []
+    indexes = [[c.lower() for c in meta.get("primary_key") or []]]
+    indexes += [[c.lower() for c in index["columns"]] for index in meta.get("indexes", [])]
+    return [index for index in indexes if index]
+
+
+def _plan_accesses(plan_rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per-table flags and row estimates from tabular EXPLAIN output (keyed by table alias or name)"""
+    accesses: Dict[str, Dict[str, Any]] = {}
+    for row in plan_rows:
+        row = {str(key).lower(): value for key, value in row.items()}
+        table = row.get("table")
+        if not table or str(table).startswith("<"):
+            continue
+        extra = str(row.get("extra") or "")
+        try:
+            rows = int(float(row.get("rows") or 0))
+        except (TypeError, ValueError):
+            rows = 0
+        access = accesses.setdefault(str(table).lower(), {
+            "full_scan": False, "filesort": False, "temporary": False, "rows": 0, "key": None
+        })
+        access["full_scan"] |= row.get("type") == "ALL"
+        access["filesort"] |= "filesort" in extra.lower()
+        access["temporary"] |= "temporary" in extra.lower()
+        access["rows"] = max(access["rows"], rows)
+        access["key"] = access["key"] or row.get("key")
+    return accesses
+
+
+# ==================== Advisor ====================
+
+class IndexAdvisor:
+    """Records query fingerprints with EXPLAIN plans and recommends indexes"""
+
+    def __init__(self, path: Optional[str] = None, explain_interval_seconds: Optional[int] = None):
+        self.path = path or settings.INDEX_ADVISOR_PATH
+        self.explain_interval_seconds = (
+            explain_interval_seconds if explain_interval_seconds is not None
+            else settings.INDEX_ADVISOR_EXPLAIN_INTERVAL_SECONDS
+        )
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._explained_at: "OrderedDict[str, float]" = OrderedDict()
+        self._tasks: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.observed = 0
+        self.explained = 0
+        self.failures = 0
+
+        self._open_store()
+
+    def _open_store(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS queries (
+                    fingerprint TEXT PRIMARY KEY,
+                    sql TEXT NOT NULL,
+                    executions INTEGER NOT NULL DEFAULT 0,
+                    total_ms REAL NOT NULL DEFAULT 0,
+                    last_seen REAL NOT NULL,
+                    explained_at REAL,
+                    plan TEXT
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS table_accesses (
+                    fingerprint TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    shape TEXT NOT NULL,
+                    shape_json TEXT NOT NULL,
+                    full_scan INTEGER NOT NULL,
+                    filesort INTEGER NOT NULL,
+                    temporary INTEGER NOT NULL,
+                    rows_examined INTEGER NOT NULL,
+                    index_used TEXT,
+                    PRIMARY KEY (fingerprint, table_name)
+                )
+            """)
+            self._conn.commit()
+        except Exception as e:
+            logger.warning(f"Index advisor store unavailable: {e}")
+            self._conn = None
+
+    # ==================== Recording ====================
+
+    def observe(self, sql_query: str, execution_time_ms: float, plan_rows: Optional[List[Dict[str, Any]]] = None):
+        """
+        Record one execution of a query (non-blocking; runs in a background task)
+
+        Args:
+            sql_query: Executed SQL
+            execution_time_ms: How long it took
+            plan_rows: EXPLAIN output already fetched for the statement (e.g. by the
+                cost guard), used instead of running EXPLAIN again
+        """
+        if not settings.INDEX_ADVISOR_ENABLED or self._conn is None:
+            return
+        if not QUERY_PREFIX.match(sql_query):
+            # EXPLAIN / SHOW / DESCRIBE (e.g. the advisor's and cost guard's own)
+            return
+        try:
+            tree, _ = parse_single_statement(sql_query)
+        except SqlglotError:
+            return
+        if not isinstance(tree, (exp.Select, exp.Union)) or not referenced_tables(tree):
+            return
+        task = asyncio.create_task(self._observe(sql_query, tree, execution_time_ms, plan_rows))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _observe(
+        self,
+        sql_query: str,
+        tree: exp.Expression,
+        execution_time_ms: float,
+        plan_rows: Optional[List[Dict[str, Any]]]
+    ):
+        fingerprint, normalized, _, _ = fingerprint_sql(sql_query)
+        try:
+            now = time.time()
+            self.observed += 1
+            await asyncio.to_thread(self._record_execution, fingerprint, normalized, execution_time_ms, now)
+
+            if now - self._explained_at.get(fingerprint, 0) < self.explain_interval_seconds:
+                return
+            self._explained_at[fingerprint] = now
+            self._explained_at.move_to_end(fingerprint)
+            while len(self._explained_at) > MAX_TRACKED_FINGERPRINTS:
+                self._explained_at.popitem(last=False)
+
+            if plan_rows is None:
+                from backend.services.database_service import database_service
+                from backend.services.database_router import QueryRoute
+                if self._semaphore is None:
+                    self._semaphore = asyncio.Semaphore(2)
+                async with self._semaphore:
+                    plan_rows, _ = await database_service.execute_query(
+                        f"EXPLAIN {sql_query}", timeout=settings.DB_HEALTH_CHECK_TIMEOUT_SECONDS,
+                        route=QueryRoute.ANALYTICS
+                    )
+            self.explained += 1
+            await asyncio.to_thread(self._record_plan, fingerprint, tree, plan_rows, now)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Index advisor failed to record {fingerprint}: {e}")
+
+    def _record_execution(self, fingerprint: str, normalized: str, execution_time_ms: float, now: float):
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO queries (fingerprint, sql, executions, total_ms, last_seen)
+                VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    executions = executions + 1,
+                    total_ms = total_ms + excluded.total_ms,
+                    last_seen = excluded.last_seen
+            """, (fingerprint, normalized, execution_time_ms, now))
+            self._conn.commit()
+
+    def _record_plan(self, fingerprint: str, tree: exp.Expression, plan_rows: List[Dict[str, Any]], now: float):
+        shapes = extract_predicate_shapes(tree)
+        accesses = _plan_accesses(plan_rows)
+        # EXPLAIN reports aliases; map them back to table names
+        aliases = {t.alias_or_name.lower(): t.name.lower() for t in tree.find_all(exp.Table) if t.name}
+        for table in shapes:
+            aliases.setdefault(table, table)
+        by_table: Dict[str, Dict[str, Any]] = {}
+        for alias, access in accesses.items():
+            table = aliases.get(alias, alias)
+            merged = by_table.setdefault(table, dict(access))
+            for flag in ("full_scan", "filesort", "temporary"):
+                merged[flag] = merged[flag] or access[flag]
+            merged["rows"] = max(merged["rows"], access["rows"])
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE queries SET explained_at = ?, plan = ? WHERE fingerprint = ?",
+                (now, json.dumps(plan_rows, default=str), fingerprint)
+            )
+            self._conn.execute("DELETE FROM table_accesses WHERE fingerprint = ?", (fingerprint,))
+            for table, shape in shapes.items():
+                access = by_table.get(table, {})
+                self._conn.execute("""
+                    INSERT INTO table_accesses
+                    (fingerprint, table_name, shape, shape_json, full_scan, filesort, temporary, rows_examined, index_used)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    fingerprint, table, shape_key(shape), json.dumps(shape),
+                    int(access.get("full_scan", False)), int(access.get("filesort", False)),
+                    int(access.get("temporary", False)), int(access.get("rows", 0)), access.get("key")
+                ))
+            self._conn.commit()
+
+    # ==================== Reporting ====================
+
+    def report(self, limit: int = 20) -> Dict[str, Any]:
+        """
+        Aggregate the workload by table and predicate shape and rank candidate indexes
+
+        Args:
+            limit: Maximum number of candidate indexes to return
+
+        Returns:
+            Dict with workload totals, flagged shapes and ranked candidates
+        """
+        if self._conn is None:
+            return {"enabled": False, "candidates": [], "shapes": []}
+
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT a.table_name, a.shape, a.shape_json, a.full_scan, a.filesort, a.temporary,
+                       a.rows_examined, a.index_used, q.fingerprint, q.executions, q.total_ms, q.sql
+                FROM table_accesses a JOIN queries q ON q.fingerprint = a.fingerprint
+            """).fetchall()
+            totals = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(executions), 0), COALESCE(SUM(total_ms), 0) FROM queries"
+            ).fetchone()
+
+        shapes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for (table, shape, shape_json, full_scan, filesort, temporary,
+             rows_examined, index_used, fingerprint, executions, total_ms, sql) in rows:
+            entry = shapes.setdefault((table, shape), {
+                "table": table,
+                "shape": shape,
+                "predicates": json.loads(shape_json),
+                "fingerprints": 0,
+                "executions": 0,
+                "total_ms": 0.0,
+                "full_scans": 0,
+                "filesorts": 0,
+                "temporary_tables": 0,
+                "impact": 0,
+                "indexes_used": set(),
+                "example_sql": sql
+            })
+            entry["fingerprints"] += 1
+            entry["executions"] += executions
+            entry["total_ms"] += total_ms
+            entry["full_scans"] += executions if full_scan else 0
+            entry["filesorts"] += executions if filesort else 0
+            entry["temporary_tables"] += executions if temporary else 0
+            if full_scan or filesort or temporary:
+                entry["impact"] += executions * max(rows_examined, 1)
+            if index_used:
+                entry["indexes_used"].add(index_used)
+
+        flagged = [entry for entry in shapes.values() if entry["impact"]]
+        for entry in shapes.values():
+            entry["indexes_used"] = sorted(entry["indexes_used"])
+            entry["total_ms"] = round(entry["total_ms"], 2)
+
+        # Shapes that map to the same index are merged into one candidate
+        candidates: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+        for entry in flagged:
+            columns = candidate_columns(entry["predicates"])
+            if not columns:
+                continue
+            existing = _existing_indexes(entry["table"])
+            if any(index[:len(columns)] == columns for index in existing):
+                continue
+            key = (entry["table"], tuple(columns))
+            candidate = candidates.setdefault(key, {
+                "table": entry["table"],
+                "columns": columns,
+                "ddl": f"CREATE INDEX idx_{entry['table']}_{'_'.join(columns)} ON {entry['table']} ({', '.join(columns)})",
+                "impact": 0,
+                "executions": 0,
+                "shapes": [],
+                "existing_indexes": [index for index in existing if index[0] == columns[0]],
+                "example_sql": entry["example_sql"]
+            })
+            candidate["impact"] += entry["impact"]
+            candidate["executions"] += entry["executions"]
+            candidate["shapes"].append(entry["shape"])
+
+        ranked = sorted(candidates.values(), key=lambda c: c["impact"], reverse=True)[:limit]
+        return {
+            "enabled": settings.INDEX_ADVISOR_ENABLED,
+            "workload": {
+                "fingerprints": totals[0],
+                "executions": totals[1],
+                "total_ms": round(totals[2], 2)
+            },
+            "flagged_shapes": sorted(flagged, key=lambda e: e["impact"], reverse=True)[:limit],
+            "candidates": ranked
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.INDEX_ADVISOR_ENABLED and self._conn is not None,
+            "observed": self.observed,
+            "explained": self.explained,
+            "failures": self.failures,
+            "pending": len(self._tasks)
+        }
+
+
+# Create singleton instance
+index_advisor = IndexAdvisor()
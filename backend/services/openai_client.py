@@ -0,0 +1,163 @@
+"""
+Shared async OpenAI transport
+
+All chat completions go through a single AsyncOpenAI client so that one
+uvicorn worker can overlap many in-flight LLM calls over a pooled set of
+HTTP connections instead of blocking the event loop on each round-trip.
+"""
+import asyncio
+import logging
+from typing import List, Optional, AsyncIterator
+
+import httpx
+from openai import AsyncOpenAI, RateLimitError
+
+from backend.config import settings
+from backend.services.openai_scheduler import openai_scheduler, Priority, RateLimitExceeded
+from backend.utils.token_counter import count_message_tokens, count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAITransport:
+    """Async OpenAI client with a shared connection pool and bounded concurrency"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        self.api_key = api_key or settings.OPENAI_API_KEY
+        self.base_url = base_url or settings.OPENAI_BASE_URL
+        self.max_concurrency = max_concurrency or settings.OPENAI_MAX_CONCURRENCY
+        self.timeout = timeout or settings.OPENAI_TIMEOUT_SECONDS
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Lazily create the AsyncOpenAI client (must happen inside the running loop's process)"""
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS)
+            )
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                max_retries=settings.OPENAI_MAX_RETRIES,
+                http_client=http_client
+            )
+        return self._client
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Semaphore bounding the number of concurrent LLM calls"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @staticmethod
+    def _estimate_tokens(kwargs: dict) -> int:
+        """Prompt tokens (tiktoken) plus the completion budget"""
+        prompt_tokens = count_message_tokens(kwargs.get("messages", []), kwargs.get("model"))
+        return prompt_tokens + (kwargs.get("max_tokens") or 0)
+
+    @staticmethod
+    def _rate_limited(error: RateLimitError) -> RateLimitExceeded:
+        """Translate an upstream 429 into the scheduler's error, keeping its Retry-After"""
+        retry_after = 1.0
+        try:
+            retry_after = float(error.response.headers.get("retry-after", retry_after))
+        except (AttributeError, TypeError, ValueError):
+            pass
+        return RateLimitExceeded(f"OpenAI rate limit reached: {error}", retry_after=retry_after)
+
+    async def chat_completion(self, priority: Priority = Priority.INTERACTIVE, **kwargs):
+        """
+        Create a chat completion without blocking the event loop
+
+        Args:
+            priority: Scheduling priority when capacity is contended
+            **kwargs: Arguments forwarded to client.chat.completions.create
+
+        Returns:
+            ChatCompletion response object
+
+        Raises:
+            RateLimitExceeded: When capacity is not available (maps to HTTP 429)
+        """
+        reserved = await openai_scheduler.acquire("chat", self._estimate_tokens(kwargs), priority)
+        async with self.semaphore:
+            self._in_flight += 1
+            try:
+                response = await self.client.chat.completions.create(**kwargs)
+            except RateLimitError as e:
+                raise self._rate_limited(e)
+            finally:
+                self._in_flight -= 1
+
+        usage = getattr(response, "usage", None)
+        openai_scheduler.settle("chat", reserved, usage.total_tokens if usage else None)
+        return response
+
+    async def stream_chat_completion(self, priority: Priority = Priority.INTERACTIVE, **kwargs) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, holding a concurrency slot until the stream ends
+
+        Args:
+            priority: Scheduling priority when capacity is contended
+            **kwargs: Arguments forwarded to client.chat.completions.create
+
+        Yields:
+            Content deltas as they arrive
+        """
+        reserved = await openai_scheduler.acquire("chat", self._estimate_tokens(kwargs), priority)
+        # Streamed responses carry no usage: settle with the prompt plus the tokens actually streamed
+        started = False
+        completion: List[str] = []
+        try:
+            async with self.semaphore:
+                self._in_flight += 1
+                try:
+                    stream = await self.client.chat.completions.create(stream=True, **kwargs)
+                    started = True
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            completion.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                except RateLimitError as e:
+                    raise self._rate_limited(e)
+                finally:
+                    self._in_flight -= 1
+        finally:
+            actual = 0
+            if started:
+                model = kwargs.get("model")
+                actual = count_message_tokens(kwargs.get("messages", []), model) + count_tokens("".join(completion), model)
+            openai_scheduler.settle("chat", reserved, actual)
+
+    def get_stats(self) -> dict:
+        """Get transport statistics"""
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout
+        }
+
+    async def close(self):
+        """Close the underlying HTTP connection pool"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# Create singleton instance
+openai_transport = OpenAITransport()
@@ -0,0 +1,308 @@
+"""
+Central rate-limit scheduler for OpenAI calls
+
+Every chat completion and embedding request reserves capacity here before it
+is sent. Each lane (chat, embeddings) keeps token buckets for requests per
+minute and tokens per minute; waiting requests are served strictly by
+priority (interactive SQL generation first, then explanations, then
+background indexing). When a lane's queue is too deep, or a request cannot be
+granted within the maximum wait, RateLimitExceeded is raised with a
+Retry-After hint instead of queueing indefinitely.
+"""
+import time
+import heapq
+import math
+import asyncio
+import logging
+import threading
+import itertools
+from enum import IntEnum
+from typing import Dict, Any, Optional, List
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Scheduling priority (lower is served first)"""
+    INTERACTIVE = 0
+    EXPLANATION = 1
+    BACKGROUND = 2
+
+
+class RateLimitExceeded(Exception):
+    """Raised when an OpenAI call cannot be scheduled within the rate limits"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """Per-minute budget that refills continuously (caller holds the scheduler lock)"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self, now: float):
+        if self.unlimited:
+            return
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def clamp(self, amount: float) -> float:
+        """Requests larger than the bucket would never fit; cap them at capacity"""
+        return amount if self.unlimited else min(amount, self.capacity)
+
+    def seconds_until(self, amount: float) -> float:
+        if self.unlimited:
+            return 0.0
+        deficit = self.clamp(amount) - self.available
+        return max(0.0, deficit / self.rate)
+
+    def consume(self, amount: float):
+        if not self.unlimited:
+            self.available -= self.clamp(amount)
+
+    def refund(self, amount: float):
+        if not self.unlimited:
+            self.available = min(self.capacity, self.available + amount)
+
+
+class _Waiter:
+    """A queued reservation, woken either through an asyncio future or a thread event"""
+
+    def __init__(self, tokens: int, priority: Priority, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.tokens = tokens
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.loop = loop
+        self.future: Optional[asyncio.Future] = loop.create_future() if loop else None
+        self.event: Optional[threading.Event] = None if loop else threading.Event()
+
+    def wake(self):
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+        else:
+            self.event.set()
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class Lane:
+    """Rate limits and priority queue for one class of API calls"""
+
+    def __init__(self, name: str, rpm: int, tpm: int):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.queue: List = []
+
+        self.granted = 0
+        self.rejected = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.granted_by_priority: Dict[str, int] = {p.name.lower(): 0 for p in Priority}
+
+    def seconds_until(self, tokens: int) -> float:
+        return max(self.requests.seconds_until(1), self.tokens.seconds_until(tokens))
+
+    def backlog_seconds(self, extra_tokens: int = 0) -> float:
+        """Estimated time until everything queued (plus extra_tokens) has been granted"""
+        queued = [entry[2] for entry in self.queue if not entry[2].cancelled]
+        need_requests = len(queued) + 1
+        need_tokens = sum(w.tokens for w in queued) + extra_tokens
+        waits = []
+        if not self.requests.unlimited:
+            waits.append(max(0.0, need_requests - self.requests.available) / self.requests.rate)
+        if not self.tokens.unlimited:
+            waits.append(max(0.0, need_tokens - self.tokens.available) / self.tokens.rate)
+        return max(waits) if waits else 0.0
+
+
+class OpenAIScheduler:
+    """Token-bucket rate limiter with priority queueing shared by all OpenAI calls"""
+
+    def __init__(
+        self,
+        max_queue: Optional[int] = None,
+        max_wait_seconds: Optional[float] = None
+    ):
+        self.max_queue = max_queue or settings.OPENAI_SCHEDULER_MAX_QUEUE
+        self.max_wait_seconds = max_wait_seconds or settings.OPENAI_SCHEDULER_MAX_WAIT_SECONDS
+        self.lanes: Dict[str, Lane] = {
+            "chat": Lane("chat", settings.OPENAI_RPM_LIMIT, settings.OPENAI_TPM_LIMIT),
+            "embeddings": Lane("embeddings", settings.OPENAI_EMBEDDING_RPM_LIMIT, settings.OPENAI_EMBEDDING_TPM_LIMIT)
+        }
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._timers: Dict[str, threading.Timer] = {}
+
+    def _enqueue(self, lane: Lane, tokens: int, priority: Priority, loop=None) -> _Waiter:
+        """Queue a reservation and grant whatever fits (raises when the queue is full)"""
+        with self._lock:
+            pending = sum(1 for entry in lane.queue if not entry[2].cancelled)
+            if pending >= self.max_queue:
+                lane.rejected += 1
+                raise RateLimitExceeded(
+                    f"OpenAI {lane.name} queue is full ({pending} waiting)",
+                    retry_after=lane.backlog_seconds(tokens)
+                )
+            waiter = _Waiter(tokens, priority, loop)
+            heapq.heappush(lane.queue, (int(priority), next(self._seq), waiter))
+            self._dispatch(lane)
+        return waiter
+
+    def _dispatch(self, lane: Lane):
+        """Grant queued reservations in priority order while capacity allows (caller holds the lock)"""
+        now = time.monotonic()
+        lane.requests.refill(now)
+        lane.tokens.refill(now)
+
+        while lane.queue:
+            waiter = lane.queue[0][2]
+            if waiter.cancelled:
+                heapq.heappop(lane.queue)
+                continue
+            wait = lane.seconds_until(waiter.tokens)
+            if wait > 0:
+                self._schedule_dispatch(lane, wait)
+                return
+            heapq.heappop(lane.queue)
+            lane.requests.consume(1)
+            lane.tokens.consume(waiter.tokens)
+            waiter.granted = True
+
+            waited_ms = (now - waiter.enqueued_at) * 1000
+            lane.granted += 1
+            lane.total_wait_ms += waited_ms
+            lane.max_wait_ms = max(lane.max_wait_ms, waited_ms)
+            lane.granted_by_priority[waiter.priority.name.lower()] += 1
+            waiter.wake()
+
+    def _schedule_dispatch(self, lane: Lane, delay: float):
+        """Re-run dispatch once the bucket has refilled enough for the head of the queue"""
+        fire_at = time.monotonic() + delay
+        timer = self._timers.get(lane.name)
+        if timer is not None and timer.is_alive():
+            if timer.fire_at <= fire_at:
+                return
+            timer.cancel()
+        timer = threading.Timer(delay + 0.001, self._on_timer, args=(lane,))
+        timer.fire_at = fire_at
+        timer.daemon = True
+        self._timers[lane.name] = timer
+        timer.start()
+
+    def _on_timer(self, lane: Lane):
+        with self._lock:
+            self._timers.pop(lane.name, None)
+            self._dispatch(lane)
+
+    def _abandon(self, lane: Lane, waiter: _Waiter, keep_if_granted: bool = False) -> bool:
+        """
+        Drop a reservation that timed out or was cancelled
+
+        Returns True when the reservation was granted in the meantime and kept
+        (keep_if_granted); otherwise capacity already granted is returned.
+        """
+        with self._lock:
+            if waiter.granted:
+                if keep_if_granted:
+                    return True
+                lane.requests.refund(1)
+                lane.tokens.refund(waiter.tokens)
+            waiter.cancelled = True
+            self._dispatch(lane)
+            return False
+
+    def _timeout_error(self, lane: Lane, waiter: _Waiter) -> RateLimitExceeded:
+        with self._lock:
+            lane.rejected += 1
+            retry_after = lane.backlog_seconds(waiter.tokens)
+        return RateLimitExceeded(
+            f"OpenAI {lane.name} capacity not available within {self.max_wait_seconds}s",
+            retry_after=retry_after
+        )
+
+    async def acquire(self, lane_name: str, tokens: int, priority: Priority = Priority.INTERACTIVE) -> int:
+        """
+        Reserve capacity for one request from async code
+
+        Args:
+            lane_name: "chat" or "embeddings"
+            tokens: Estimated tokens (prompt + max completion)
+            priority: Scheduling priority
+
+        Returns:
+            Number of tokens reserved (pass to settle() once actual usage is known)
+        """
+        lane = self.lanes[lane_name]
+        waiter = self._enqueue(lane, tokens, priority, loop=asyncio.get_running_loop())
+        if waiter.granted:
+            return tokens
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if not self._abandon(lane, waiter, keep_if_granted=True):
+                raise self._timeout_error(lane, waiter)
+        except asyncio.CancelledError:
+            self._abandon(lane, waiter)
+            raise
+        return tokens
+
+    def acquire_sync(self, lane_name: str, tokens: int, priority: Priority = Priority.INTERACTIVE) -> int:
+        """Reserve capacity for one request from a worker thread (see acquire())"""
+        lane = self.lanes[lane_name]
+        waiter = self._enqueue(lane, tokens, priority)
+        if not waiter.event.wait(timeout=self.max_wait_seconds):
+            if not self._abandon(lane, waiter, keep_if_granted=True):
+                raise self._timeout_error(lane, waiter)
+        return tokens
+
+    def settle(self, lane_name: str, reserved: int, actual: Optional[int]):
+        """Return the unused part of a reservation once the response reports actual usage"""
+        if actual is None or actual >= reserved:
+            return
+        lane = self.lanes[lane_name]
+        with self._lock:
+            lane.tokens.refund(reserved - actual)
+            self._dispatch(lane)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-lane capacity, queue depth and wait metrics"""
+        with self._lock:
+            now = time.monotonic()
+            stats = {"max_queue": self.max_queue, "max_wait_seconds": self.max_wait_seconds, "lanes": {}}
+            for lane in self.lanes.values():
+                lane.requests.refill(now)
+                lane.tokens.refill(now)
+                stats["lanes"][lane.name] = {
+                    "rpm_limit": int(lane.requests.capacity),
+                    "tpm_limit": int(lane.tokens.capacity),
+                    "requests_available": int(lane.requests.available),
+                    "tokens_available": int(lane.tokens.available),
+                    "queued": sum(1 for entry in lane.queue if not entry[2].cancelled),
+                    "granted": lane.granted,
+                    "granted_by_priority": dict(lane.granted_by_priority),
+                    "rejected": lane.rejected,
+                    "avg_wait_ms": round(lane.total_wait_ms / lane.granted, 2) if lane.granted else 0.0,
+                    "max_wait_ms": round(lane.max_wait_ms, 2)
+                }
+            return stats
+
+
+# Create singleton instance
+openai_scheduler = OpenAIScheduler()
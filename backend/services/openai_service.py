@@ -1,29 +1,29 @@
 """
 OpenAI Service for AI-powered query generation and explanation
 """
+import asyncio
 import logging
 import re
-from typing import Optional, Tuple, List
-from openai import OpenAI
+from typing import Optional, Tuple, List, AsyncIterator
 from backend.config import settings
+from backend.services.openai_client import openai_transport
+from backend.services.openai_scheduler import Priority, RateLimitExceeded
 from backend.utils.prompts import (
     get_system_prompt,
+    get_budgeted_system_prompt,
     get_role_system_prompt,
     build_rag_system_prompt,
     get_rag_system_prompt_fallback,
     EXPLANATION_PROMPT,
     VALIDATION_PROMPT
 )
-from backend.utils.schema_loader import load_schema_from_sql, parse_sql_schema
+from backend.utils.prompt_budget import PromptBudget
+from backend.utils.schema_catalog import schema_catalog
+from backend.utils.sql_repair import sql_repairer, log_repair
+from backend.utils.sql_safety import check_read_only_select
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-# Cache parsed schema for validation
-_parsed_schema_cache = None
-
 
 class OpenAIService:
     """Service for interacting with OpenAI API"""
@@ -32,7 +32,6 @@ class OpenAIService:
         self.model = settings.OPENAI_MODEL
         self.temperature = settings.OPENAI_TEMPERATURE
         self.max_tokens = settings.OPENAI_MAX_TOKENS
-        self._load_schema_cache()
 
     async def generate_procedural_steps(self, user_query: str, role: Optional[str] = None, max_steps: int = 10) -> list:
         """Generate a concise numbered list of steps for procedural admin queries.
@@ -49,7 +48,7 @@ class OpenAIService:
 
             user_msg = f"Provide a concise, numbered list (1-{max_steps}) of short steps to: {user_query}. Return only the numbered steps, one per line, with no extra commentary. Each step should be one short sentence."
 
-            response = client.chat.completions.create(
+            response = await openai_transport.chat_completion(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -96,7 +95,7 @@ class OpenAIService:
 
             user_msg = f"Provide a concise 1-2 sentence definition of: {subject}. Return only the definition with no extra commentary."
 
-            response = client.chat.completions.create(
+            response = await openai_transport.chat_completion(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -114,40 +113,9 @@ class OpenAIService:
             logger.error(f"Error generating definition: {e}")
             return ""
 
-    def _load_schema_cache(self):
-        """Load and cache parsed schema for validation"""
-        global _parsed_schema_cache
-        if _parsed_schema_cache is None:
-            try:
-                sql_content = load_schema_from_sql()
-                # Extract table names from formatted schema
-                _parsed_schema_cache = self._extract_schema_info(sql_content)
-                logger.info(f"Cached schema with {len(_parsed_schema_cache)} tables")
-            except Exception as e:
-                logger.error(f"Failed to cache schema: {e}")
-                _parsed_schema_cache = {}
-
-    def _extract_schema_info(self, schema_text: str) -> dict:
-        """Extract table and column names from schema text"""
-        schema_info = {}
-        current_table = None
-
-        for line in schema_text.split('\n'):
-            line = line.strip()
-            if line.startswith('Table:'):
-                current_table = line.replace('Table:', '').strip()
-                schema_info[current_table] = []
-            elif line.startswith('-') and current_table:
-                # Extract column name (format: "- column_name (type)")
-                col_match = re.match(r'-\s+(\w+)\s+\(', line)
-                if col_match:
-                    schema_info[current_table].append(col_match.group(1))
-
-        return schema_info
-
     def _validate_sql_against_schema(self, sql_query: str) -> Tuple[bool, str]:
         """
-        Validate SQL query against known schema
+        Validate SQL query against the full schema catalog (alias-aware)
 
         Args:
             sql_query: SQL query to validate
@@ -155,55 +123,25 @@ class OpenAIService:
         Returns:
             Tuple of (is_valid, error_message)
         """
-        if not _parsed_schema_cache:
-            return True, "Schema cache not available"
-
         try:
-            # Extract table names from SQL
-            table_pattern = r'FROM\s+`?(\w+)`?|JOIN\s+`?(\w+)`?'
-            tables_in_query = re.findall(table_pattern, sql_query, re.IGNORECASE)
-            tables_in_query = [t[0] or t[1] for t in tables_in_query]
-
-            # Check if tables exist in schema
-            invalid_tables = []
-            for table in tables_in_query:
-                if table and table not in _parsed_schema_cache:
-                    invalid_tables.append(table)
-
-            if invalid_tables:
-                available_tables = list(_parsed_schema_cache.keys())[:10]
-                return False, f"Invalid table(s): {', '.join(invalid_tables)}. Available tables include: {', '.join(available_tables)}"
-
-            # Extract column references (basic check)
-            # This is a simple check - could be enhanced
-            for table in tables_in_query:
-                if table in _parsed_schema_cache:
-                    # Look for table.column patterns
-                    col_pattern = rf'{table}\.(\w+)'
-                    columns_in_query = re.findall(col_pattern, sql_query, re.IGNORECASE)
-
-                    invalid_columns = []
-                    for col in columns_in_query:
-                        if col not in _parsed_schema_cache[table]:
-                            invalid_columns.append(f"{table}.{col}")
-
-                    if invalid_columns:
-                        available_cols = _parsed_schema_cache[table][:10]
-                        return False, f"Invalid column(s): {', '.join(invalid_columns)}. Available columns in {table}: {', '.join(available_cols)}"
-
-            return True, "Schema validation passed"
-
+            return schema_catalog.validate_sql(sql_query)
         except Exception as e:
             logger.warning(f"Schema validation error: {e}")
             return True, f"Validation skipped: {str(e)}"
 
-    async def _get_rag_system_prompt(self, user_query: str, role: Optional[str] = None) -> Optional[str]:
+    async def _get_rag_system_prompt(
+        self,
+        user_query: str,
+        role: Optional[str] = None,
+        budget: Optional[PromptBudget] = None
+    ) -> Optional[str]:
         """
         Get system prompt using RAG context from vector database
 
         Args:
             user_query: User's natural language query
             role: Optional role for filtering
+            budget: PromptBudget the retrieved sections are fitted into
 
         Returns:
             RAG-enhanced system prompt or None if RAG not available
@@ -222,8 +160,9 @@ class OpenAIService:
                 logger.debug("Vector DB is empty, falling back to traditional prompt")
                 return None
 
-            # Get RAG context
-            rag_context = vector_db_service.get_rag_context(
+            # Get RAG context (embedding + Chroma lookups are blocking, keep them off the event loop)
+            rag_context = await asyncio.to_thread(
+                vector_db_service.get_rag_context,
                 query=user_query,
                 role=role,
                 include_examples=True,
@@ -240,7 +179,8 @@ class OpenAIService:
                 relevant_tables=rag_context.get("relevant_tables", []),
                 similar_examples=rag_context.get("similar_examples", []),
                 relevant_docs=rag_context.get("relevant_docs", []),
-                role=role
+                role=role,
+                budget=budget
             )
 
             logger.info(f"Using RAG prompt with {len(rag_context.get('relevant_tables', []))} tables, "
@@ -253,7 +193,15 @@ class OpenAIService:
             logger.warning(f"Error getting RAG context: {e}")
             return None
 
-    async def generate_sql_query(self, user_query: str, role: Optional[str] = None, retry_count: int = 0, use_rag: bool = None) -> str:
+    async def generate_sql_query(
+        self,
+        user_query: str,
+        role: Optional[str] = None,
+        retry_count: int = 0,
+        use_rag: bool = None,
+        metadata: Optional[dict] = None,
+        feedback: Optional[str] = None
+    ) -> str:
         """
         Generate SQL query from natural language with schema validation
 
@@ -261,6 +209,8 @@ class OpenAIService:
             user_query: Natural language query from user
             retry_count: Number of retry attempts (internal use)
             use_rag: Whether to use RAG (defaults to settings.RAG_ENABLED)
+            metadata: Optional response metadata dict; receives the prompt token breakdown
+            feedback: Optional note about a previous attempt (e.g., why it was too expensive)
 
         Returns:
             Generated SQL query string
@@ -274,27 +224,39 @@ class OpenAIService:
 
             # Try to use RAG if enabled
             system_prompt = None
+            budget = PromptBudget(model=self.model)
             if use_rag:
-                system_prompt = await self._get_rag_system_prompt(user_query, role)
+                system_prompt = await self._get_rag_system_prompt(user_query, role, budget)
 
             # Fall back to traditional prompts if RAG not available or failed
             if system_prompt is None:
+                budget = PromptBudget(model=self.model)
                 if role:
                     try:
-                        system_prompt = get_role_system_prompt(role, user_query=user_query)
+                        system_prompt = get_role_system_prompt(role, user_query=user_query, budget=budget)
                     except Exception as e:
                         logger.warning(f"Failed to build role-aware system prompt ({role}): {e}")
-                        system_prompt = get_system_prompt()
+                        budget = PromptBudget(model=self.model)
+                        system_prompt = get_budgeted_system_prompt(user_query, budget)
                 else:
-                    system_prompt = get_system_prompt()
+                    system_prompt = get_budgeted_system_prompt(user_query, budget)
 
             # Add schema validation reminder for retries
             if retry_count > 0:
                 user_query_enhanced = f"{user_query}\n\nIMPORTANT: Previous attempt failed schema validation. Please carefully verify all table and column names exist in the DATABASE SCHEMA above before generating the query."
             else:
                 user_query_enhanced = user_query
+            if feedback:
+                user_query_enhanced = f"{user_query_enhanced}\n\n{feedback}"
 
-            response = client.chat.completions.create(
+            budget.fixed("question", user_query_enhanced)
+            prompt_report = budget.report()
+            breakdown = ", ".join(f"{name}={section['tokens']}" for name, section in prompt_report["sections"].items())
+            logger.info(f"Prompt tokens: {prompt_report['total_tokens']} ({breakdown})")
+            if metadata is not None:
+                metadata["prompt_tokens"] = prompt_report
+
+            response = await openai_transport.chat_completion(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -317,13 +279,26 @@ class OpenAIService:
             # Validate against schema
             is_valid, validation_msg = self._validate_sql_against_schema(sql_query)
 
+            if not is_valid and settings.SQL_REPAIR_ENABLED:
+                logger.warning(f"Schema validation failed: {validation_msg}")
+
+                # Try to fix misspelled identifiers locally before paying for another completion
+                repair = sql_repairer.repair(sql_query)
+                await log_repair(user_query, sql_query, repair)
+                if repair["repaired_sql"]:
+                    logger.info(f"Repaired SQL locally: {repair['repairs']}")
+                    sql_query = repair["repaired_sql"]
+                    is_valid, validation_msg = True, "Schema validation passed after local repair"
+
             if not is_valid:
                 logger.warning(f"Schema validation failed: {validation_msg}")
 
-                # Retry once with enhanced prompt
+                # Retry once with enhanced prompt (repair was ambiguous)
                 if retry_count < 1:
                     logger.info("Retrying SQL generation with schema validation feedback")
-                    return await self.generate_sql_query(user_query, role, retry_count + 1)
+                    return await self.generate_sql_query(
+                        user_query, role, retry_count + 1, metadata=metadata, feedback=feedback
+                    )
                 else:
                     # Return the query anyway but log the issue
                     logger.error(f"SQL generation failed schema validation after retry: {validation_msg}")
@@ -333,6 +308,8 @@ class OpenAIService:
 
             return sql_query
 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error generating SQL query: {e}")
             raise Exception(f"Failed to generate SQL query: {str(e)}")
@@ -371,10 +348,19 @@ class OpenAIService:
                     keyword = pattern.replace(r'\b', '').replace(r'\s+', ' ').replace(r'\w+', '...')
                     return False, f"Query contains dangerous operation: {keyword}"
 
-            # Additional AI-based validation
+            # Deterministic syntax-tree validation (no LLM round-trip)
+            is_safe, reason = check_read_only_select(sql_query)
+            if is_safe is not None:
+                return is_safe, reason
+
+            # Parsing failed - fall back to AI-based validation if enabled
+            if not settings.SQL_VALIDATION_LLM_FALLBACK:
+                return False, reason
+
+            logger.info(f"Falling back to LLM validation: {reason}")
             prompt = VALIDATION_PROMPT.format(query=sql_query)
 
-            response = client.chat.completions.create(
+            response = await openai_transport.chat_completion(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.1,
@@ -388,49 +374,39 @@ class OpenAIService:
 
             return is_safe, reason
 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error validating query: {e}")
             return False, f"Validation error: {str(e)}"
     
-    async def explain_results(self, user_query: str, results: list, sql_query: str = None) -> str:
-        """
-        Generate human-friendly explanation of query results with analysis
+    def _build_explanation_prompt(self, user_query: str, results: list, total_count: Optional[int] = None) -> str:
+        """Build the adaptive explanation prompt for a result set (or a sample of it, see total_count)"""
+        # Limit results for explanation to avoid token limits
+        limited_results = results[:10] if len(results) > 10 else results
+        total_count = len(results) if total_count is None else total_count
 
-        Args:
-            user_query: Original user query
-            results: Query results
-            sql_query: The SQL query that was executed (optional)
-
-        Returns:
-            Explanation string with insights and analysis
-        """
-        try:
-            logger.info(f"Generating explanation for {len(results)} results")
-
-            # Limit results for explanation to avoid token limits
-            limited_results = results[:10] if len(results) > 10 else results
+        # Decide whether a longer explanation is needed
+        need_long_explanation = False
+        query_lc = user_query.lower() if user_query else ''
 
-            # Decide whether a longer explanation is needed
-            need_long_explanation = False
-            query_lc = user_query.lower() if user_query else ''
+        if total_count > 10:
+            need_long_explanation = True
+        if any(k in query_lc for k in ("explain", "why", "insight", "analyze", "anomal", "recommend")):
+            need_long_explanation = True
+        # Quick heuristic: if results have many columns (complex), ask for more detail
+        if results and isinstance(results[0], dict) and len(results[0].keys()) > 3:
+            need_long_explanation = True
 
-            if len(results) > 10:
-                need_long_explanation = True
-            if any(k in query_lc for k in ("explain", "why", "insight", "analyze", "anomal", "recommend")):
-                need_long_explanation = True
-            # Quick heuristic: if results have many columns (complex), ask for more detail
-            if results and isinstance(results[0], dict) and len(results[0].keys()) > 3:
-                need_long_explanation = True
+        # Enhanced prompt with adaptive analysis request
+        length_instruction = "Provide a full, clear explanation (3-6 sentences) and include recommendations when applicable." if need_long_explanation else "Provide a clear, concise summary (1-2 sentences)."
 
-            # Enhanced prompt with adaptive analysis request
-            length_instruction = "Provide a full, clear explanation (3-6 sentences) and include recommendations when applicable." if need_long_explanation else "Provide a clear, concise summary (1-2 sentences)."
-
-            enhanced_prompt = f"""You are a helpful AI assistant analyzing database query results.
+        return f"""You are a helpful AI assistant analyzing database query results.
 
 User asked: "{user_query}"
 
 Query results: {limited_results}
-Total results count: {len(results)}
+Total results count: {total_count}
 
 Please provide:
 1. {length_instruction}
@@ -441,7 +417,43 @@ Please provide:
 Make it easy to understand for non-technical users. Use a friendly, conversational tone.
 If there are no results, explain that clearly and suggest why that might be."""
 
-            response = client.chat.completions.create(
+    @staticmethod
+    def _explanation_note(results: list, total_count: Optional[int] = None) -> str:
+        """Footer appended when only part of the results was analyzed"""
+        total_count = len(results) if total_count is None else total_count
+        if total_count > 10:
+            return f"\n\n📊 Note: Showing analysis of first 10 results out of {total_count} total records."
+        return ""
+
+    async def explain_results(
+        self,
+        user_query: str,
+        results: list,
+        sql_query: str = None,
+        total_count: Optional[int] = None,
+        raise_errors: bool = False
+    ) -> str:
+        """
+        Generate human-friendly explanation of query results with analysis
+
+        Args:
+            user_query: Original user query
+            results: Query results (or a bounded sample of them)
+            sql_query: The SQL query that was executed (optional)
+            total_count: Total row count when results is a sample
+            raise_errors: Re-raise failures (including rate limiting) instead of
+                returning a fallback message
+
+        Returns:
+            Explanation string with insights and analysis
+        """
+        try:
+            logger.info(f"Generating explanation for {len(results)} results")
+
+            enhanced_prompt = self._build_explanation_prompt(user_query, results, total_count)
+
+            response = await openai_transport.chat_completion(
+                priority=Priority.EXPLANATION,
                 model=self.model,
                 messages=[{"role": "user", "content": enhanced_prompt}],
                 temperature=0.7,
@@ -451,15 +463,57 @@ If there are no results, explain that clearly and suggest why that might be."""
             explanation = response.choices[0].message.content.strip()
 
             # Add result count if there are more results
-            if len(results) > 10:
-                explanation += f"\n\n📊 Note: Showing analysis of first 10 results out of {len(results)} total records."
+            explanation += self._explanation_note(results, total_count)
 
             return explanation
             
         except Exception as e:
             logger.error(f"Error generating explanation: {e}")
+            if raise_errors:
+                raise
             return "Results retrieved successfully, but explanation generation failed."
 
+    async def stream_explanation(
+        self,
+        user_query: str,
+        results: list,
+        sql_query: str = None,
+        total_count: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the explanation of query results token by token
+
+        Args:
+            user_query: Original user query
+            results: Query results (or a bounded sample of them)
+            sql_query: The SQL query that was executed (optional)
+            total_count: Total row count when results is a sample
+
+        Yields:
+            Explanation text deltas as they arrive from the model
+        """
+        try:
+            logger.info(f"Streaming explanation for {len(results)} results")
+
+            enhanced_prompt = self._build_explanation_prompt(user_query, results, total_count)
+
+            async for delta in openai_transport.stream_chat_completion(
+                priority=Priority.EXPLANATION,
+                model=self.model,
+                messages=[{"role": "user", "content": enhanced_prompt}],
+                temperature=0.7,
+                max_tokens=800
+            ):
+                yield delta
+
+            note = self._explanation_note(results, total_count)
+            if note:
+                yield note
+
+        except Exception as e:
+            logger.error(f"Error streaming explanation: {e}")
+            yield "Results retrieved successfully, but explanation generation failed."
+
 
 # Create singleton instance
 openai_service = OpenAIService()
@@ -0,0 +1,207 @@
+"""
+Paged execution of generated SQL
+
+Generated queries get an enforced LIMIT (see utils.sql_pagination) and are
+registered under a result_id. Further pages re-run the stored statement with
+a keyset predicate (or OFFSET) - no LLM call, and the SQL never comes from
+the client. Each page returns a continuation cursor naming the page after
+it; the key values / offset each cursor resumes from are kept server-side
+in a TTL + LRU store, so a cursor can be fetched again (e.g. after a network
+error) and always returns the same page.
+"""
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from backend.config import settings
+from backend.services.database_service import database_service
+from backend.services.database_router import QueryRoute
+from backend.utils.sql_pagination import plan_pages, page_sql, to_literal
+
+logger = logging.getLogger(__name__)
+
+
+class PaginationService:
+    """Enforces LIMIT on generated SQL and serves further pages by result_id"""
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.PAGINATION_TTL_SECONDS
+        self.max_entries = max_entries or settings.PAGINATION_MAX_ENTRIES
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.limits_injected = 0
+        self.limits_clamped = 0
+        self.pages_served = 0
+        self.keyset_pages = 0
+        self.offset_pages = 0
+
+    def prepare(
+        self,
+        sql_query: str,
+        timeout: Optional[float] = None,
+        plan_rows: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Enforce the LIMIT of a generated query
+
+        Args:
+            sql_query: Generated SQL (after the cost guard)
+            timeout: Execution timeout chosen by the cost guard, reused for every page
+            plan_rows: Cost guard EXPLAIN output, handed to the index advisor with every page
+
+        Returns:
+            Tuple of (SQL for the first page, page plan or None when the statement
+            is left unchanged)
+        """
+        if not settings.PAGINATION_ENABLED:
+            return sql_query, None
+        plan = plan_pages(sql_query, settings.QUERY_DEFAULT_LIMIT, settings.QUERY_MAX_LIMIT)
+        if plan is None:
+            return sql_query, None
+        if plan["requested_limit"] is None:
+            self.limits_injected += 1
+        elif plan["clamped"]:
+            self.limits_clamped += 1
+            logger.info(f"Clamped LIMIT {plan['requested_limit']} to {plan['page_size']}")
+        plan["timeout"] = timeout
+        plan["plan_rows"] = plan_rows
+        return plan["sql_query"], plan
+
+    def _expire(self, now: float):
+        """Drop entries older than the TTL (caller holds the lock)"""
+        for key in [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]:
+            del self._entries[key]
+
+    @staticmethod
+    def _advance(entry: Dict[str, Any], page: int, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Record where the page after `page` starts and describe the page just served"""
+        plan = entry["plan"]
+        start = entry["pages"][page]
+        served = start["offset"] - plan["base_offset"] + len(rows)
+        # A LIMIT within QUERY_MAX_LIMIT is the whole answer; a clamped one pages up to what was asked
+        has_more = len(rows) >= plan["page_size"] and (
+            plan["requested_limit"] is None or served < plan["requested_limit"]
+        )
+        if has_more and page + 1 not in entry["pages"]:
+            after = None
+            if plan["keys"]:
+                after = [rows[-1].get(key["key"]) for key in plan["keys"]]
+                if any(to_literal(value) is None for value in after):
+                    # NULL / binary key values cannot seed a keyset predicate; resume by offset
+                    after = None
+            entry["pages"][page + 1] = {"offset": start["offset"] + len(rows), "after": after}
+        if page >= entry["furthest_page"]:
+            entry["furthest_page"] = page
+            entry["next_page"] = page + 1 if has_more else None
+        return {
+            "result_id": entry["result_id"],
+            "page": page,
+            "page_size": plan["page_size"],
+            "mode": "keyset" if start["after"] is not None else "offset" if page > 1 else plan["mode"],
+            "has_more": has_more,
+            "next_cursor": str(page + 1) if has_more else None,
+            "limit_requested": plan["requested_limit"],
+            "limit_clamped": plan["clamped"]
+        }
+
+    def register(self, plan: Dict[str, Any], question: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Store the plan of an executed first page so later pages can be fetched
+
+        Returns:
+            Pagination details for the response (result_id, next_cursor, has_more, ...)
+        """
+        result_id = uuid.uuid4().hex
+        entry = {
+            "result_id": result_id,
+            "plan": plan,
+            "question": question,
+            "pages": {1: {"offset": plan["base_offset"], "after": None}},
+            "furthest_page": 1,
+            "next_page": None,
+            "created_at": time.time()
+        }
+        with self._lock:
+            self._expire(entry["created_at"])
+            self._entries[result_id] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return self._advance(entry, 1, rows)
+
+    async def next_page(self, result_id: str, cursor: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a page of a registered result by re-running its SQL
+
+        Args:
+            result_id: Handle returned with the first page
+            cursor: Continuation cursor from a previous page (defaults to the
+                page after the furthest one served)
+
+        Returns:
+            Dict with question, sql_query, results, execution_time_ms and
+            pagination; None when the result_id or cursor is unknown or expired,
+            or (without a cursor) when the last page was already served
+        """
+        with self._lock:
+            self._expire(time.time())
+            entry = self._entries.get(result_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(result_id)
+            if cursor is None:
+                page = entry["next_page"]
+                if page is None:
+                    return None
+            elif cursor.isdigit() and int(cursor) in entry["pages"]:
+                page = int(cursor)
+            else:
+                return None
+            start = entry["pages"][page]
+
+        plan = entry["plan"]
+        sql_query = page_sql(plan, offset=start["offset"], after=start["after"])
+        metadata: Dict[str, Any] = {}
+        results, execution_time_ms = await database_service.execute_query(
+            sql_query, timeout=plan["timeout"], use_cache=True, metadata=metadata,
+            route=QueryRoute.ANALYTICS, plan_rows=plan["plan_rows"]
+        )
+
+        with self._lock:
+            pagination = self._advance(entry, page, results)
+            self.pages_served += 1
+            if pagination["mode"] == "keyset":
+                self.keyset_pages += 1
+            else:
+                self.offset_pages += 1
+        metadata["pagination"] = pagination
+        return {
+            "question": entry["question"],
+            "sql_query": sql_query,
+            "results": results,
+            "execution_time_ms": execution_time_ms,
+            "metadata": metadata
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get LIMIT enforcement and paging counters"""
+        with self._lock:
+            return {
+                "enabled": settings.PAGINATION_ENABLED,
+                "default_limit": settings.QUERY_DEFAULT_LIMIT,
+                "max_limit": settings.QUERY_MAX_LIMIT,
+                "results": len(self._entries),
+                "limits_injected": self.limits_injected,
+                "limits_clamped": self.limits_clamped,
+                "pages_served": self.pages_served,
+                "keyset_pages": self.keyset_pages,
+                "offset_pages": self.offset_pages
+            }
+
+
+# Create singleton instance
+pagination_service = PaginationService()
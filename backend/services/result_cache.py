@@ -0,0 +1,261 @@
+"""
+Result cache for executed SQL
+
+Caches result rows keyed by the SQL fingerprint (see utils.sql_fingerprint),
+with a TTL and LRU eviction bounded by both entry count and the approximate
+serialized size of the cached rows. Each entry records the tables its query
+reads so writes to a table can invalidate just the entries that depend on
+it. While the watermark tracker is running, entries are also stamped with
+the version token of their tables and only served while it still matches.
+Hit and miss counts are kept per fingerprint to show which queries benefit.
+"""
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+
+from backend.config import settings
+from backend.services.watermark_service import watermark_tracker
+from backend.utils.sql_fingerprint import fingerprint_sql
+
+logger = logging.getLogger(__name__)
+
+# Per-fingerprint stats kept for at most this many fingerprints (LRU)
+MAX_TRACKED_FINGERPRINTS = 1000
+
+
+class QueryResultCache:
+    """TTL + memory-bounded LRU cache of query results with table-level invalidation"""
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None
+    ):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.RESULT_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.RESULT_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or settings.RESULT_CACHE_MAX_BYTES
+        self.max_entry_bytes = max_entry_bytes or settings.RESULT_CACHE_MAX_ENTRY_BYTES
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._fingerprints: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.uncacheable = 0
+        self.stale = 0
+
+    def _drop(self, fingerprint: str):
+        """Remove one entry (caller holds the lock)"""
+        entry = self._entries.pop(fingerprint, None)
+        if entry:
+            self.total_bytes -= entry["size"]
+
+    def _expire(self, now: float):
+        """Drop entries older than the TTL (caller holds the lock)"""
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            self._drop(key)
+        self.expirations += len(expired)
+
+    def _track(self, fingerprint: str, normalized: str, tables) -> Dict[str, Any]:
+        """Per-fingerprint counters (caller holds the lock)"""
+        stats = self._fingerprints.get(fingerprint)
+        if stats is None:
+            stats = {
+                "sql": normalized[:200],
+                "tables": sorted(tables) if tables is not None else None,
+                "hits": 0,
+                "misses": 0,
+                "last_seen": None
+            }
+            self._fingerprints[fingerprint] = stats
+            while len(self._fingerprints) > MAX_TRACKED_FINGERPRINTS:
+                self._fingerprints.popitem(last=False)
+        else:
+            self._fingerprints.move_to_end(fingerprint)
+        stats["last_seen"] = time.time()
+        return stats
+
+    @staticmethod
+    def _version(tables) -> Tuple[bool, Optional[str]]:
+        """
+        Watermark version token for a query's tables
+
+        Returns:
+            Tuple of (usable, token); not usable while the tracker has not observed
+            every table yet. Without a running tracker (or parsed tables) entries
+            rely on the TTL alone and the token is None.
+        """
+        if tables is None or not watermark_tracker.running:
+            return True, None
+        token = watermark_tracker.version_token(tables)
+        return token is not None, token
+
+    def lookup(self, sql_query: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Look up cached results for a query
+
+        Returns:
+            Tuple of (fingerprint, cached entry with results/execution_time_ms/age_seconds or None)
+        """
+        fingerprint, normalized, tables, cacheable = fingerprint_sql(sql_query)
+        versioned, version = self._version(tables)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            stats = self._track(fingerprint, normalized, tables)
+            entry = self._entries.get(fingerprint) if cacheable and versioned else None
+            if entry is not None and entry["version"] != version:
+                # A table changed since the results were cached
+                self._drop(fingerprint)
+                self.stale += 1
+                entry = None
+            if entry is None:
+                stats["misses"] += 1
+                self.misses += 1
+                return fingerprint, None
+
+            self._entries.move_to_end(fingerprint)
+            stats["hits"] += 1
+            self.hits += 1
+            return fingerprint, {
+                "results": list(entry["results"]),
+                "execution_time_ms": entry["execution_time_ms"],
+                "age_seconds": round(now - entry["created_at"], 3)
+            }
+
+    def store(
+        self,
+        sql_query: str,
+        results: List[Dict[str, Any]],
+        execution_time_ms: float,
+        started_at: Optional[float] = None
+    ) -> bool:
+        """
+        Cache the results of a query, evicting LRU entries to stay within the bounds
+
+        Args:
+            sql_query: SQL query that produced the results
+            results: Result rows
+            execution_time_ms: How long the query took
+            started_at: When the data read was current (execution start, earlier for a
+                lagging replica); results are not cached if a change to one of the
+                tables was observed since (they may predate it)
+
+        Returns:
+            True when the results were cached (False for non-deterministic or clock-dependent, oversized or possibly stale results)
+        """
+        fingerprint, _, tables, cacheable = fingerprint_sql(sql_query)
+        versioned, version = self._version(tables)
+        if version is not None and started_at is not None and watermark_tracker.changed_since(tables, started_at):
+            versioned = False
+        if not cacheable or not versioned:
+            with self._lock:
+                self.uncacheable += 1
+            return False
+
+        size = len(json.dumps(results, default=str))
+        if size > self.max_entry_bytes:
+            with self._lock:
+                self.uncacheable += 1
+            return False
+
+        with self._lock:
+            self._drop(fingerprint)
+            self._entries[fingerprint] = {
+                "results": list(results),
+                "execution_time_ms": execution_time_ms,
+                "tables": tables,
+                "version": version,
+                "size": size,
+                "created_at": time.time()
+            }
+            self.total_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def invalidate_tables(self, tables: Iterable[str], reason: str = "write") -> int:
+        """
+        Drop cached results of queries reading any of the given tables
+
+        Entries whose SQL could not be parsed (unknown tables) are dropped too.
+
+        Returns:
+            Number of entries dropped
+        """
+        targets = {table.lower() for table in tables}
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry["tables"] is None or entry["tables"] & targets
+            ]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += 1
+        logger.info(f"Result cache invalidated for {sorted(targets)} ({reason}), dropped {len(stale)} entries")
+        return len(stale)
+
+    def invalidate(self, reason: str = "manual"):
+        """Drop every cached result"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self.total_bytes = 0
+            self.invalidations += 1
+        logger.info(f"Result cache invalidated ({reason}), dropped {count} entries")
+
+    def get_stats(self, top: int = 20) -> Dict[str, Any]:
+        """Get overall hit-rate metrics, memory use and the most looked-up fingerprints"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            fingerprints = sorted(
+                self._fingerprints.items(),
+                key=lambda item: item[1]["hits"] + item[1]["misses"],
+                reverse=True
+            )[:top]
+            return {
+                "enabled": settings.RESULT_CACHE_ENABLED,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "uncacheable": self.uncacheable,
+                "stale": self.stale,
+                "watermarks": watermark_tracker.running,
+                "fingerprints": [
+                    {
+                        "fingerprint": key,
+                        **stats,
+                        "cached": key in self._entries,
+                        "hit_rate": round(stats["hits"] / (stats["hits"] + stats["misses"]), 4)
+                        if stats["hits"] + stats["misses"] else 0.0
+                    }
+                    for key, stats in fingerprints
+                ]
+            }
+
+
+# Create singleton instance
+result_cache = QueryResultCache()
+
+# Free entries as soon as the tracker observes a change (lookups would miss them anyway)
+watermark_tracker.subscribe(lambda tables: result_cache.invalidate_tables(tables, reason="watermark"))
@@ -0,0 +1,428 @@
+"""
+Rollup summary tables for hot dashboard aggregates
+
+A large share of generated SQL is the same few aggregate families: ticket
+status breakdowns per user / department, FMS running vs deleted counts and
+recurring task completion. ROLLUPS keeps one summary table per family
+(database/migrations/add_rollup_tables.sql) with a row per combination of
+its dimension columns, the row count and SUM() measures. Matching generated
+queries are rewritten to read the rollup (utils.rollup_rewriter) as long as
+it was refreshed within ROLLUP_MAX_STALENESS_SECONDS; the response metadata
+says which rollup answered and how fresh it is.
+
+Refresh is incremental by partition: rows whose updated_at moved past the
+previous high watermark (minus a lookback for late commits) name the
+partition keys to recompute, and those partitions are deleted and
+re-aggregated from the source table in one transaction. A periodic full
+rebuild picks up what updated_at cannot show (hard deletes, partition key
+changes). Refreshes run at READ COMMITTED so INSERT ... SELECT does not lock
+source rows, and take a MySQL named lock so only one worker refreshes a
+rollup at a time. Refresh state lives in rollup_refresh_state, so every
+worker sees the same freshness.
+"""
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, List, Optional
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from backend.config import settings
+from backend.models.database import async_engine
+from backend.services.result_cache import result_cache
+from backend.services.watermark_service import watermark_tracker
+from backend.utils.rollup_rewriter import COUNT_COLUMN, rewrite_with_rollup
+
+logger = logging.getLogger(__name__)
+
+STATE_TABLE = "rollup_refresh_state"
+
+# Rollup name -> definition. dimensions map rollup columns to source columns or
+# derived expressions; measures map rollup columns to summed source columns.
+ROLLUPS: Dict[str, Dict[str, Any]] = {
+    "hit_ticket_status": {
+        "table": "rollup_hit_ticket_status",
+        "source": "hit_tickets",
+        "partition_key": "user_id",
+        "updated_column": "updated_at",
+        "dimensions": {
+            "user_id": "user_id",
+            "helping_person_id": "helping_person_id",
+            "hdepartment_id": "hdepartment_id",
+            "status": "status",
+            "is_inprogress": "is_inprogress",
+            "done_status": "done_status",
+            "not_done_status": "not_done_status",
+            "hold_status": "hold_status",
+            "archive": "archive"
+        },
+        "measures": {"total_hours": "hours"}
+    },
+    "fms_master_status": {
+        "table": "rollup_fms_master_status",
+        "source": "fms_masters",
+        "partition_key": "created_by",
+        "updated_column": "updated_at",
+        "dimensions": {
+            "created_by": "created_by",
+            "organization_id": "organization_id",
+            "process_coordinator_id": "process_coordinator_id",
+            "status": "status",
+            "deleted_at_is_null": "deleted_at IS NULL"
+        },
+        "measures": {}
+    },
+    "recurring_task_completion": {
+        "table": "rollup_recurring_task_completion",
+        "source": "recurring_task_trackings",
+        "partition_key": "user_id",
+        "updated_column": "updated_at",
+        "dimensions": {
+            "user_id": "user_id",
+            "reviewer_status": "reviewer_status",
+            "completed_at_is_null": "completed_at IS NULL",
+            "not_done_at_is_null": "not_done_at IS NULL"
+        },
+        "measures": {"total_rework_count": "rework_count"}
+    }
+}
+
+
+def _quote(identifier: str) -> str:
+    return "`" + identifier.replace("`", "``") + "`"
+
+
+class RollupService:
+    """Refreshes rollup tables and answers matching queries from them"""
+
+    def __init__(
+        self,
+        rollups: Optional[Dict[str, Dict[str, Any]]] = None,
+        refresh_interval_seconds: Optional[float] = None,
+        max_staleness_seconds: Optional[float] = None
+    ):
+        self.rollups = rollups or ROLLUPS
+        self.refresh_interval_seconds = refresh_interval_seconds or settings.ROLLUP_REFRESH_INTERVAL_SECONDS
+        self.max_staleness_seconds = max_staleness_seconds or settings.ROLLUP_MAX_STALENESS_SECONDS
+        self._by_source = {rollup["source"].lower(): name for name, rollup in self.rollups.items()}
+
+        # rollup name -> {"refreshed_at", "last_full_refresh_at", "high_watermark", "row_count", "refresh_ms"}
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.rewrites: Dict[str, int] = {name: 0 for name in self.rollups}
+        self.stale_skips = 0
+        self.refreshes = 0
+        self.full_refreshes = 0
+        self.refresh_failures = 0
+        self.lock_skips = 0
+        self.last_error: Optional[str] = None
+
+    # ==================== Freshness ====================
+
+    @staticmethod
+    async def _read_state(conn: AsyncConnection) -> Dict[str, Dict[str, Any]]:
+        result = await conn.execute(text(
+            "SELECT rollup_name, UNIX_TIMESTAMP(refreshed_at), UNIX_TIMESTAMP(last_full_refresh_at), "
+            f"CAST(high_watermark AS CHAR), row_count, refresh_ms FROM {STATE_TABLE}"
+        ))
+        return {
+            name: {
+                "refreshed_at": float(refreshed_at) if refreshed_at is not None else None,
+                "last_full_refresh_at": float(full_at) if full_at is not None else None,
+                "high_watermark": high_watermark,
+                "row_count": row_count,
+                "refresh_ms": refresh_ms
+            }
+            for name, refreshed_at, full_at, high_watermark, row_count, refresh_ms in result.fetchall()
+        }
+
+    async def load_state(self):
+        """Reload refresh state written by any worker"""
+        async with async_engine.connect() as conn:
+            self._state = await self._read_state(conn)
+
+    def freshness(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        How current a rollup is
+
+        Returns:
+            Dict with as_of (source data reflected up to this time),
+            staleness_seconds and source_changed (whether the watermark tracker
+            observed changes to the source table since, None when not tracking);
+            None if the rollup was never refreshed
+        """
+        state = self._state.get(name)
+        if not state or state["refreshed_at"] is None:
+            return None
+        refreshed_at = state["refreshed_at"]
+        source = self.rollups[name]["source"]
+        return {
+            "as_of": datetime.fromtimestamp(refreshed_at, tz=timezone.utc).isoformat(),
+            "staleness_seconds": round(max(0.0, time.time() - refreshed_at), 1),
+            "source_changed": watermark_tracker.changed_since([source], refreshed_at) if watermark_tracker.running else None
+        }
+
+    # ==================== Rewriting ====================
+
+    def rewrite(self, sql_query: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Answer a generated query from a rollup when it matches one
+
+        Args:
+            sql_query: Validated SELECT
+            metadata: Optional dict that receives the rollup used and its freshness ("rollup")
+
+        Returns:
+            SQL to execute (the rollup query, or sql_query unchanged)
+        """
+        if not settings.ROLLUP_ENABLED:
+            return sql_query
+        built = {
+            rollup["source"].lower(): rollup for name, rollup in self.rollups.items()
+            if self.freshness(name) is not None
+        }
+        match = rewrite_with_rollup(sql_query, built)
+        if match is None:
+            return sql_query
+
+        rewritten, rollup = match
+        name = self._by_source[rollup["source"].lower()]
+        freshness = self.freshness(name)
+        if freshness["staleness_seconds"] > self.max_staleness_seconds:
+            self.stale_skips += 1
+            logger.info(f"Rollup {name} is {freshness['staleness_seconds']}s old, querying {rollup['source']}")
+            return sql_query
+
+        self.rewrites[name] += 1
+        logger.info(f"Answering from rollup {name}: {rewritten}")
+        if metadata is not None:
+            metadata["rollup"] = {
+                "rollup": name,
+                "table": rollup["table"],
+                "source_table": rollup["source"],
+                **freshness,
+                "original_sql": sql_query
+            }
+        return rewritten
+
+    # ==================== Refresh ====================
+
+    @staticmethod
+    def _insert_sql(rollup: Dict[str, Any], where: str = "") -> str:
+        """INSERT ... SELECT that aggregates (part of) the source table into the rollup"""
+        columns = list(rollup["dimensions"]) + [COUNT_COLUMN] + list(rollup["measures"])
+        select = list(rollup["dimensions"].values()) + ["COUNT(*)"]
+        select += [f"COALESCE(SUM({_quote(source)}), 0)" for source in rollup["measures"].values()]
+        group_by = ", ".join(str(i) for i in range(1, len(rollup["dimensions"]) + 1))
+        return (
+            f"INSERT INTO {_quote(rollup['table'])} ({', '.join(map(_quote, columns))}) "
+            f"SELECT {', '.join(select)} FROM {_quote(rollup['source'])} {where} GROUP BY {group_by}"
+        )
+
+    async def _refresh_locked(self, conn: AsyncConnection, name: str, full: bool) -> Dict[str, Any]:
+        """Refresh one rollup inside the caller's transaction (caller holds the named lock)"""
+        rollup = self.rollups[name]
+        table, source = _quote(rollup["table"]), _quote(rollup["source"])
+        key, updated = _quote(rollup["partition_key"]), _quote(rollup["updated_column"])
+        start = time.time()
+
+        state = (await self._read_state(conn)).get(name) or {}
+        high_watermark, as_of = (await conn.execute(text(
+            f"SELECT CAST(MAX({updated}) AS CHAR), UNIX_TIMESTAMP() FROM {source}"
+        ))).one()
+
+        full = (
+            full
+            or not state.get("high_watermark")
+            or (state.get("last_full_refresh_at") or 0) < as_of - settings.ROLLUP_FULL_REFRESH_INTERVAL_SECONDS
+        )
+        partitions: List[Any] = []
+        if not full:
+            # Partitions with rows changed since the last refresh (the lookback covers late commits)
+            result = await conn.execute(
+                text(f"SELECT DISTINCT {key} FROM {source} WHERE {updated} >= DATE_SUB(:since, INTERVAL :lookback SECOND)"),
+                {"since": state["high_watermark"], "lookback": settings.ROLLUP_REFRESH_LOOKBACK_SECONDS}
+            )
+            partitions = [row[0] for row in result.fetchall()]
+            if len(partitions) > settings.ROLLUP_MAX_INCREMENTAL_PARTITIONS:
+                full = True
+
+        if full:
+            await conn.execute(text(f"DELETE FROM {table}"))
+            await conn.execute(text(self._insert_sql(rollup)))
+        elif partitions:
+            params = {"keys": partitions}
+            await conn.execute(
+                text(f"DELETE FROM {table} WHERE {key} IN :keys").bindparams(bindparam("keys", expanding=True)),
+                params
+            )
+            await conn.execute(
+                text(self._insert_sql(rollup, f"WHERE {key} IN :keys")).bindparams(bindparam("keys", expanding=True)),
+                params
+            )
+
+        row_count = (await conn.execute(text(f"SELECT COUNT(*) FROM {table}"))).scalar()
+        refresh_ms = (time.time() - start) * 1000
+        await conn.execute(text(
+            f"INSERT INTO {STATE_TABLE} "
+            "(rollup_name, source_table, high_watermark, refreshed_at, last_full_refresh_at, row_count, refresh_ms) "
+            "VALUES (:name, :source, :high_watermark, FROM_UNIXTIME(:as_of), IF(:full, FROM_UNIXTIME(:as_of), NULL), "
+            ":row_count, :refresh_ms) "
+            "ON DUPLICATE KEY UPDATE source_table = VALUES(source_table), "
+            "high_watermark = COALESCE(VALUES(high_watermark), high_watermark), "
+            "refreshed_at = VALUES(refreshed_at), "
+            "last_full_refresh_at = COALESCE(VALUES(last_full_refresh_at), last_full_refresh_at), "
+            "row_count = VALUES(row_count), refresh_ms = VALUES(refresh_ms)"
+        ), {
+            "name": name,
+            "source": rollup["source"],
+            "high_watermark": high_watermark,
+            "as_of": as_of,
+            "full": int(full),
+            "row_count": row_count,
+            "refresh_ms": refresh_ms
+        })
+
+        return {
+            "rollup": name,
+            "mode": "full" if full else "incremental",
+            "partitions": None if full else len(partitions),
+            "row_count": row_count,
+            "refresh_ms": round(refresh_ms, 2),
+            "changed": full or bool(partitions)
+        }
+
+    async def refresh(self, name: str, full: bool = False) -> Dict[str, Any]:
+        """
+        Refresh one rollup
+
+        Args:
+            name: Key of ROLLUPS
+            full: Rebuild the whole rollup instead of the changed partitions
+
+        Returns:
+            Dict with mode ("full" / "incremental"), partitions recomputed,
+            row_count and refresh_ms; "skipped" when another worker holds the lock
+        """
+        lock_name = f"pms_rollup_refresh:{name}"
+        async with async_engine.connect() as conn:
+            await conn.execution_options(isolation_level="READ COMMITTED")
+            if (await conn.execute(text("SELECT GET_LOCK(:lock, 0)"), {"lock": lock_name})).scalar() != 1:
+                self.lock_skips += 1
+                return {"rollup": name, "skipped": "refresh in progress elsewhere"}
+            try:
+                summary = await self._refresh_locked(conn, name, full)
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+            finally:
+                await conn.execute(text("SELECT RELEASE_LOCK(:lock)"), {"lock": lock_name})
+                await conn.commit()
+
+        self.refreshes += 1
+        if summary["mode"] == "full":
+            self.full_refreshes += 1
+        if summary["changed"]:
+            result_cache.invalidate_tables([self.rollups[name]["table"]], reason="rollup refresh")
+        logger.info(
+            f"Refreshed rollup {name} ({summary['mode']}, partitions: {summary['partitions']}, "
+            f"rows: {summary['row_count']}) in {summary['refresh_ms']}ms"
+        )
+        return summary
+
+    async def refresh_all(self, full: bool = False) -> List[Dict[str, Any]]:
+        """Refresh every rollup, then reload the shared refresh state"""
+        summaries = []
+        for name in self.rollups:
+            try:
+                summaries.append(await self.refresh(name, full=full))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.refresh_failures += 1
+                self.last_error = f"{name}: {e}"
+                logger.warning(f"Rollup refresh failed for {name}: {e}")
+                summaries.append({"rollup": name, "error": str(e)})
+        await self.load_state()
+        return summaries
+
+    def on_tables_changed(self, tables: Iterable[str]):
+        """Watermark subscriber: refresh early when a source table changed"""
+        if self._wakeup is not None and any(table.lower() in self._by_source for table in tables):
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Rollup refresh round failed: {e}")
+            # Coalesce bursts of change notifications
+            await asyncio.sleep(settings.ROLLUP_MIN_REFRESH_INTERVAL_SECONDS)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refresh_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        """Start the background refresh task (call from the running event loop)"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Rollup refresh started (every {self.refresh_interval_seconds}s)")
+
+    async def stop(self):
+        """Stop the background refresh task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get rollup freshness, refresh and rewrite counters"""
+        return {
+            "enabled": settings.ROLLUP_ENABLED,
+            "running": self.running,
+            "refresh_interval_seconds": self.refresh_interval_seconds,
+            "max_staleness_seconds": self.max_staleness_seconds,
+            "refreshes": self.refreshes,
+            "full_refreshes": self.full_refreshes,
+            "refresh_failures": self.refresh_failures,
+            "lock_skips": self.lock_skips,
+            "stale_skips": self.stale_skips,
+            "last_error": self.last_error,
+            "rollups": {
+                name: {
+                    "table": rollup["table"],
+                    "source_table": rollup["source"],
+                    "rewrites": self.rewrites[name],
+                    "freshness": self.freshness(name),
+                    "state": self._state.get(name)
+                }
+                for name, rollup in self.rollups.items()
+            }
+        }
+
+
+# Create singleton instance
+rollup_service = RollupService()
+
+# Refresh early when the watermark tracker sees a source table change
+watermark_tracker.subscribe(rollup_service.on_tables_changed)
@@ -0,0 +1,214 @@
+"""
+Semantic cache for generated SQL
+
+Stores (question embedding, role, generated SQL, validation verdict) and
+serves the cached SQL for new questions whose embedding is within a cosine
+similarity threshold of a cached question asked under the same role. Questions
+that differ only in a value ("tickets of John" / "tickets of Priya") embed
+almost identically, so the literals and entities of both questions (quoted
+strings, numbers, dates, relative periods, capitalized names) must match too.
+"""
+import re
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any
+
+import numpy as np
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUOTED_PATTERN = re.compile(r"'([^']*)'|\"([^\"]*)\"|`([^`]*)`")
+DATE_PATTERN = re.compile(r"\b\d{4}[-/.]\d{1,2}[-/.]\d{1,2}\b|\b\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}\b")
+NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+CAPITALIZED_PATTERN = re.compile(r"\b[A-Z][A-Za-z0-9&'.-]*")
+SENTENCE_START_PATTERN = re.compile(r"(?:^|[.?!:;]\s+|\n)\s*$")
+PERIOD_PATTERN = re.compile(
+    r"\b(?:today|yesterday|tomorrow|tonight|"
+    r"(?:this|last|next|previous|current|past)\s+(?:day|week|month|quarter|year|fy)|"
+    r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+    r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b",
+    re.I
+)
+
+
+def extract_literals(question: str) -> frozenset:
+    """
+    Values a question is about, which the generated SQL embeds as literals
+
+    Quoted strings, dates, numbers, relative periods / month and day names and
+    capitalized words other than the first of a sentence (names, departments,
+    acronyms such as IT or HR), lower-cased.
+    """
+    literals = set()
+    for match in QUOTED_PATTERN.finditer(question):
+        literals.add("'" + next(group for group in match.groups() if group is not None).strip().lower())
+    unquoted = QUOTED_PATTERN.sub(" ", question)
+    for match in DATE_PATTERN.finditer(unquoted):
+        literals.add(match.group(0))
+    unquoted = DATE_PATTERN.sub(" ", unquoted)
+    for match in NUMBER_PATTERN.finditer(unquoted):
+        literals.add(str(float(match.group(0))))
+    for match in PERIOD_PATTERN.finditer(unquoted):
+        literals.add(" ".join(match.group(0).lower().split()))
+    for match in CAPITALIZED_PATTERN.finditer(unquoted):
+        word = match.group(0).rstrip(".'-")
+        if word != "I" and not SENTENCE_START_PATTERN.search(unquoted[:match.start()]):
+            literals.add(word.lower())
+    return frozenset(literals)
+
+
+class SemanticQueryCache:
+    """TTL + LRU bounded semantic cache in front of SQL generation"""
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None
+    ):
+        self.threshold = threshold if threshold is not None else settings.SEMANTIC_CACHE_THRESHOLD
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.SEMANTIC_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.SEMANTIC_CACHE_MAX_ENTRIES
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.literal_mismatches = 0
+
+    @staticmethod
+    def _normalize_role(role: Optional[str]) -> str:
+        return (role or "").strip().lower()
+
+    @staticmethod
+    def _unit_vector(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float):
+        """Drop entries older than the TTL (caller holds the lock)"""
+        expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+
+    def lookup(self, question: str, embedding: List[float], role: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find the most similar cached question for the same role and literals
+
+        Args:
+            question: Incoming question (its literals must match the cached question's)
+            embedding: Embedding of the incoming question
+            role: Role the question is asked under
+
+        Returns:
+            Cached entry (sql_query, is_safe, reason, question, similarity) or None
+        """
+        role_key = self._normalize_role(role)
+        literals = extract_literals(question)
+        query_vector = self._unit_vector(embedding)
+
+        with self._lock:
+            self._expire(time.time())
+
+            candidates = [(key, entry) for key, entry in self._entries.items() if entry["role"] == role_key]
+            if not candidates:
+                self.misses += 1
+                return None
+
+            matrix = np.stack([entry["vector"] for _, entry in candidates])
+            similarities = matrix @ query_vector
+            matching = [i for i, (_, entry) in enumerate(candidates) if entry["literals"] == literals]
+            best = max(matching, key=lambda i: similarities[i]) if matching else None
+
+            if best is None or similarities[best] < self.threshold:
+                if float(similarities.max()) >= self.threshold:
+                    # Similar enough, but about a different value
+                    self.literal_mismatches += 1
+                self.misses += 1
+                return None
+            similarity = float(similarities[best])
+
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            entry["hits"] += 1
+            self.hits += 1
+
+            return {
+                "id": key,
+                "question": entry["question"],
+                "sql_query": entry["sql_query"],
+                "is_safe": entry["is_safe"],
+                "reason": entry["reason"],
+                "similarity": similarity
+            }
+
+    def store(
+        self,
+        question: str,
+        embedding: List[float],
+        role: Optional[str],
+        sql_query: str,
+        is_safe: bool,
+        reason: str = ""
+    ) -> str:
+        """Store generated SQL and its validation verdict, evicting LRU entries when full"""
+        key = uuid.uuid4().hex
+        with self._lock:
+            self._entries[key] = {
+                "question": question,
+                "vector": self._unit_vector(embedding),
+                "literals": extract_literals(question),
+                "role": self._normalize_role(role),
+                "sql_query": sql_query,
+                "is_safe": is_safe,
+                "reason": reason,
+                "created_at": time.time(),
+                "hits": 0
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return key
+
+    def invalidate(self, reason: str = "manual"):
+        """Drop every cached entry (e.g., after the schema is re-indexed)"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self.invalidations += 1
+        logger.info(f"Semantic SQL cache invalidated ({reason}), dropped {count} entries")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit-rate metrics and cache size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.SEMANTIC_CACHE_ENABLED,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "literal_mismatches": self.literal_mismatches
+            }
+
+
+# Create singleton instance
+semantic_cache = SemanticQueryCache()
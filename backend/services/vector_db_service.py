@@ -2,8 +2,10 @@
 Vector Database Service using ChromaDB for RAG operations
 """
 import os
+import time
 import logging
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 
@@ -17,6 +19,9 @@ SCHEMA_COLLECTION = "pms_schema"
 EXAMPLES_COLLECTION = "query_examples"
 DOCS_COLLECTION = "documentation"
 
+# Shared pool for querying the collections concurrently across requests
+_search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chroma-search")
+
 
 class VectorDBService:
     """Service for ChromaDB vector database operations"""
@@ -189,7 +194,8 @@ class VectorDBService:
         self,
         query: str,
         top_k: int = None,
-        category_filter: Optional[str] = None
+        category_filter: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for relevant table schemas
@@ -198,6 +204,7 @@ class VectorDBService:
             query: Natural language query
             top_k: Number of results to return
             category_filter: Optional category to filter by
+            query_embedding: Precomputed embedding of the query (skips re-embedding)
 
         Returns:
             List of relevant schema dictionaries
@@ -207,7 +214,8 @@ class VectorDBService:
                 top_k = settings.RAG_TOP_K
 
             # Generate query embedding
-            query_embedding = embedding_service.embed_text(query)
+            if query_embedding is None:
+                query_embedding = embedding_service.embed_text(query)
 
             # Build where filter if category specified
             where_filter = None
@@ -333,7 +341,8 @@ class VectorDBService:
         self,
         query: str,
         top_k: int = None,
-        category_filter: Optional[str] = None
+        category_filter: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for similar query examples
@@ -342,6 +351,7 @@ class VectorDBService:
             query: Natural language query
             top_k: Number of results to return
             category_filter: Optional category to filter by
+            query_embedding: Precomputed embedding of the query (skips re-embedding)
 
         Returns:
             List of similar example dictionaries
@@ -350,7 +360,8 @@ class VectorDBService:
             if top_k is None:
                 top_k = settings.RAG_TOP_K
 
-            query_embedding = embedding_service.embed_text(query)
+            if query_embedding is None:
+                query_embedding = embedding_service.embed_text(query)
 
             where_filter = None
             if category_filter:
@@ -463,7 +474,8 @@ class VectorDBService:
         self,
         query: str,
         top_k: int = None,
-        role_filter: Optional[str] = None
+        role_filter: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for relevant documentation
@@ -472,6 +484,7 @@ class VectorDBService:
             query: Search query
             top_k: Number of results to return
             role_filter: Optional role to filter by
+            query_embedding: Precomputed embedding of the query (skips re-embedding)
 
         Returns:
             List of relevant documentation chunks
@@ -480,7 +493,8 @@ class VectorDBService:
             if top_k is None:
                 top_k = settings.RAG_TOP_K
 
-            query_embedding = embedding_service.embed_text(query)
+            if query_embedding is None:
+                query_embedding = embedding_service.embed_text(query)
 
             where_filter = None
             if role_filter:
@@ -511,6 +525,81 @@ class VectorDBService:
 
     # ==================== Combined RAG Context ====================
 
+    def _timed_search(self, search_fn, **kwargs) -> Tuple[List[Dict[str, Any]], float]:
+        """Run a collection search and return (results, elapsed_ms)"""
+        start = time.perf_counter()
+        results = search_fn(**kwargs)
+        return results, (time.perf_counter() - start) * 1000
+
+    def retrieve(
+        self,
+        query: str,
+        role: Optional[str] = None,
+        top_k: int = None,
+        include_schema: bool = True,
+        include_examples: bool = True,
+        include_docs: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Embed the query once and search all requested collections concurrently
+
+        Args:
+            query: Natural language query
+            role: Optional role for filtering documentation
+            top_k: Number of results per collection
+            include_schema: Whether to search table schemas
+            include_examples: Whether to search query examples
+            include_docs: Whether to search documentation
+
+        Returns:
+            Dictionary with relevant_tables, similar_examples, relevant_docs and
+            timings_ms (embedding, per-collection and total latency)
+        """
+        total_start = time.perf_counter()
+        context = {
+            "relevant_tables": [],
+            "similar_examples": [],
+            "relevant_docs": [],
+            "timings_ms": {}
+        }
+
+        embed_start = time.perf_counter()
+        query_embedding = embedding_service.embed_text(query)
+        context["timings_ms"]["embedding"] = (time.perf_counter() - embed_start) * 1000
+
+        searches = {}
+        if include_schema:
+            searches["schema"] = ("relevant_tables", self.search_relevant_schema, {})
+        if include_examples:
+            searches["examples"] = ("similar_examples", self.search_similar_examples, {})
+        if include_docs:
+            searches["docs"] = ("relevant_docs", self.search_docs, {"role_filter": role})
+
+        futures = {
+            name: _search_executor.submit(
+                self._timed_search,
+                search_fn,
+                query=query,
+                top_k=top_k,
+                query_embedding=query_embedding,
+                **extra
+            )
+            for name, (_, search_fn, extra) in searches.items()
+        }
+
+        for name, future in futures.items():
+            key = searches[name][0]
+            results, elapsed_ms = future.result()
+            context[key] = results
+            context["timings_ms"][name] = elapsed_ms
+
+        context["timings_ms"]["total"] = (time.perf_counter() - total_start) * 1000
+        logger.info("RAG retrieval timings (ms): " + ", ".join(
+            f"{name}={elapsed:.1f}" for name, elapsed in context["timings_ms"].items()
+        ))
+
+        return context
+
     def get_rag_context(
         self,
         query: str,
@@ -528,34 +617,23 @@ class VectorDBService:
             include_docs: Whether to include documentation
 
         Returns:
-            Dictionary with relevant_tables, similar_examples, relevant_docs
+            Dictionary with relevant_tables, similar_examples, relevant_docs, timings_ms
         """
         try:
-            context = {
-                "relevant_tables": [],
-                "similar_examples": [],
-                "relevant_docs": []
-            }
-
-            # Get relevant schemas
-            context["relevant_tables"] = self.search_relevant_schema(query)
-
-            # Get similar examples if requested
-            if include_examples:
-                context["similar_examples"] = self.search_similar_examples(query)
-
-            # Get relevant docs if requested
-            if include_docs:
-                context["relevant_docs"] = self.search_docs(query, role_filter=role)
-
-            return context
+            return self.retrieve(
+                query,
+                role=role,
+                include_examples=include_examples,
+                include_docs=include_docs
+            )
 
         except Exception as e:
             logger.error(f"Error getting RAG context: {e}")
             return {
                 "relevant_tables": [],
                 "similar_examples": [],
-                "relevant_docs": []
+                "relevant_docs": [],
+                "timings_ms": {}
             }
 
     # ==================== Collection Management ====================
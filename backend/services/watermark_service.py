@@ -0,0 +1,315 @@
+"""
+Table change watermarks for cache freshness
+
+Tables referenced by recent queries are registered with touch(). A background
+task polls cheap change indicators for them in one round trip:
+MAX(updated_at) where an index leads with it, MAX(<integer primary key>), plus
+information_schema.TABLES.UPDATE_TIME (TABLE_ROWS is an InnoDB estimate that
+drifts on its own, so it is not used). MySQL 8 caches UPDATE_TIME for
+information_schema_stats_expiry seconds (a day by default), so the poll
+connection sets it to 0. Whenever a table's
+indicators change its version is bumped, so caches that embed
+version_token(tables) in their keys stop matching as soon as a change is
+observed instead of waiting for a TTL. Subscribers are also notified of the
+changed tables so they can free stale entries eagerly.
+"""
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set
+
+from sqlalchemy import text
+
+from backend.config import settings
+from backend.utils.schema_catalog import schema_catalog
+
+logger = logging.getLogger(__name__)
+
+# Candidate "last modified" columns, in order of preference
+UPDATED_AT_COLUMNS = ("updated_at", "modified_at", "updated_on", "modified_on")
+INTEGER_TYPES = ("int", "bigint", "mediumint", "smallint", "tinyint")
+
+
+def _quote(identifier: str) -> str:
+    return "`" + identifier.replace("`", "``") + "`"
+
+
+class TableWatermarkTracker:
+    """Polls per-table change indicators and publishes monotonically increasing versions"""
+
+    def __init__(
+        self,
+        poll_interval_seconds: Optional[float] = None,
+        idle_seconds: Optional[float] = None,
+        max_tables: Optional[int] = None
+    ):
+        self.poll_interval_seconds = poll_interval_seconds or settings.WATERMARK_POLL_INTERVAL_SECONDS
+        self.idle_seconds = idle_seconds or settings.WATERMARK_TABLE_IDLE_SECONDS
+        self.max_tables = max_tables or settings.WATERMARK_MAX_TABLES
+
+        # table -> {"version", "indicators", "last_referenced", "observed_at", "changed_at"}
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: List[Callable[[Set[str]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.polls = 0
+        self.poll_failures = 0
+        self.changes = 0
+        self.last_poll_ms = 0.0
+        self._stats_expiry_supported = True
+
+    # ==================== Registration ====================
+
+    def touch(self, tables: Iterable[str]):
+        """Register tables referenced by a query so they are polled"""
+        now = time.time()
+        added = False
+        for table in tables:
+            table = table.lower()
+            entry = self._tables.get(table)
+            if entry is None:
+                if len(self._tables) >= self.max_tables and not self._evict_idle(now):
+                    continue
+                entry = {"version": 0, "indicators": None, "observed_at": None, "changed_at": None}
+                self._tables[table] = entry
+                added = True
+            entry["last_referenced"] = now
+        if added and self._wakeup is not None:
+            # Observe new tables right away rather than after a full interval
+            self._wakeup.set()
+
+    def _evict_idle(self, now: float) -> bool:
+        """Forget the least recently referenced idle table to make room"""
+        idle = [
+            (entry["last_referenced"], table) for table, entry in self._tables.items()
+            if now - entry["last_referenced"] > self.idle_seconds
+        ]
+        if not idle:
+            return False
+        del self._tables[min(idle)[1]]
+        return True
+
+    def subscribe(self, callback: Callable[[Set[str]], None]):
+        """Call callback(changed_tables) whenever a poll observes changes"""
+        self._subscribers.append(callback)
+
+    # ==================== Versions ====================
+
+    def version(self, table: str) -> Optional[int]:
+        """Current version of a table, or None until it has been observed once"""
+        entry = self._tables.get(table.lower())
+        if entry is None or entry["observed_at"] is None:
+            return None
+        return entry["version"]
+
+    def version_token(self, tables: Iterable[str]) -> Optional[str]:
+        """
+        Combined version of a set of tables, for embedding in cache keys
+
+        Registers the tables for polling. Returns None while any of them has not
+        been observed yet (callers should then not cache).
+        """
+        tables = sorted({table.lower() for table in tables})
+        self.touch(tables)
+        parts = []
+        for table in tables:
+            version = self.version(table)
+            if version is None:
+                return None
+            parts.append(f"{table}:{version}")
+        return hashlib.sha1(",".join(parts).encode("utf-8")).hexdigest()[:12]
+
+    def changed_since(self, tables: Iterable[str], since: float) -> bool:
+        """Whether a change to any of the tables was observed after the given time"""
+        for table in tables:
+            entry = self._tables.get(table.lower())
+            if entry is not None and (entry["changed_at"] or 0) > since:
+                return True
+        return False
+
+    # ==================== Polling ====================
+
+    @staticmethod
+    def _leads_index(meta: Dict[str, Any], column: str) -> bool:
+        """Whether the primary key or an index starts with the column (MAX() is then a single index probe)"""
+        leading = [meta.get("primary_key") or []] + [index["columns"] for index in meta.get("indexes") or []]
+        return any(columns and columns[0].lower() == column.lower() for columns in leading)
+
+    @classmethod
+    def _indicator_select(cls, table: str) -> Optional[str]:
+        """
+        SELECT of the MAX() indicators a table supports (None if it has neither)
+
+        Only indexed columns are used: an unindexed MAX() scans the whole table
+        on every poll. What the indicators guarantee therefore depends on the
+        table: MAX(<integer primary key>) only sees inserts, and updates and
+        deletes are only seen through MAX(updated_at) when an index leads with
+        it. Otherwise they rely on UPDATE_TIME (InnoDB keeps it in memory only,
+        so it resets on a server restart).
+        """
+        meta = schema_catalog.get_table(table)
+        if meta is None:
+            return None
+        updated_col = next(
+            (col for col in UPDATED_AT_COLUMNS if col in meta["columns"] and cls._leads_index(meta, col)), None
+        )
+        id_col = None
+        if len(meta.get("primary_key") or []) == 1:
+            pk = meta["primary_key"][0]
+            column = meta["columns"].get(pk.lower(), {})
+            if str(column.get("type", "")).lower().startswith(INTEGER_TYPES):
+                id_col = pk
+        elif "id" in meta["columns"] and cls._leads_index(meta, "id"):
+            id_col = "id"
+        if not updated_col and not id_col:
+            return None
+
+        max_updated = f"CAST(MAX({_quote(updated_col)}) AS CHAR)" if updated_col else "NULL"
+        max_id = f"CAST(MAX({_quote(id_col)}) AS CHAR)" if id_col else "NULL"
+        return f"SELECT '{table}' AS t, {max_updated} AS max_updated, {max_id} AS max_id FROM {_quote(meta['name'])}"
+
+    async def poll(self) -> Set[str]:
+        """
+        Poll indicators for all registered tables once
+
+        The statements are killed server-side if they exceed
+        DB_HEALTH_CHECK_TIMEOUT_SECONDS.
+
+        Returns:
+            Tables whose indicators changed since the previous poll
+        """
+        from backend.models.database import async_engine
+        from backend.services.database_service import DatabaseService
+
+        now = time.time()
+        for table in [t for t, e in self._tables.items() if now - e["last_referenced"] > self.idle_seconds]:
+            del self._tables[table]
+        tables = list(self._tables)
+        if not tables:
+            return set()
+
+        start = time.time()
+        indicators: Dict[str, Dict[str, Any]] = {table: {} for table in tables}
+        selects = [select for select in (self._indicator_select(table) for table in tables) if select]
+        params = {f"t{i}": table for i, table in enumerate(tables)}
+        names = ", ".join(f":t{i}" for i in range(len(tables)))
+
+        async def read(conn):
+            if self._stats_expiry_supported:
+                try:
+                    # Read UPDATE_TIME from the storage engine instead of the cached statistics
+                    await conn.execute(text("SET SESSION information_schema_stats_expiry = 0"))
+                except Exception as e:
+                    # MySQL < 8.0 / MariaDB: no statistics cache to bypass
+                    self._stats_expiry_supported = False
+                    await conn.rollback()
+                    logger.info(f"information_schema_stats_expiry not supported: {e}")
+            result = await conn.execute(text(
+                "SELECT LOWER(TABLE_NAME), CAST(UPDATE_TIME AS CHAR) FROM information_schema.TABLES "
+                f"WHERE TABLE_SCHEMA = DATABASE() AND LOWER(TABLE_NAME) IN ({names})"
+            ), params)
+            for table, update_time in result.fetchall():
+                indicators[table]["update_time"] = update_time
+            if selects:
+                result = await conn.execute(text(" UNION ALL ".join(selects)))
+                for table, max_updated, max_id in result.fetchall():
+                    indicators[table].update({"max_updated": max_updated, "max_id": max_id})
+
+        async with async_engine.connect() as conn:
+            thread_id = await DatabaseService._server_thread_id(conn)
+            try:
+                await asyncio.wait_for(read(conn), timeout=settings.DB_HEALTH_CHECK_TIMEOUT_SECONDS)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # Cancelling the coroutine leaves the statement running on the server
+                await DatabaseService._kill_query(thread_id, async_engine)
+                await conn.invalidate()
+                raise
+
+        changed = set()
+        observed_at = time.time()
+        for table, values in indicators.items():
+            entry = self._tables.get(table)
+            if entry is None:
+                continue
+            if entry["indicators"] is not None and entry["indicators"] != values:
+                entry["version"] += 1
+                entry["changed_at"] = observed_at
+                changed.add(table)
+            entry["indicators"] = values
+            entry["observed_at"] = observed_at
+
+        self.polls += 1
+        self.changes += len(changed)
+        self.last_poll_ms = (time.time() - start) * 1000
+        if changed:
+            logger.info(f"Table changes observed: {sorted(changed)}")
+            for callback in self._subscribers:
+                try:
+                    callback(changed)
+                except Exception as e:
+                    logger.warning(f"Watermark subscriber failed: {e}")
+        return changed
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.poll_failures += 1
+                logger.warning(f"Watermark poll failed: {str(e) or type(e).__name__}")
+
+    def start(self):
+        """Start the background polling task (call from the running event loop)"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Watermark tracker started (every {self.poll_interval_seconds}s)")
+
+    async def stop(self):
+        """Stop the background polling task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get tracked tables with their versions and polling metrics"""
+        return {
+            "enabled": settings.WATERMARK_ENABLED,
+            "running": self.running,
+            "poll_interval_seconds": self.poll_interval_seconds,
+            "polls": self.polls,
+            "poll_failures": self.poll_failures,
+            "changes": self.changes,
+            "last_poll_ms": round(self.last_poll_ms, 2),
+            "tables": {
+                table: {
+                    "version": entry["version"],
+                    "observed": entry["observed_at"] is not None,
+                    "changed_at": entry["changed_at"],
+                    "indicators": entry["indicators"]
+                }
+                for table, entry in sorted(self._tables.items())
+            }
+        }
+
+
+# Create singleton instance
+watermark_tracker = TableWatermarkTracker()
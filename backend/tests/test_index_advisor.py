@@ -0,0 +1,28 @@
+"""
+Tests for index advisor predicate shapes (per-scope column resolution)
+"""
+import sqlglot
+
+from backend.services.index_advisor import extract_predicate_shapes, shape_key
+
+
+def shapes(sql_query):
+    tree = sqlglot.parse_one(sql_query, read="mysql")
+    return {table: shape_key(shape) for table, shape in extract_predicate_shapes(tree).items()}
+
+
+def test_in_subquery_is_a_join_and_keeps_inner_predicates():
+    assert shapes(
+        "SELECT u.first_name FROM users u WHERE u.id IN (SELECT user_id FROM hit_tickets WHERE status = 'open')"
+    ) == {"users": "join(id)", "hit_tickets": "eq(status) join(user_id)"}
+
+
+def test_correlated_exists_resolves_outer_alias():
+    assert shapes(
+        "SELECT first_name FROM users u WHERE EXISTS "
+        "(SELECT 1 FROM hit_tickets ht WHERE ht.helping_person_id = u.id AND status = 'open')"
+    ) == {"users": "join(id)", "hit_tickets": "eq(status) join(helping_person_id)"}
+
+
+def test_in_list_is_equality():
+    assert shapes("SELECT first_name FROM users WHERE department_id IN (1, 2)") == {"users": "eq(department_id)"}
@@ -0,0 +1,57 @@
+"""
+Tests for schema catalog reference resolution (subquery scoping)
+"""
+import pytest
+
+from backend.utils.schema_catalog import SchemaCatalog
+
+SCHEMA_SQL = """
+CREATE TABLE `users` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `first_name` varchar(100) NOT NULL,
+  `department_id` int DEFAULT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+CREATE TABLE `hit_tickets` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `user_id` int NOT NULL,
+  `helping_person_id` int DEFAULT NULL,
+  `hdepartment_id` int DEFAULT NULL,
+  `status` varchar(20) NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return SchemaCatalog().load_from_sql(SCHEMA_SQL)
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT first_name FROM users WHERE id IN (SELECT user_id FROM hit_tickets)",
+    "SELECT first_name FROM users WHERE department_id NOT IN (SELECT hdepartment_id FROM hit_tickets WHERE status = 'open')",
+    "SELECT first_name FROM users u WHERE EXISTS (SELECT 1 FROM hit_tickets ht WHERE ht.user_id = u.id AND status = 'open')",
+    "SELECT first_name FROM users u WHERE (SELECT COUNT(*) FROM hit_tickets WHERE helping_person_id = u.id) > 2",
+    "SELECT first_name FROM users WHERE EXISTS (SELECT 1 FROM hit_tickets WHERE user_id = users.id AND department_id = 3)",
+])
+def test_subquery_columns_resolve_in_their_own_scope(catalog, sql_query):
+    assert catalog.validate_sql(sql_query) == (True, "Schema validation passed")
+
+
+def test_invalid_column_inside_in_subquery(catalog):
+    is_valid, message = catalog.validate_sql(
+        "SELECT first_name FROM users WHERE id IN (SELECT bogus FROM hit_tickets)"
+    )
+    assert not is_valid
+    assert "bogus (not in hit_tickets)" in message
+    assert "users" not in message
+
+
+def test_invalid_outer_column_with_in_subquery(catalog):
+    is_valid, message = catalog.validate_sql(
+        "SELECT bogus FROM users WHERE id IN (SELECT user_id FROM hit_tickets)"
+    )
+    assert not is_valid
+    assert "bogus (not in users)" in message
+    assert "user_id" not in message
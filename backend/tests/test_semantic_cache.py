@@ -0,0 +1,24 @@
+"""
+Tests for semantic cache reuse (literal and entity matching)
+"""
+from backend.services.semantic_cache import SemanticQueryCache, extract_literals
+
+
+def test_extract_literals():
+    assert extract_literals("Show tickets assigned to John in IT department created after 2024-01-05") == {
+        "john", "it", "2024-01-05"
+    }
+    assert extract_literals("Top 5 tickets with status 'open' from last week") == {"5.0", "'open", "last week"}
+    assert extract_literals("How many help tickets are pending by all users, give names") == frozenset()
+
+
+def test_similar_question_with_different_literal_is_a_miss():
+    cache = SemanticQueryCache(threshold=0.95, ttl_seconds=60, max_entries=10)
+    cache.store("Tickets assigned to John", [1.0, 0.0, 0.01], None, "SELECT 'John'", True)
+
+    assert cache.lookup("Tickets assigned to Priya", [1.0, 0.0, 0.02]) is None
+    assert cache.lookup("Top 10 tickets assigned to John", [1.0, 0.0, 0.02]) is None
+    assert cache.get_stats()["literal_mismatches"] == 2
+
+    hit = cache.lookup("Show tickets assigned to John", [1.0, 0.0, 0.02])
+    assert hit is not None and hit["sql_query"] == "SELECT 'John'"
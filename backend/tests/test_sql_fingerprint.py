@@ -0,0 +1,34 @@
+"""
+Tests for SQL fingerprinting (cacheability of time-dependent queries)
+"""
+import pytest
+
+from backend.utils.sql_fingerprint import fingerprint_sql
+
+
+@pytest.mark.parametrize("condition", [
+    "created_at >= CURDATE()",
+    "created_at >= CURRENT_DATE",
+    "created_at >= DATE_SUB(NOW(), INTERVAL 1 HOUR)",
+    "created_at >= CURRENT_TIMESTAMP - INTERVAL 1 DAY",
+    "TIME(created_at) < CURTIME()",
+    "UNIX_TIMESTAMP(created_at) > UNIX_TIMESTAMP() - 3600",
+    "created_at < UTC_TIMESTAMP()",
+    "created_at < LOCALTIME",
+    "created_at < SYSDATE()",
+])
+def test_clock_functions_are_not_cacheable(condition):
+    assert fingerprint_sql(f"SELECT id FROM hit_tickets WHERE {condition}")[3] is False
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT id FROM hit_tickets WHERE created_at >= '2024-01-01'",
+    "SELECT UNIX_TIMESTAMP(created_at) AS ts FROM hit_tickets",
+])
+def test_fixed_queries_are_cacheable(sql_query):
+    assert fingerprint_sql(sql_query)[3] is True
+
+
+def test_literals_change_the_fingerprint():
+    assert fingerprint_sql("SELECT id FROM users WHERE id = 1")[0] != fingerprint_sql("SELECT id FROM users WHERE id = 2")[0]
+    assert fingerprint_sql("select id  from users where id = 1")[0] == fingerprint_sql("SELECT id FROM users WHERE id = 1")[0]
@@ -0,0 +1,46 @@
+"""
+Tests for local repair of misspelled identifiers
+"""
+import pytest
+
+from backend.utils.schema_catalog import SchemaCatalog
+from backend.utils.sql_repair import SQLRepairer
+
+SCHEMA_SQL = """
+CREATE TABLE `users` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `first_name` varchar(100) NOT NULL,
+  `remarks` text,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+CREATE TABLE `hit_tickets` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `user_id` int NOT NULL,
+  `remark` text,
+  `status` varchar(20) NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+
+@pytest.fixture(scope="module")
+def repairer():
+    return SQLRepairer(SchemaCatalog().load_from_sql(SCHEMA_SQL))
+
+
+def test_misspelled_column_is_repaired(repairer):
+    result = repairer.repair("SELECT first_nmae FROM users WHERE id = 1")
+    assert result["repaired_sql"] == "SELECT first_name FROM users WHERE id = 1"
+    assert result["repairs"] == [{"kind": "column", "from": "first_nmae", "to": "first_name"}]
+
+
+def test_repair_only_touches_the_failing_scope(repairer):
+    # t.remark is valid on hit_tickets (outer t) but not on users (inner t)
+    result = repairer.repair(
+        "SELECT t.remark FROM hit_tickets AS t "
+        "WHERE t.user_id IN (SELECT t.id FROM users AS t WHERE t.remark = 'x')"
+    )
+    assert result["repaired_sql"] == (
+        "SELECT t.remark FROM hit_tickets AS t "
+        "WHERE t.user_id IN (SELECT t.id FROM users AS t WHERE t.remarks = 'x')"
+    )
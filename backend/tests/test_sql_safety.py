@@ -0,0 +1,39 @@
+"""
+Tests for deterministic SQL safety validation
+"""
+import pytest
+
+from backend.utils.sql_safety import check_read_only_select
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT * FROM users /*! INTO OUTFILE '/tmp/x' */",
+    "SELECT id /*!, SLEEP(100) */ FROM users",
+    "SELECT id /*!, BENCHMARK(1e9, MD5(1)) */ FROM users",
+    "SELECT * FROM users /*!50000 FOR UPDATE */",
+    "/*! SELECT SLEEP(100) */ SELECT 1",
+    "SELECT /*+ SET_VAR(sql_mode='') */ id FROM users",
+])
+def test_executable_comments_are_rejected(sql_query):
+    is_safe, reason = check_read_only_select(sql_query)
+    assert is_safe is False
+    assert "comments" in reason
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT id FROM users /* plain comment */",
+    "SELECT id FROM users WHERE first_name = '/*! not a comment */'",
+])
+def test_plain_comments_and_literals_are_allowed(sql_query):
+    assert check_read_only_select(sql_query) == (True, "Read-only SELECT verified by syntax tree")
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT * FROM users INTO OUTFILE '/tmp/x'",
+    "SELECT SLEEP(100)",
+    "SELECT * FROM users FOR UPDATE",
+    "DELETE FROM users",
+    "SELECT 1; DROP TABLE users",
+])
+def test_unsafe_statements_are_rejected(sql_query):
+    assert check_read_only_select(sql_query)[0] is False
@@ -0,0 +1,57 @@
+"""
+Cancel request work when the HTTP client goes away
+
+FastAPI keeps running a handler after the client disconnects. Long-running
+handlers (query execution in particular) are wrapped so the work is cancelled
+instead, which in turn kills the running database statement.
+"""
+import asyncio
+import logging
+from typing import Awaitable, TypeVar, Optional
+
+from fastapi import HTTPException, Request
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Non-standard status (nginx convention) for requests the client abandoned
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T], poll_interval: Optional[float] = None) -> T:
+    """
+    Await work, cancelling it if the client disconnects first
+
+    Args:
+        request: Incoming request to watch
+        work: Coroutine producing the response
+        poll_interval: Seconds between disconnect checks (defaults to DISCONNECT_POLL_INTERVAL_SECONDS)
+
+    Returns:
+        The result of work
+
+    Raises:
+        HTTPException(499) when the client disconnected and the work was cancelled
+    """
+    poll_interval = poll_interval or settings.DISCONNECT_POLL_INTERVAL_SECONDS
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected, cancelling {request.method} {request.url.path}")
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        # Handler itself cancelled (e.g. server shutdown): do not leave the work running
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,154 @@
+"""
+Token-budgeted prompt assembly
+
+Each prompt section (schema, examples, docs, transcript, role instructions)
+gets its own token budget. Ranked sections keep the closest candidates by
+retrieval distance that fit, truncating the top candidate if it alone is too
+large; free-text sections are truncated. The per-section token breakdown is
+reported so it can be returned with each request.
+"""
+import re
+import logging
+from typing import Dict, Any, List, Optional
+
+from backend.config import settings
+from backend.utils.token_counter import count_tokens, count_static_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def default_budgets() -> Dict[str, int]:
+    """Per-section token budgets from settings"""
+    return {
+        "schema": settings.PROMPT_BUDGET_SCHEMA_TOKENS,
+        "examples": settings.PROMPT_BUDGET_EXAMPLES_TOKENS,
+        "docs": settings.PROMPT_BUDGET_DOCS_TOKENS,
+        "transcript": settings.PROMPT_BUDGET_TRANSCRIPT_TOKENS,
+        "role": settings.PROMPT_BUDGET_ROLE_TOKENS
+    }
+
+
+class PromptBudget:
+    """Fits prompt sections into per-section token budgets and records the breakdown"""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, model: Optional[str] = None):
+        self.budgets = {**default_budgets(), **(budgets or {})}
+        self.model = model or settings.OPENAI_MODEL
+        self.sections: Dict[str, Dict[str, Any]] = {}
+
+    def _record(self, name: str, tokens: int, budget: Optional[int], **extra):
+        section = self.sections.setdefault(name, {"tokens": 0, "budget": budget})
+        section["tokens"] += tokens
+        for key, value in extra.items():
+            section[key] = section.get(key, 0) + value
+
+    def merge(self, sections: Dict[str, Dict[str, Any]]):
+        """Replay a previously recorded breakdown (e.g., for a memoized prompt prefix)"""
+        for name, section in sections.items():
+            extra = {key: value for key, value in section.items() if key not in ("tokens", "budget")}
+            self._record(name, section["tokens"], section["budget"], **extra)
+
+    def fixed(self, name: str, text: str) -> str:
+        """Account for text that is always included as-is (instructions, headers)"""
+        self._record(name, count_tokens(text, self.model), None)
+        return text
+
+    def text(self, name: str, text: str) -> str:
+        """Truncate free text to the section budget"""
+        budget = self.budgets.get(name)
+        tokens = count_tokens(text, self.model)
+        truncated = 0
+        if budget is not None and tokens > budget:
+            text = truncate_to_tokens(text, budget, self.model)
+            tokens = count_tokens(text, self.model)
+            truncated = 1
+        self._record(name, tokens, budget, truncated=truncated)
+        return text
+
+    def ranked(
+        self,
+        name: str,
+        candidates: List[Dict[str, Any]],
+        max_items: Optional[int] = None,
+        static: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Keep the best-ranked candidates that fit the section budget
+
+        Args:
+            name: Section name (budget key)
+            candidates: Dicts with "text" and optional "distance" (lower is better;
+                missing distances rank last, preserving input order)
+            max_items: Optional cap on the number of candidates kept
+            static: Candidate texts repeat across requests (schema blocks), so their
+                token counts are memoized
+
+        Returns:
+            Selected candidates in rank order; "text" may be truncated for the first
+        """
+        budget = self.budgets.get(name)
+        count = count_static_tokens if static else count_tokens
+        order = sorted(
+            range(len(candidates)),
+            key=lambda i: (candidates[i].get("distance") is None, candidates[i].get("distance") or 0.0, i)
+        )
+
+        selected = []
+        used = 0
+        dropped = 0
+        truncated = 0
+        for i in order:
+            candidate = candidates[i]
+            if max_items is not None and len(selected) >= max_items:
+                dropped += 1
+                continue
+            tokens = count(candidate["text"], self.model)
+            if budget is None or used + tokens <= budget:
+                selected.append(candidate)
+                used += tokens
+            elif not selected:
+                # Even the best candidate is too large: keep a truncated copy rather than nothing
+                text = truncate_to_tokens(candidate["text"], budget, self.model)
+                selected.append({**candidate, "text": text})
+                used += count_tokens(text, self.model)
+                truncated += 1
+            else:
+                dropped += 1
+
+        self._record(name, used, budget, items=len(selected), dropped=dropped, truncated=truncated)
+        return selected
+
+    def report(self) -> Dict[str, Any]:
+        """Token breakdown per section plus the total"""
+        return {
+            "model": self.model,
+            "sections": self.sections,
+            "total_tokens": sum(section["tokens"] for section in self.sections.values())
+        }
+
+
+def rank_schema_blocks(schema_text: str, user_query: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Split a formatted schema into table blocks ranked by lexical overlap with the query
+
+    Used where no retrieval distance exists (non-RAG prompts). Section headers
+    and the relationships block always rank first; tables the query mentions
+    rank ahead of the rest, which keep their original (priority) order.
+    """
+    query_terms = set(re.findall(r"[a-z0-9]+", (user_query or "").lower()))
+    # Crude singularisation so "tickets" matches hit_tickets / ticket_id alike
+    query_terms |= {term[:-1] for term in query_terms if term.endswith("s") and len(term) > 3}
+
+    candidates = []
+    for index, block in enumerate(schema_text.split("\n\n")):
+        if not block.strip():
+            continue
+        if not block.startswith("Table:"):
+            candidates.append({"text": block, "distance": -1.0, "index": index})
+            continue
+        table_name = block.split("\n", 1)[0][len("Table:"):].strip().lower()
+        table_terms = set(re.findall(r"[a-z0-9]+", table_name.replace("_", " ")))
+        table_terms |= {term[:-1] for term in table_terms if term.endswith("s") and len(term) > 3}
+        overlap = len(query_terms & table_terms)
+        candidates.append({"text": block, "distance": 1.0 / (1 + overlap) if overlap else None, "index": index})
+    return candidates
@@ -3,25 +3,31 @@ AI Prompts for the Agentic System
 """
 import os
 import logging
-from typing import Optional
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
 from .schema_loader import DB_SCHEMA
+from .prompt_budget import PromptBudget, rank_schema_blocks
 from backend.config import settings
 
 logger = logging.getLogger(__name__)
 
  
-def get_system_prompt() -> str:
+def get_system_prompt(schema_text: Optional[str] = None) -> str:
     """
     Generate system prompt with dynamically loaded database schema
 
+    Args:
+        schema_text: Optional (budgeted) schema to embed instead of the full DB_SCHEMA
+
     Returns:
         Complete system prompt with current database schema
     """
+    schema_text = DB_SCHEMA if schema_text is None else schema_text
     return f"""You are an expert SQL query generator for a Project Management System (PMS) database.
 
 DATABASE SCHEMA:
 
-{DB_SCHEMA}
+{schema_text}
 
 CRITICAL INSTRUCTIONS - FOLLOW STRICTLY:
 
@@ -786,9 +792,30 @@ Now generate a SQL query for the following question:
 SYSTEM_PROMPT = get_system_prompt()
 
 
+# Extracted transcript text keyed by path -> (mtime, size, text)
+_transcript_cache: Dict[str, Tuple[float, int, str]] = {}
+
+# Memoized prompt prefixes (everything except the per-query suffix), LRU bounded
+_prompt_prefix_cache: "OrderedDict[tuple, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+_PROMPT_PREFIX_CACHE_SIZE = 128
+_prompt_cache_stats = {"hits": 0, "misses": 0, "transcript_reads": 0}
+
+
+def transcript_signature(path: Optional[str] = None) -> Optional[Tuple[float, int]]:
+    """(mtime, size) of the transcript file, or None if it does not exist"""
+    transcript_path = path or settings.TRANSCRIPT_PATH
+    try:
+        stat = os.stat(transcript_path)
+        return stat.st_mtime, stat.st_size
+    except (OSError, TypeError):
+        return None
+
+
 def read_transcript(path: Optional[str] = None, max_chars: int = 4000) -> str:
     """Read transcript text from a file (supports .txt and .pdf).
 
+    Extracted text is cached per path and reused until the file's mtime or size changes.
+
     Args:
         path: Optional path to transcript file. If not provided, uses settings.TRANSCRIPT_PATH.
         max_chars: Maximum number of characters to return (to avoid token overload).
@@ -802,10 +829,29 @@ def read_transcript(path: Optional[str] = None, max_chars: int = 4000) -> str:
         logger.debug("No transcript path configured")
         return ""
 
-    if not os.path.exists(transcript_path):
+    signature = transcript_signature(transcript_path)
+    if signature is None:
         logger.warning(f"Transcript file not found at {transcript_path}")
         return ""
 
+    cached = _transcript_cache.get(transcript_path)
+    if cached is not None and cached[:2] == signature:
+        text = cached[2]
+    else:
+        text = _extract_transcript_text(transcript_path)
+        _transcript_cache[transcript_path] = (signature[0], signature[1], text)
+        _prompt_cache_stats["transcript_reads"] += 1
+
+    # Truncate to reasonable size to avoid token issues
+    if len(text) > max_chars:
+        logger.debug(f"Truncating transcript to {max_chars} characters")
+        return text[:max_chars]
+
+    return text
+
+
+def _extract_transcript_text(transcript_path: str) -> str:
+    """Extract the full text of a transcript file (uncached)"""
     try:
         if transcript_path.lower().endswith('.txt'):
             with open(transcript_path, 'r', encoding='utf-8') as f:
@@ -835,11 +881,7 @@ def read_transcript(path: Optional[str] = None, max_chars: int = 4000) -> str:
             logger.warning(f"Transcript file found but no text extracted: {transcript_path}")
             return ""
 
-        # Truncate to reasonable size to avoid token issues
-        if len(text) > max_chars:
-            logger.info(f"Truncating transcript to {max_chars} characters")
-            return text[:max_chars]
-
+        logger.info(f"Extracted {len(text)} characters from transcript {transcript_path}")
         return text
 
     except Exception as e:
@@ -847,21 +889,135 @@ def read_transcript(path: Optional[str] = None, max_chars: int = 4000) -> str:
         return ""
 
 
-def get_role_system_prompt(role: str, user_query: Optional[str] = None, transcript_path: Optional[str] = None) -> str:
+def _memoized_prefix(key: tuple, budget: PromptBudget, build) -> str:
+    """
+    Return a cached prompt prefix, building it with build(section_budget) on a miss
+
+    The key must include everything the prefix depends on; the section token
+    breakdown recorded while building is replayed into budget on every hit.
+    Entries built against an older schema catalog version are dropped.
+    """
+    from backend.utils.schema_catalog import schema_catalog
+
+    key = (schema_catalog.version,) + key
+    cached = _prompt_prefix_cache.get(key)
+    if cached is not None:
+        _prompt_prefix_cache.move_to_end(key)
+        _prompt_cache_stats["hits"] += 1
+        prefix, sections = cached
+    else:
+        _prompt_cache_stats["misses"] += 1
+        stale = [k for k in _prompt_prefix_cache if k[0] != schema_catalog.version]
+        for k in stale:
+            del _prompt_prefix_cache[k]
+
+        section_budget = PromptBudget(budget.budgets, budget.model)
+        prefix = build(section_budget)
+        sections = section_budget.sections
+        _prompt_prefix_cache[key] = (prefix, sections)
+        while len(_prompt_prefix_cache) > _PROMPT_PREFIX_CACHE_SIZE:
+            _prompt_prefix_cache.popitem(last=False)
+
+    budget.merge(sections)
+    return prefix
+
+
+def invalidate_prompt_cache(reason: str = "manual"):
+    """Drop memoized prompt prefixes and extracted transcript text"""
+    count = len(_prompt_prefix_cache)
+    _prompt_prefix_cache.clear()
+    _transcript_cache.clear()
+    logger.info(f"Prompt cache invalidated ({reason}), dropped {count} prefixes")
+
+
+def get_prompt_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the prompt prefix and transcript caches"""
+    lookups = _prompt_cache_stats["hits"] + _prompt_cache_stats["misses"]
+    return {
+        **_prompt_cache_stats,
+        "hit_rate": round(_prompt_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "prefixes": len(_prompt_prefix_cache),
+        "transcripts": len(_transcript_cache)
+    }
+
+
+def get_budgeted_system_prompt(user_query: Optional[str] = None, budget: Optional[PromptBudget] = None) -> str:
+    """Build the base system prompt with the schema trimmed to the schema token budget.
+
+    Tables are ranked by overlap with the user query so the most relevant ones
+    survive when the full schema does not fit.
+
+    Args:
+        user_query: Optional user query used to rank tables
+        budget: PromptBudget to record the breakdown in (a default one is used if omitted)
+
+    Returns:
+        System prompt string
+    """
+    budget = budget or PromptBudget()
+    blocks = budget.ranked("schema", rank_schema_blocks(DB_SCHEMA, user_query), static=True)
+
+    def build(section_budget: PromptBudget) -> str:
+        section_budget.fixed("instructions", get_system_prompt(schema_text=""))
+        return get_system_prompt(schema_text="\n\n".join(block["text"] for block in blocks))
+
+    # Queries that select the same tables share one prompt
+    key = ("base", tuple(block["index"] for block in blocks), tuple(sorted(budget.budgets.items())))
+    return _memoized_prefix(key, budget, build)
+
+
+def get_role_system_prompt(
+    role: str,
+    user_query: Optional[str] = None,
+    transcript_path: Optional[str] = None,
+    budget: Optional[PromptBudget] = None
+) -> str:
     """Build a role-aware system prompt that includes the DB schema and transcript context.
 
     Args:
         role: Role name (e.g., 'fms-admin', 'hit-admin', 'recurring-admin')
         user_query: Optional user query to give context when building the prompt
         transcript_path: Optional path to transcript file (overrides settings)
+        budget: PromptBudget for schema/transcript/role sections (a default one is used if omitted)
 
     Returns:
         Combined system prompt string
     """
-    base = get_system_prompt()
+    budget = budget or PromptBudget()
+    transcript_source = transcript_path or settings.TRANSCRIPT_PATH
+    blocks = budget.ranked("schema", rank_schema_blocks(DB_SCHEMA, user_query), static=True)
+
+    def build(section_budget: PromptBudget) -> str:
+        base = get_system_prompt(schema_text="\n\n".join(block["text"] for block in blocks))
+        section_budget.fixed("instructions", get_system_prompt(schema_text=""))
+        transcript_text = section_budget.text("transcript", read_transcript(transcript_path))
+        role_section = section_budget.text("role", _role_instructions(role))
+
+        transcript_section = ""
+        if transcript_text:
+            transcript_section = f"\n\nTRANSCRIPT CONTEXT (source: {transcript_source}):\n{transcript_text}\n\n"
+
+        return f"{base}\n\n# ROLE: {role}\n{role_section}{transcript_section}"
+
+    # The prefix depends on the role, the selected tables and the transcript file version
+    key = (
+        "role",
+        role,
+        transcript_source,
+        transcript_signature(transcript_path),
+        tuple(block["index"] for block in blocks),
+        tuple(sorted(budget.budgets.items()))
+    )
+    prefix = _memoized_prefix(key, budget, build)
+
+    # Add optional user query context (the only per-query part)
+    user_context = budget.fixed("question", f"\n\nUSER QUERY CONTEXT: {user_query}" if user_query else "")
 
-    transcript_text = read_transcript(transcript_path)
+    return f"{prefix}{user_context}"
 
+
+def _role_instructions(role: str) -> str:
+    """Role-specific guidance paragraphs for the role-aware system prompt"""
     role_instructions = []
 
     # Role-specific guidance
@@ -881,165 +1037,35 @@ def get_role_system_prompt(role: str, user_query: Optional[str] = None, transcri
     # General admin guidance
     role_instructions.append("When role-specific instructions exist in the transcript, treat the transcript as authoritative and prefer it over general assumptions. Prefer concise (1-2 sentence) responses for brief requests, but when the user's query asks for an explanation, or when the returned data shows complexity, patterns, or anomalies, provide a full, clear explanation (3-6 sentences or more as needed) and include recommendations when applicable.")
 
-    role_section = "\n\n".join(role_instructions)
-
-    transcript_section = ""
-    if transcript_text:
-        transcript_section = f"\n\nTRANSCRIPT CONTEXT (source: {transcript_path or settings.TRANSCRIPT_PATH}):\n{transcript_text}\n\n"
-
-    # Add optional user query context
-    user_context = f"\n\nUSER QUERY CONTEXT: {user_query}" if user_query else ""
-
-    combined = f"{base}\n\n# ROLE: {role}\n{role_section}{transcript_section}{user_context}"
-
-    return combined
+    return "\n\n".join(role_instructions)
 
 
 def extract_steps_from_transcript(role: str, query: Optional[str] = None, transcript_path: Optional[str] = None) -> list:
-    """Try to extract numbered steps/instructional sections for a given role from the transcript.
+    """Find numbered steps/instructional sections for a given role in the transcript.
+
+    Uses the pre-built transcript index (whole document, rebuilt when the file changes).
 
     Returns a list of short step strings or an empty list if nothing found.
     """
-    import re
-
-    text = read_transcript(transcript_path, max_chars=8000)
-    if not text:
-        return []
-
-    # Normalize
-    lower_text = text.lower()
-    search_targets = []
-
-    # Role-specific search phrases
-    if role and role.lower() in ('hit-admin', 'hit_admin', 'hit'):
-        search_targets += [
-            r'how to create a help ticket',
-            r'how to raise a help ticket',
-            r'steps to create a help ticket',
-            r'procedure to create a help ticket',
-            r'creating a help ticket',
-            r'what is a help ticket',
-            r'definition of a help ticket',
-        ]
-    if role and role.lower() in ('fms-admin', 'fms_admin', 'fms'):
-        search_targets += [
-            r'how to create an fms workflow',
-            r'steps to create an fms workflow',
-            r'procedure to create fms workflow',
-            r'creating an fms workflow',
-            r'what is an fms workflow',
-            r'definition of fms workflow',
-        ]
-    if role and role.lower() in ('recurring-admin', 'recurring_admin', 'recurring'):
-        search_targets += [
-            r'how to create a recurring task',
-            r'steps to create a recurring task',
-            r'procedure to create recurring task',
-            r'creating recurring tasks',
-            r'what is a recurring task',
-            r'definition of recurring task',
-        ]
-    # Support 'executive', generic 'admin' and 'manager' role queries as well
-    if role and role.lower() in ('executive', 'exec', 'admin', 'manager'):
-        search_targets += [
-            r'how to create a help ticket',
-            r'steps to create a help ticket',
-            r'what is a help ticket',
-            r'how to create an fms workflow',
-            r'what is a recurring task',
-            r'procedure to create a help ticket',
-            r'steps to create a recurring task',
-        ]
-
-    # Add query text as search target if present
-    if query:
-        search_targets.insert(0, re.escape(query.lower()))
-
-    for target in search_targets:
-        m = re.search(target, lower_text, flags=re.IGNORECASE)
-        if m:
-            start = m.start()
-            # extract following chunk up to next double newline or 1000 chars
-            post = text[start:start+1500]
-
-            # Remove headings like '### Summary of the Data'
-            post = re.sub(r"###\s*summary of the data", "", post, flags=re.I)
-
-            # Try to find numbered list patterns
-            lines = re.split(r'\n', post)
-            steps = []
-            for ln in lines:
-                ln_stripped = ln.strip()
-                # numbered patterns
-                num_match = re.match(r'^(?:\d+\.|step\s*\d+[:.-]?|\-\s+|\*\s+)(.+)', ln_stripped, flags=re.I)
-                if num_match:
-                    step_text = num_match.group(1).strip()
-                    if step_text and len(step_text) > 3:
-                        steps.append(step_text)
-            if steps:
-                return steps
-
-            # If no explicit list, fall back to sentence splitting and pick sentences that look like steps
-            sentences = re.split(r'(?<=[\.\?\!])\s+', post)
-            candidate_steps = []
-            for s in sentences:
-                s_clean = s.strip()
-                if len(s_clean) < 50 and len(s_clean) > 5 and re.match(r'^(step\s*\d+|\d+\.|start|first|then|next|finally|to create|click|select|open|navigate)', s_clean.lower()):
-                    candidate_steps.append(s_clean)
-                elif len(candidate_steps) < 5 and len(s_clean) > 20 and s_clean[0].isupper() and s_clean.endswith('.'):
-                    # subjective fallback pick short sentences
-                    candidate_steps.append(s_clean)
-            if candidate_steps:
-                # normalize to short sentences
-                normalized = [re.sub(r'\s+', ' ', re.sub(r'^(step\s*\d+[:.-]?\s*)', '', s, flags=re.I)).strip().rstrip('.') for s in candidate_steps]
-                return normalized
-
-    return []
+    from backend.utils.transcript_index import get_transcript_index
+
+    return get_transcript_index(transcript_path).find_steps(query, role)
 
 
 def extract_definition_from_transcript(subject_keywords: list, transcript_path: Optional[str] = None, max_chars: int = 4000) -> str:
-    """Extract a short definition for a subject from the transcript.
+    """Find a short definition for a subject in the transcript.
 
     Args:
         subject_keywords: list of keyword phrases to search for (e.g., ['help ticket', 'help-ticket'])
         transcript_path: optional path override
-        max_chars: number of chars to read from transcript
+        max_chars: unused; the index covers the whole transcript (kept for compatibility)
 
     Returns:
         A concise definition string or empty string if not found.
     """
-    import re
-
-    text = read_transcript(transcript_path, max_chars=max_chars)
-    if not text:
-        return ""
+    from backend.utils.transcript_index import get_transcript_index
 
-    lower_text = text.lower()
-
-    # Look for 'what is X' or 'X is' patterns
-    for kw in subject_keywords:
-        # attempt 'what is {kw}'
-        m = re.search(rf'what\s+is\s+{re.escape(kw)}', lower_text, flags=re.I)
-        if m:
-            start = m.start()
-            post = text[start:start+800]
-            # find first sentence after match
-            sentences = re.split(r'(?<=[\.\?\!])\s+', post)
-            if len(sentences) > 1:
-                # return first explanatory sentence
-                return sentences[1].strip().rstrip('.')
-
-        # attempt pattern '{kw} is' or '{kw} refers to'
-        m2 = re.search(rf'{re.escape(kw)}\s+(is|refers to|means|are)', lower_text, flags=re.I)
-        if m2:
-            start = m2.start()
-            post = text[start:start+400]
-            sentences = re.split(r'(?<=[\.\?\!])\s+', post)
-            if sentences:
-                # return the sentence starting at the match
-                return sentences[0].strip().rstrip('.')
-
-    return ""
+    return get_transcript_index(transcript_path).find_definition(subject_keywords)
 
 
 # Prompt for explaining results
@@ -1057,27 +1083,32 @@ def build_rag_system_prompt(
     relevant_tables: list,
     similar_examples: list = None,
     relevant_docs: list = None,
-    role: Optional[str] = None
+    role: Optional[str] = None,
+    budget: Optional[PromptBudget] = None
 ) -> str:
     """
     Build an optimized system prompt using RAG context.
 
     This uses retrieved relevant context instead of the full database schema,
-    significantly reducing token usage while maintaining accuracy.
+    significantly reducing token usage while maintaining accuracy. Tables,
+    examples and docs are ranked by retrieval distance and trimmed to their
+    section token budgets.
 
     Args:
         relevant_tables: List of relevant table schemas from vector search
         similar_examples: List of similar query examples
         relevant_docs: List of relevant documentation chunks
         role: Optional role for role-specific instructions
+        budget: PromptBudget to fit sections into (a default one is used if omitted)
 
     Returns:
         Optimized system prompt with relevant context only
     """
+    budget = budget or PromptBudget()
     prompt_parts = []
 
     # Header
-    prompt_parts.append("""You are an expert SQL query generator for a Project Management System (PMS) database.
+    prompt_parts.append(budget.fixed("instructions", """You are an expert SQL query generator for a Project Management System (PMS) database.
 
 CRITICAL INSTRUCTIONS - FOLLOW STRICTLY:
 
@@ -1111,51 +1142,57 @@ CRITICAL INSTRUCTIONS - FOLLOW STRICTLY:
    - For status breakdowns: use SUM(condition) AS column_name pattern
    - Single entity + status → PIE CHART
    - Multiple entities + status → STACKED BAR CHART
-   - Rankings → BAR CHART""")
+   - Rankings → BAR CHART"""))
 
-    # Add relevant tables
+    # Add relevant tables (closest first, within the schema budget)
     if relevant_tables:
+        tables = budget.ranked("schema", [
+            {"text": table.get("schema_text", ""), "distance": table.get("distance")}
+            if isinstance(table, dict) else {"text": str(table)}
+            for table in relevant_tables
+        ], static=True)
         prompt_parts.append("\n\n=== RELEVANT TABLES ===\n")
-        for table in relevant_tables:
-            if isinstance(table, dict):
-                prompt_parts.append(table.get("schema_text", ""))
-            else:
-                prompt_parts.append(str(table))
+        for table in tables:
+            prompt_parts.append(table["text"])
             prompt_parts.append("\n")
 
     # Add similar examples
     if similar_examples:
+        examples = budget.ranked("examples", [
+            {"text": f"{example.get('natural_language', '')}\nSQL: {example.get('sql_query', '')}", "distance": example.get("distance")}
+            if isinstance(example, dict) else {"text": str(example), "raw": True}
+            for example in similar_examples
+        ], max_items=3)  # Limit to 3 examples
         prompt_parts.append("\n=== SIMILAR QUERY EXAMPLES ===\n")
-        for i, example in enumerate(similar_examples[:3], 1):  # Limit to 3 examples
-            if isinstance(example, dict):
-                nl = example.get("natural_language", "")
-                sql = example.get("sql_query", "")
-                prompt_parts.append(f"Q{i}: {nl}\nSQL: {sql}\n\n")
+        for i, example in enumerate(examples, 1):
+            if example.get("raw"):
+                prompt_parts.append(f"{example['text']}\n")
             else:
-                prompt_parts.append(f"{example}\n")
+                prompt_parts.append(f"Q{i}: {example['text']}\n\n")
 
     # Add relevant documentation
     if relevant_docs:
+        docs = budget.ranked("docs", [
+            {"text": doc.get("content", ""), "distance": doc.get("distance")}
+            if isinstance(doc, dict) else {"text": str(doc)}
+            for doc in relevant_docs
+        ], max_items=3)  # Limit to 3 docs
         prompt_parts.append("\n=== RELEVANT GUIDELINES ===\n")
-        for doc in relevant_docs[:3]:  # Limit to 3 docs
-            if isinstance(doc, dict):
-                content = doc.get("content", "")
-                prompt_parts.append(f"{content}\n\n")
-            else:
-                prompt_parts.append(f"{doc}\n")
+        for doc in docs:
+            prompt_parts.append(f"{doc['text']}\n\n")
 
     # Add role-specific instructions
     if role:
         role_l = role.lower()
         if 'fms' in role_l:
-            prompt_parts.append("\n=== FMS ADMIN CONTEXT ===\nPrioritize FMS workflow queries. Include workflow steps and entry progress when relevant.\n")
+            prompt_parts.append(budget.text("role", "\n=== FMS ADMIN CONTEXT ===\nPrioritize FMS workflow queries. Include workflow steps and entry progress when relevant.\n"))
         elif 'hit' in role_l:
-            prompt_parts.append("\n=== HIT ADMIN CONTEXT ===\nPrioritize ticket status queries. Use helping_person_id for assignee, user_id for creator.\n")
+            prompt_parts.append(budget.text("role", "\n=== HIT ADMIN CONTEXT ===\nPrioritize ticket status queries. Use helping_person_id for assignee, user_id for creator.\n"))
         elif 'recurring' in role_l:
-            prompt_parts.append("\n=== RECURRING TASKS CONTEXT ===\nUse recurring_task_trackings for completion status. Join with recurring_task_assignees for user assignments.\n")
+            prompt_parts.append(budget.text("role", "\n=== RECURRING TASKS CONTEXT ===\nUse recurring_task_trackings for completion status. Join with recurring_task_assignees for user assignments.\n"))
 
     # Footer
-    prompt_parts.append("\nNow generate a SQL query for the following question:\n")
+    prompt_parts.append(budget.fixed("instructions", "\nNow generate a SQL query for the following question:\n"))
 
     return "".join(prompt_parts)
 
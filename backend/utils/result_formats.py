@@ -0,0 +1,66 @@
+"""
+Fast serializers for query results
+
+Result rows are serialized with pydantic-core's Rust JSON encoder, which
+handles datetime, Decimal and timedelta values (DATETIME, DECIMAL and TIME
+columns) natively, with the same representation the response model produced
+before (Decimal as string, timedelta as ISO 8601 duration). Rows are never
+walked in Python to pre-convert them: no jsonable_encoder pass, no per-value
+default hook. Columnar output transposes rows with zip(), and CSV output
+hands rows straight to the C csv writer (which str()s values itself).
+"""
+import io
+import csv
+from typing import Any, Dict, Iterator, List, Tuple
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+# Rows per chunk when streaming NDJSON / CSV
+STREAM_CHUNK_ROWS = 1000
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact JSON bytes"""
+    return to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by pydantic-core (skips jsonable_encoder's per-value walk)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def to_columnar(results: List[Dict[str, Any]]) -> Tuple[List[str], List[List[Any]]]:
+    """
+    Transpose row dicts into column names plus one value array per column
+
+    Returns:
+        Tuple of (columns, column_values) where column_values[i] holds columns[i]
+    """
+    if not results:
+        return [], []
+    columns = list(results[0])
+    return columns, [list(values) for values in zip(*map(dict.values, results))]
+
+
+def iter_ndjson(envelope: Dict[str, Any], results: List[Dict[str, Any]]) -> Iterator[bytes]:
+    """Yield the envelope as the first line, then one JSON object per row"""
+    yield dumps(envelope) + b"\n"
+    for start in range(0, len(results), STREAM_CHUNK_ROWS):
+        yield b"\n".join(map(dumps, results[start:start + STREAM_CHUNK_ROWS])) + b"\n"
+
+
+def iter_csv(results: List[Dict[str, Any]]) -> Iterator[str]:
+    """Yield a header line, then CSV-encoded rows in chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(list(results[0]) if results else [])
+    for start in range(0, len(results), STREAM_CHUNK_ROWS):
+        writer.writerows(map(dict.values, results[start:start + STREAM_CHUNK_ROWS]))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if not results:
+        yield buffer.getvalue()
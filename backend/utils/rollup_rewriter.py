@@ -0,0 +1,285 @@
+"""
+Answer aggregate queries from rollup summary tables
+
+A rollup stores one row per distinct combination of its dimension columns of a
+source table, with row_count (COUNT(*)) and SUM() measures. An aggregate SELECT
+over the source table can be answered from the rollup when every reference to
+the source table outside COUNT(<primary key>) / SUM(<measure>) is a dimension:
+
+- the source table is replaced by the rollup under the same alias, dimension
+  columns (and derived dimensions such as `deleted_at IS NULL`) are mapped to
+  rollup columns
+- each rollup row stands for row_count source rows, so aggregates are weighted:
+  COUNT(*) -> SUM(row_count), SUM(x) -> SUM(x * row_count),
+  COUNT(x) -> SUM(CASE WHEN x IS NOT NULL THEN row_count END),
+  AVG(x) -> SUM(x * row_count) / SUM(CASE ...), SUM(<measure>) -> SUM(total_*);
+  MIN, MAX and DISTINCT aggregates are unaffected by duplicates and kept as is
+- when the source table is on the nullable side of an outer join the weight is
+  COALESCE(row_count, 1), so null-extended rows still count once
+
+This holds for any joins whose conditions only use dimensions, since each
+rollup row joins exactly the rows each of its source rows would. Anything
+else (subqueries, window functions, non-dimension columns, GROUP_CONCAT, ...)
+is left to run against the base tables.
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from backend.utils.schema_catalog import schema_catalog
+from backend.utils.sql_safety import SQL_DIALECT, parse_single_statement
+
+logger = logging.getLogger(__name__)
+
+# Rollup column holding the number of source rows per group
+COUNT_COLUMN = "row_count"
+
+
+class _Unsupported(Exception):
+    """The query cannot be answered from the rollup"""
+
+
+class _RollupRewriter:
+    """Rewrites one parsed SELECT in place to read from a rollup"""
+
+    def __init__(self, select: exp.Select, rollups: Dict[str, Dict[str, Any]]):
+        self.select = select
+
+        from_ = select.args.get("from")
+        if from_ is None:
+            raise _Unsupported("no FROM clause")
+        self.joins = select.args.get("joins") or []
+        if any(join.args.get("using") or join.args.get("method") for join in self.joins):
+            raise _Unsupported("USING / NATURAL join")
+        sources = [from_.this] + [join.this for join in self.joins]
+        if not all(isinstance(source, exp.Table) for source in sources):
+            raise _Unsupported("FROM/JOIN of something other than a table")
+        self.sources = {source.alias_or_name.lower(): source for source in sources}
+        if len(self.sources) != len(sources):
+            raise _Unsupported("duplicate table alias")
+
+        bases = [source for source in sources if source.name.lower() in rollups and not source.args.get("db")]
+        if len(bases) != 1:
+            raise _Unsupported("no single rollup source table")
+        self.base = bases[0]
+        self.base_key = self.base.alias_or_name.lower()
+        self.base_alias = self.base.alias_or_name
+        self.rollup = rollups[self.base.name.lower()]
+
+        meta = schema_catalog.get_table(self.base.name)
+        self.primary_key = meta["primary_key"][0].lower() if meta and len(meta["primary_key"]) == 1 else None
+        self.measures = {source.lower(): column for column, source in self.rollup["measures"].items()}
+        self.dimensions: Dict[str, str] = {}
+        self.derived: Dict[str, str] = {}
+        for column, expression in self.rollup["dimensions"].items():
+            parsed = sqlglot.parse_one(expression, read=SQL_DIALECT)
+            if isinstance(parsed, exp.Column) and parsed.name.lower() == column.lower():
+                self.dimensions[column.lower()] = column
+            else:
+                self.derived[parsed.sql(dialect=SQL_DIALECT).lower()] = column
+
+        self.output_aliases = {
+            projection.alias.lower() for projection in select.expressions if isinstance(projection, exp.Alias)
+        }
+        self.nullable = self._base_nullable()
+
+    def _base_nullable(self) -> bool:
+        """Whether an outer join can null-extend the source table"""
+        base_joined = self.select.args["from"].this is self.base
+        for join in self.joins:
+            side = (join.side or "").upper()
+            if join.this is self.base:
+                base_joined = True
+                if side in ("LEFT", "FULL"):
+                    return True
+            elif base_joined and side in ("RIGHT", "FULL"):
+                return True
+        return False
+
+    # ==================== Column resolution ====================
+
+    def _owner(self, column: exp.Column) -> Optional[str]:
+        """
+        Alias of the table a column belongs to
+
+        Returns:
+            Table alias, or None when the name refers to a SELECT alias
+        """
+        if column.table:
+            key = column.table.lower()
+            if key not in self.sources:
+                raise _Unsupported(f"unknown qualifier {column.table}")
+            return key
+        name = column.name.lower()
+        if isinstance(column.find_ancestor(exp.Order, exp.Select), exp.Order) and name in self.output_aliases:
+            return None
+        if not all(schema_catalog.has_table(source.name) for source in self.sources.values()):
+            if name in self.output_aliases:
+                return None
+            raise _Unsupported(f"cannot resolve unqualified column {name}")
+        owners = [key for key, source in self.sources.items() if schema_catalog.has_column(source.name, name)]
+        if len(owners) == 1:
+            return owners[0]
+        if not owners and name in self.output_aliases:
+            return None
+        raise _Unsupported(f"cannot resolve column {name}")
+
+    def _is_base(self, column: exp.Column) -> bool:
+        return self._owner(column) == self.base_key
+
+    def _column(self, name: str) -> exp.Column:
+        return exp.column(name, table=self.base_alias)
+
+    def _derived_column(self, node: exp.Expression) -> Optional[exp.Column]:
+        """Rollup column for a derived dimension expression (e.g. `t.deleted_at IS NULL`)"""
+        if not self.derived or not isinstance(node, exp.Condition) or isinstance(node, exp.Column):
+            return None
+        columns = list(node.find_all(exp.Column))
+        if not columns or not all(self._is_base(column) for column in columns):
+            return None
+        stripped = node.copy()
+        for column in stripped.find_all(exp.Column):
+            column.set("table", None)
+        name = self.derived.get(stripped.sql(dialect=SQL_DIALECT).lower())
+        return self._column(name) if name else None
+
+    def _map_node(self, node: exp.Expression) -> exp.Expression:
+        """Map one node outside aggregates to the rollup"""
+        if isinstance(node, exp.AggFunc):
+            raise _Unsupported("nested aggregate")
+        derived = self._derived_column(node)
+        if derived is not None:
+            return derived
+        if isinstance(node, exp.Column) and self._is_base(node):
+            name = node.name.lower()
+            if name not in self.dimensions:
+                raise _Unsupported(f"{self.base.name}.{name} is not a rollup dimension")
+            return self._column(self.dimensions[name])
+        if node is self.base:
+            table = exp.to_table(self.rollup["table"])
+            table.set("alias", exp.TableAlias(this=exp.to_identifier(self.base_alias)))
+            return table
+        return node
+
+    def _map(self, expression: exp.Expression) -> exp.Expression:
+        """Copy of an expression with source references mapped to the rollup"""
+        return expression.transform(self._map_node)
+
+    # ==================== Aggregates ====================
+
+    def _weight(self) -> exp.Expression:
+        count = self._column(COUNT_COLUMN)
+        if self.nullable:
+            return exp.Coalesce(this=count, expressions=[exp.Literal.number(1)])
+        return count
+
+    def _weight_if_not_null(self, expression: exp.Expression) -> exp.Expression:
+        condition = exp.Not(this=exp.Is(this=expression, expression=exp.Null()))
+        return exp.Case(ifs=[exp.If(this=condition, true=self._weight())])
+
+    def _base_column(self, expression: exp.Expression) -> Optional[str]:
+        """Name of a source table column passed directly to an aggregate"""
+        if isinstance(expression, exp.Column) and self._is_base(expression):
+            return expression.name.lower()
+        return None
+
+    def _rewrite_aggregate(self, agg: exp.AggFunc) -> exp.Expression:
+        arg = agg.this
+        if isinstance(agg, (exp.Min, exp.Max)) or (
+            isinstance(agg, (exp.Count, exp.Sum, exp.Avg)) and isinstance(arg, exp.Distinct)
+        ):
+            # Duplicate rows do not change these
+            mapped = agg.copy()
+            mapped.set("this", self._map(arg))
+            return mapped
+
+        if isinstance(agg, exp.Count):
+            if isinstance(arg, (exp.Star, exp.Literal)):
+                weighted = self._weight()
+            elif self.primary_key and self._base_column(arg) == self.primary_key:
+                # Non-NULL exactly when a source row is present
+                weighted = self._column(COUNT_COLUMN)
+            else:
+                weighted = self._weight_if_not_null(self._map(arg))
+            total = exp.Coalesce(this=exp.Sum(this=weighted), expressions=[exp.Literal.number(0)])
+            return exp.cast(total, exp.DataType.build("SIGNED", dialect=SQL_DIALECT))
+
+        if isinstance(agg, (exp.Sum, exp.Avg)):
+            measure = self.measures.get(self._base_column(arg) or "")
+            if measure:
+                total = exp.Sum(this=self._column(measure))
+                if isinstance(agg, exp.Sum):
+                    return total
+                return exp.Paren(this=exp.Div(this=total, expression=exp.Sum(this=self._column(COUNT_COLUMN))))
+            mapped = self._map(arg)
+            total = exp.Sum(this=exp.Mul(this=exp.Paren(this=mapped), expression=self._weight()))
+            if isinstance(agg, exp.Sum):
+                return total
+            count = exp.Sum(this=self._weight_if_not_null(mapped.copy()))
+            return exp.Paren(this=exp.Div(this=total, expression=count))
+
+        raise _Unsupported(f"aggregate {agg.sql(dialect=SQL_DIALECT)}")
+
+    # ==================== Rewrite ====================
+
+    def _visit(self, node: exp.Expression) -> exp.Expression:
+        if isinstance(node, exp.AggFunc):
+            return self._rewrite_aggregate(node)
+        return self._map_node(node)
+
+    def rewrite(self) -> str:
+        select = self.select
+        # Keep the output column names of unaliased expressions
+        for projection in list(select.expressions):
+            if not isinstance(projection, (exp.Alias, exp.Column)):
+                projection.replace(exp.alias_(projection.copy(), projection.sql(dialect=SQL_DIALECT), quoted=True))
+        select.transform(self._visit, copy=False)
+        return select.sql(dialect=SQL_DIALECT)
+
+
+def rewrite_with_rollup(
+    sql_query: str,
+    rollups: Dict[str, Dict[str, Any]]
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Rewrite an aggregate SELECT to read from a rollup table
+
+    Args:
+        sql_query: Validated SELECT
+        rollups: Rollup definitions available for use, keyed by lowercase source table
+
+    Returns:
+        Tuple of (rewritten SQL, rollup definition used), or None when the query
+        does not match a rollup
+    """
+    if not rollups:
+        return None
+    try:
+        tree, _ = parse_single_statement(sql_query)
+    except SqlglotError as e:
+        logger.debug(f"Could not parse SQL for rollup matching: {e}")
+        return None
+    if not isinstance(tree, exp.Select) or tree.args.get("with"):
+        return None
+    if any(select is not tree for select in tree.find_all(exp.Select)):
+        return None
+    if tree.find(exp.Window, exp.Anonymous):
+        return None
+    if any(
+        isinstance(projection, exp.Star) or (isinstance(projection, exp.Column) and projection.is_star)
+        for projection in tree.expressions
+    ):
+        return None
+    if not tree.args.get("group") and not any(projection.find(exp.AggFunc) for projection in tree.expressions):
+        # One row per source row: nothing to gain
+        return None
+
+    try:
+        rewriter = _RollupRewriter(tree, rollups)
+        return rewriter.rewrite(), rewriter.rollup
+    except _Unsupported as e:
+        logger.debug(f"Query not answerable from rollups: {e}")
+        return None
@@ -0,0 +1,428 @@
+"""
+Schema symbol table for the PMS database
+
+Built once from every CREATE TABLE / ALTER TABLE statement in pms.sql (or from
+INFORMATION_SCHEMA) and shared by SQL validation, RAG indexing and prompt
+building. Table and column lookups are O(1) and case-insensitive.
+"""
+import os
+import re
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple, Any
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.scope import traverse_scope, Scope
+
+logger = logging.getLogger(__name__)
+
+SQL_DIALECT = "mysql"
+
+# ALTER TABLE blocks in a mysqldump file (indexes and constraints are added after CREATE TABLE)
+ALTER_TABLE_PATTERN = re.compile(r"ALTER TABLE `?(\w+)`?\s+(.*?);", re.DOTALL | re.IGNORECASE)
+PRIMARY_KEY_PATTERN = re.compile(r"ADD PRIMARY KEY\s*\(([^)]*)\)", re.IGNORECASE)
+INDEX_PATTERN = re.compile(r"ADD (UNIQUE |FULLTEXT )?KEY `?(\w+)`?\s*\(([^)]*)\)", re.IGNORECASE)
+FOREIGN_KEY_PATTERN = re.compile(
+    r"ADD CONSTRAINT `?(\w+)`? FOREIGN KEY \(`?(\w+)`?\) REFERENCES `?(\w+)`? \(`?(\w+)`?\)",
+    re.IGNORECASE
+)
+
+
+def _split_columns(column_list: str) -> List[str]:
+    """Turn "`a`,`b`(10)" into ["a", "b"]"""
+    return [re.sub(r"\(.*\)", "", col).strip(" `") for col in column_list.split(",") if col.strip()]
+
+
+class SchemaCatalog:
+    """Precomputed symbol table of tables, columns, types, keys and foreign keys"""
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self.version: str = ""
+        self.source: str = "empty"
+
+    # ==================== Building ====================
+
+    def _add_table(self, table_name: str, columns: List[Dict[str, str]]):
+        self.tables[table_name.lower()] = {
+            "name": table_name,
+            "columns": {col["name"].lower(): col for col in columns},
+            "primary_key": [],
+            "indexes": [],
+            "foreign_keys": []
+        }
+
+    def load_from_sql(self, sql_content: str) -> "SchemaCatalog":
+        """Build the catalog from a mysqldump file's CREATE TABLE and ALTER TABLE statements"""
+        # Import here to avoid circular imports (schema_loader builds its prompt text from this catalog)
+        from backend.utils.schema_loader import parse_sql_schema
+
+        self.tables = {}
+        for table_name, columns in parse_sql_schema(sql_content).items():
+            self._add_table(table_name, columns)
+
+        for match in ALTER_TABLE_PATTERN.finditer(sql_content):
+            table = self.tables.get(match.group(1).lower())
+            if table is None:
+                continue
+            body = match.group(2)
+
+            pk_match = PRIMARY_KEY_PATTERN.search(body)
+            if pk_match:
+                table["primary_key"] = _split_columns(pk_match.group(1))
+
+            for kind, index_name, columns in INDEX_PATTERN.findall(body):
+                table["indexes"].append({
+                    "name": index_name,
+                    "columns": _split_columns(columns),
+                    "unique": kind.strip().upper() == "UNIQUE"
+                })
+
+            for constraint, column, ref_table, ref_column in FOREIGN_KEY_PATTERN.findall(body):
+                table["foreign_keys"].append({
+                    "name": constraint,
+                    "column": column,
+                    "ref_table": ref_table,
+                    "ref_column": ref_column
+                })
+
+        self._infer_foreign_keys()
+        self.version = hashlib.sha256(sql_content.encode("utf-8")).hexdigest()[:16]
+        self.source = "sql"
+        logger.info(f"Schema catalog built from SQL: {len(self.tables)} tables")
+        return self
+
+    def load_from_information_schema(self, connection) -> "SchemaCatalog":
+        """
+        Build the catalog from INFORMATION_SCHEMA of the connected database
+
+        Args:
+            connection: SQLAlchemy connection to the PMS database
+        """
+        from sqlalchemy import text
+
+        columns_by_table: Dict[str, List[Dict[str, str]]] = {}
+        rows = connection.execute(text("""
+            SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, COLUMN_COMMENT
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """)).fetchall()
+        for table_name, column_name, column_type, comment in rows:
+            columns_by_table.setdefault(table_name, []).append({
+                "name": column_name,
+                "type": column_type,
+                "comment": comment or ""
+            })
+
+        self.tables = {}
+        for table_name, columns in columns_by_table.items():
+            self._add_table(table_name, columns)
+
+        rows = connection.execute(text("""
+            SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+        """)).fetchall()
+        indexes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for table_name, index_name, non_unique, column_name in rows:
+            table = self.tables.get(table_name.lower())
+            if table is None:
+                continue
+            if index_name == "PRIMARY":
+                table["primary_key"].append(column_name)
+                continue
+            key = (table_name.lower(), index_name)
+            if key not in indexes:
+                indexes[key] = {"name": index_name, "columns": [], "unique": not non_unique}
+                table["indexes"].append(indexes[key])
+            indexes[key]["columns"].append(column_name)
+
+        rows = connection.execute(text("""
+            SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+        """)).fetchall()
+        for table_name, constraint, column, ref_table, ref_column in rows:
+            table = self.tables.get(table_name.lower())
+            if table is not None:
+                table["foreign_keys"].append({
+                    "name": constraint,
+                    "column": column,
+                    "ref_table": ref_table,
+                    "ref_column": ref_column
+                })
+
+        self._infer_foreign_keys()
+        signature = ";".join(
+            f"{t['name']}:{','.join(t['columns'])}" for t in sorted(self.tables.values(), key=lambda t: t["name"])
+        )
+        self.version = hashlib.sha256(signature.encode("utf-8")).hexdigest()[:16]
+        self.source = "information_schema"
+        logger.info(f"Schema catalog built from INFORMATION_SCHEMA: {len(self.tables)} tables")
+        return self
+
+    def _infer_foreign_keys(self):
+        """
+        Add implicit foreign keys from the <entity>_id naming convention
+
+        Most PMS relations (e.g., users.department_id -> departments.id) are not
+        declared as constraints in the dump.
+        """
+        for table in self.tables.values():
+            declared = {fk["column"].lower() for fk in table["foreign_keys"]}
+            for column_key, column in table["columns"].items():
+                if not column_key.endswith("_id") or column_key in declared:
+                    continue
+                entity = column_key[:-3]
+                for candidate in (f"{entity}s", f"{entity}es", entity):
+                    target = self.tables.get(candidate)
+                    if target is not None and target is not table and "id" in target["columns"]:
+                        table["foreign_keys"].append({
+                            "name": f"inferred_{table['name']}_{column['name']}",
+                            "column": column["name"],
+                            "ref_table": target["name"],
+                            "ref_column": "id",
+                            "inferred": True
+                        })
+                        break
+
+    # ==================== Lookups ====================
+
+    def has_table(self, table_name: str) -> bool:
+        return table_name.lower() in self.tables
+
+    def get_table(self, table_name: str) -> Optional[Dict[str, Any]]:
+        return self.tables.get(table_name.lower())
+
+    def has_column(self, table_name: str, column_name: str) -> bool:
+        table = self.tables.get(table_name.lower())
+        return table is not None and column_name.lower() in table["columns"]
+
+    def get_column(self, table_name: str, column_name: str) -> Optional[Dict[str, str]]:
+        table = self.tables.get(table_name.lower())
+        return table["columns"].get(column_name.lower()) if table else None
+
+    def table_names(self) -> List[str]:
+        return [table["name"] for table in self.tables.values()]
+
+    def column_names(self, table_name: str) -> List[str]:
+        table = self.tables.get(table_name.lower())
+        return [col["name"] for col in table["columns"].values()] if table else []
+
+    def get_relationships(self, table_name: str, include_reverse: bool = True) -> List[str]:
+        """Tables linked to this one by a foreign key (optionally in either direction)"""
+        table = self.tables.get(table_name.lower())
+        if table is None:
+            return []
+        related = {fk["ref_table"] for fk in table["foreign_keys"]}
+        if not include_reverse:
+            related.discard(table["name"])
+            return sorted(related)
+        for other in self.tables.values():
+            if any(fk["ref_table"].lower() == table_name.lower() for fk in other["foreign_keys"]):
+                related.add(other["name"])
+        related.discard(table["name"])
+        return sorted(related)
+
+    def to_schema_dict(self) -> Dict[str, List[Dict[str, str]]]:
+        """Table -> column definitions, in the format produced by parse_sql_schema"""
+        return {table["name"]: list(table["columns"].values()) for table in self.tables.values()}
+
+    # ==================== SQL Resolution ====================
+
+    @staticmethod
+    def _scope_output_names(scope: Scope) -> Optional[set]:
+        """Output column names of a derived table/CTE scope (None if it selects *)"""
+        expression = scope.expression
+        if not isinstance(expression, exp.Select):
+            return None
+        names = set()
+        for select in expression.selects:
+            if isinstance(select, exp.Star) or (isinstance(select, exp.Column) and isinstance(select.this, exp.Star)):
+                return None
+            names.add(select.alias_or_name.lower())
+        return names
+
+    def _scope_sources(self, scope: Scope, cte_names: set) -> Tuple[Dict[str, str], Dict[str, Optional[set]], List[str]]:
+        """
+        Sources of one scope
+
+        Returns:
+            Tuple of (alias -> catalog table, alias -> derived table/CTE output
+            names, unknown table names)
+        """
+        table_sources: Dict[str, str] = {}
+        derived_outputs: Dict[str, Optional[set]] = {}
+        unknown: List[str] = []
+        for alias, source in scope.sources.items():
+            if isinstance(source, exp.Table):
+                if source.name.lower() in cte_names:
+                    continue
+                if self.has_table(source.name):
+                    table_sources[alias.lower()] = self.get_table(source.name)["name"]
+                else:
+                    unknown.append(source.name)
+            elif isinstance(source, Scope):
+                derived_outputs[alias.lower()] = self._scope_output_names(source)
+        return table_sources, derived_outputs, unknown
+
+    @staticmethod
+    def _own_columns(scope: Scope) -> List[exp.Column]:
+        """
+        Columns that belong to a scope itself
+
+        sqlglot also lists the columns of IN / NOT IN subqueries under the
+        enclosing scope; those are checked in the subquery's own scope.
+        """
+        if not isinstance(scope.expression, exp.Select):
+            return list(scope.columns)
+        return [column for column in scope.columns if column.find_ancestor(exp.Select) is scope.expression]
+
+    def resolve_references(self, sql_query: str, tree: Optional[exp.Expression] = None) -> Dict[str, Any]:
+        """
+        Resolve every table and column reference in a query against the catalog
+
+        Qualified columns are resolved through their table alias; unqualified
+        columns are checked against every table in the same scope, then
+        against the enclosing scopes (correlated subqueries).
+
+        Args:
+            sql_query: SQL to resolve
+            tree: Already parsed tree of sql_query; the returned nodes then belong to it
+
+        Returns:
+            Dictionary with tables (alias -> table), invalid_tables and
+            invalid_columns (list of {"qualifier", "column", "tables", "aliases",
+            "node"}: the scope's alias -> table map and the Column node that failed).
+        """
+        if tree is None:
+            tree = sqlglot.parse_one(sql_query, read=SQL_DIALECT)
+
+        tables: Dict[str, str] = {}
+        invalid_tables: List[str] = []
+        invalid_columns: List[Dict[str, Any]] = []
+        cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+
+        for scope in traverse_scope(tree):
+            table_sources, derived_outputs, unknown = self._scope_sources(scope, cte_names)
+            invalid_tables.extend(name for name in unknown if name not in invalid_tables)
+            tables.update(table_sources)
+
+            # Tables of enclosing scopes, visible to correlated references
+            outer_tables: List[str] = []
+            parent = scope.parent
+            while parent is not None:
+                outer_tables.extend(self._scope_sources(parent, cte_names)[0].values())
+                parent = parent.parent
+
+            select_aliases = set()
+            if isinstance(scope.expression, exp.Select):
+                select_aliases = {s.alias.lower() for s in scope.expression.selects if s.alias}
+
+            for column in self._own_columns(scope):
+                name = column.name
+                if not name or isinstance(column.this, exp.Star):
+                    continue
+                qualifier = column.table.lower()
+
+                if qualifier:
+                    if qualifier in table_sources:
+                        if not self.has_column(table_sources[qualifier], name):
+                            invalid_columns.append({
+                                "qualifier": column.table,
+                                "column": name,
+                                "tables": [table_sources[qualifier]],
+                                "aliases": table_sources,
+                                "node": column
+                            })
+                    elif qualifier in derived_outputs:
+                        outputs = derived_outputs[qualifier]
+                        if outputs is not None and name.lower() not in outputs:
+                            invalid_columns.append({
+                                "qualifier": column.table,
+                                "column": name,
+                                "tables": [],
+                                "aliases": table_sources,
+                                "node": column
+                            })
+                    continue
+
+                if name.lower() in select_aliases:
+                    continue
+                if any(self.has_column(table, name) for table in table_sources.values()):
+                    continue
+                if any(outputs is None or name.lower() in outputs for outputs in derived_outputs.values()):
+                    continue
+                if any(self.has_column(table, name) for table in outer_tables):
+                    continue
+                if table_sources:
+                    invalid_columns.append({
+                        "qualifier": "",
+                        "column": name,
+                        "tables": sorted(set(table_sources.values())),
+                        "aliases": table_sources,
+                        "node": column
+                    })
+
+        return {
+            "tables": tables,
+            "invalid_tables": invalid_tables,
+            "invalid_columns": invalid_columns
+        }
+
+    def validate_sql(self, sql_query: str) -> Tuple[bool, str]:
+        """
+        Validate table and column names in a query
+
+        Returns:
+            Tuple of (is_valid, message)
+        """
+        if not self.tables:
+            return True, "Schema catalog not available"
+
+        try:
+            refs = self.resolve_references(sql_query)
+        except SqlglotError as e:
+            return True, f"Validation skipped: {e}"
+
+        if refs["invalid_tables"]:
+            return False, f"Invalid table(s): {', '.join(refs['invalid_tables'])}"
+
+        if refs["invalid_columns"]:
+            described = []
+            for ref in refs["invalid_columns"]:
+                label = f"{ref['qualifier']}.{ref['column']}" if ref["qualifier"] else ref["column"]
+                if ref["tables"]:
+                    label += f" (not in {', '.join(ref['tables'])})"
+                described.append(label)
+            return False, f"Invalid column(s): {'; '.join(described)}"
+
+        return True, "Schema validation passed"
+
+
+def _default_sql_path() -> str:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(os.path.dirname(current_dir))
+    return os.path.join(project_root, "pms.sql")
+
+
+def build_schema_catalog(sql_file_path: Optional[str] = None) -> SchemaCatalog:
+    """Build the catalog from pms.sql (empty catalog if the file is missing)"""
+    catalog = SchemaCatalog()
+    path = sql_file_path or _default_sql_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            catalog.load_from_sql(f.read())
+    except FileNotFoundError:
+        logger.warning(f"Schema file not found for catalog: {path}")
+    except Exception as e:
+        logger.error(f"Failed to build schema catalog: {e}")
+    return catalog
+
+
+# Shared instance, built once on import
+schema_catalog = build_schema_catalog()
@@ -40,11 +40,10 @@ def load_schema_from_sql(sql_file_path: str = "pms.sql") -> str:
             logger.warning(f"Schema file not found: {full_path}")
             return get_fallback_schema()
         
-        with open(full_path, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
-        
-        # Parse the SQL file to extract table structures
-        schema_dict = parse_sql_schema(sql_content)
+        # Table structures come from the shared schema catalog
+        from backend.utils.schema_catalog import schema_catalog, build_schema_catalog
+        catalog = schema_catalog if sql_file_path == "pms.sql" else build_schema_catalog(full_path)
+        schema_dict = catalog.to_schema_dict()
         
         # Format schema for AI prompt
         formatted_schema = format_schema_for_prompt(schema_dict)
@@ -0,0 +1,89 @@
+"""
+SQL fingerprints for result caching
+
+A fingerprint identifies queries that are the same statement modulo
+formatting (whitespace, keyword case, quoting): the SQL is parsed and
+regenerated in canonical form, literals included, so queries with different
+filter values never share a fingerprint. The tables each query reads are
+extracted from the same tree for table-level invalidation.
+"""
+import hashlib
+import logging
+from functools import lru_cache
+from typing import FrozenSet, Optional, Set, Tuple
+
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from backend.utils.sql_safety import SQL_DIALECT, parse_single_statement
+
+logger = logging.getLogger(__name__)
+
+# Functions whose results differ on every execution; such queries are never cached
+NONDETERMINISTIC_FUNCTIONS = {"RAND", "UUID", "UUID_SHORT", "CONNECTION_ID"}
+
+# Functions reading the clock ("today", "last hour"): a cached result would be
+# served across the time boundary, so these queries are not cached either
+CLOCK_FUNCTIONS = {
+    "NOW", "SYSDATE", "CURDATE", "CURRENT_DATE", "CURTIME", "CURRENT_TIME", "CURRENT_TIMESTAMP",
+    "LOCALTIME", "LOCALTIMESTAMP", "UTC_DATE", "UTC_TIME", "UTC_TIMESTAMP", "UNIX_TIMESTAMP"
+}
+# Clock functions that are deterministic when given an argument (UNIX_TIMESTAMP(created_at))
+CLOCK_FUNCTIONS_WITHOUT_ARGUMENTS = {"UNIX_TIMESTAMP"}
+
+
+def _function_names(tree: exp.Expression) -> Set[str]:
+    names = set()
+    for node in tree.find_all(exp.Func):
+        if isinstance(node, exp.Anonymous):
+            name = str(node.this).upper()
+            if name in CLOCK_FUNCTIONS_WITHOUT_ARGUMENTS and node.expressions:
+                continue
+            names.add(name)
+        else:
+            names.add(node.sql_name().upper())
+    # LOCALTIME / LOCALTIMESTAMP without parentheses parse as column references
+    for column in tree.find_all(exp.Column):
+        if not column.table and column.name.upper() in CLOCK_FUNCTIONS:
+            names.add(column.name.upper())
+    return names
+
+
+def referenced_tables(tree: exp.Expression) -> Set[str]:
+    """Lower-cased names of the base tables a statement reads (CTE names excluded)"""
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    return {
+        table.name.lower() for table in tree.find_all(exp.Table)
+        if table.name and table.name.lower() not in cte_names
+    }
+
+
+@lru_cache(maxsize=1024)
+def fingerprint_sql(sql_query: str) -> Tuple[str, str, Optional[FrozenSet[str]], bool]:
+    """
+    Fingerprint a SQL statement (memoized; the same SQL is looked up and then stored)
+
+    Args:
+        sql_query: SQL text as executed
+
+    Returns:
+        Tuple of (fingerprint, normalized SQL, tables read or None when the SQL
+        could not be parsed, whether results are safe to cache)
+    """
+    try:
+        tree, _ = parse_single_statement(sql_query)
+    except SqlglotError as e:
+        logger.debug(f"Could not parse SQL for fingerprinting: {e}")
+        tree = None
+
+    if tree is None:
+        normalized = " ".join(sql_query.split()).rstrip(";")
+        tables = None
+        cacheable = True
+    else:
+        normalized = tree.sql(dialect=SQL_DIALECT)
+        tables = frozenset(referenced_tables(tree))
+        cacheable = not (_function_names(tree) & (NONDETERMINISTIC_FUNCTIONS | CLOCK_FUNCTIONS))
+
+    fingerprint = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+    return fingerprint, normalized, tables, cacheable
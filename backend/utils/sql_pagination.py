@@ -0,0 +1,269 @@
+"""
+LIMIT enforcement and page planning for generated SQL
+
+The top-level LIMIT of a generated SELECT is injected when missing and clamped
+to QUERY_MAX_LIMIT; it becomes the page size. Later pages are fetched by
+re-running the same statement:
+
+- keyset: when the ORDER BY is made of plain selected columns and, with the
+  primary keys of every table appended as tiebreakers, identifies rows
+  uniquely, page N+1 adds a "after the last row of page N" predicate built
+  from those columns (rows never shift or repeat, and deep pages stay cheap)
+- offset: otherwise (grouping, aggregates, expressions or aliases in ORDER BY,
+  unselected keys), LIMIT/OFFSET over the same statement
+"""
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from backend.utils.schema_catalog import schema_catalog
+from backend.utils.sql_safety import SQL_DIALECT, parse_single_statement
+
+logger = logging.getLogger(__name__)
+
+
+def _literal_int(node: Optional[exp.Expression]) -> Optional[int]:
+    """Integer value of a LIMIT/OFFSET clause (None when absent or not a plain number)"""
+    value = node.expression if node is not None else None
+    if isinstance(value, exp.Literal) and not value.is_string and str(value.this).isdigit():
+        return int(value.this)
+    return None
+
+
+def to_literal(value: Any) -> Optional[exp.Expression]:
+    """SQL literal for a cursor value, or None when it cannot be compared reliably"""
+    if isinstance(value, bool):
+        return exp.Literal.number(int(value))
+    if isinstance(value, (int, float, Decimal)):
+        return exp.Literal.number(str(value))
+    if isinstance(value, datetime):
+        return exp.Literal.string(value.isoformat(sep=" "))
+    if isinstance(value, date):
+        return exp.Literal.string(value.isoformat())
+    if isinstance(value, str):
+        return exp.Literal.string(value)
+    return None
+
+
+def _projection_keys(select: exp.Select) -> Optional[Dict[str, Any]]:
+    """
+    Output names of the SELECT list
+
+    Returns:
+        Dict with "columns" ((qualifier, name) -> output key for plain column
+        projections), "aliases" (output alias -> underlying column or None for
+        expressions) and "star"; None when output names collide
+    """
+    columns: Dict[Tuple[str, str], str] = {}
+    aliases: Dict[str, Optional[exp.Column]] = {}
+    names = []
+    star = False
+    for projection in select.expressions:
+        if isinstance(projection, exp.Star) or (isinstance(projection, exp.Column) and projection.is_star):
+            star = True
+            continue
+        names.append(projection.alias_or_name.lower())
+        inner = projection.this if isinstance(projection, exp.Alias) else projection
+        if isinstance(inner, exp.Column):
+            columns[(inner.table.lower(), inner.name.lower())] = projection.alias_or_name
+        if isinstance(projection, exp.Alias):
+            aliases[projection.alias.lower()] = inner if isinstance(inner, exp.Column) else None
+    if len(names) != len(set(names)):
+        return None
+    return {"columns": columns, "aliases": aliases, "star": star}
+
+
+def _output_key(column: exp.Column, projections: Dict[str, Any], single_table: bool) -> Optional[str]:
+    """Row key under which a column's value appears in results (None if it is not selected)"""
+    qualifier, name = column.table.lower(), column.name.lower()
+    for (table, selected), key in projections["columns"].items():
+        if selected == name and (table == qualifier or not table or not qualifier):
+            return key
+    if projections["star"] and single_table:
+        return column.name
+    return None
+
+
+def _keyset_keys(select: exp.Select) -> Optional[Tuple[List[Dict[str, Any]], List[exp.Ordered]]]:
+    """
+    Keyset columns for a SELECT, with primary key tiebreakers appended
+
+    Returns:
+        Tuple of (keys, ORDER BY items to use), or None when keyset paging is not safe
+    """
+    order = select.args.get("order")
+    if not order or select.args.get("group") or select.args.get("distinct") or select.args.get("having"):
+        return None
+    if any(projection.find(exp.AggFunc, exp.Window) for projection in select.expressions):
+        return None
+
+    sources = [select.args.get("from").this] if select.args.get("from") else []
+    sources += [join.this for join in select.args.get("joins") or []]
+    if not sources or not all(isinstance(source, exp.Table) for source in sources):
+        return None
+    aliases = {source.alias_or_name.lower(): source.name.lower() for source in sources}
+
+    projections = _projection_keys(select)
+    if projections is None:
+        return None
+    single_table = len(sources) == 1
+
+    keys: List[Dict[str, Any]] = []
+    ordered_items: List[exp.Ordered] = []
+    for ordered in order.expressions:
+        column = ordered.this
+        if not isinstance(column, exp.Column):
+            return None
+        if not column.table and column.name.lower() in projections["aliases"]:
+            # ORDER BY <alias>: usable only when the alias names a plain column
+            underlying = projections["aliases"][column.name.lower()]
+            if underlying is None:
+                return None
+            key, column = column.name, underlying
+        else:
+            key = _output_key(column, projections, single_table)
+        if key is None:
+            return None
+        table = aliases.get(column.table.lower()) if column.table else (
+            next(iter(aliases.values())) if single_table else None
+        )
+        meta = schema_catalog.get_table(table) if table else None
+        is_pk = bool(meta and [c.lower() for c in meta["primary_key"]] == [column.name.lower()])
+        keys.append({
+            "column": column.copy(),
+            "key": key,
+            "desc": bool(ordered.args.get("desc")),
+            "nullable": not is_pk
+        })
+        ordered_items.append(ordered)
+
+    # Append each table's primary key so the ORDER BY is a total order
+    for source in sources:
+        meta = schema_catalog.get_table(source.name)
+        if not meta or len(meta["primary_key"]) != 1:
+            return None
+        pk = meta["primary_key"][0]
+        qualifier = source.alias_or_name
+        if any(
+            k["column"].name.lower() == pk.lower()
+            and (k["column"].table.lower() in ("", qualifier.lower()))
+            for k in keys
+        ):
+            continue
+        column = exp.column(pk, table=qualifier)
+        key = _output_key(column, projections, single_table)
+        if key is None:
+            return None
+        keys.append({"column": column, "key": key, "desc": False, "nullable": False})
+        # nulls_first matches MySQL's native ASC ordering (no NULL-ordering emulation is generated)
+        ordered_items.append(exp.Ordered(this=column.copy(), desc=False, nulls_first=True))
+
+    return keys, ordered_items
+
+
+def plan_pages(sql_query: str, default_page_size: int, max_limit: int) -> Optional[Dict[str, Any]]:
+    """
+    Enforce the LIMIT of a generated query and plan how to fetch further pages
+
+    Args:
+        sql_query: Validated SELECT
+        default_page_size: LIMIT injected when the query has none
+        max_limit: Upper bound for the LIMIT
+
+    Returns:
+        Dict with sql_query (first page), base (statement without LIMIT/OFFSET),
+        page_size, base_offset, requested_limit, clamped, mode ("keyset" or
+        "offset") and keys; None when the statement is not a plain SELECT/UNION
+        or its LIMIT is not a literal (then it runs unchanged). An explicit
+        LIMIT caps the rows served across all pages, so only injected or
+        clamped LIMITs have further pages.
+    """
+    try:
+        tree, _ = parse_single_statement(sql_query)
+    except SqlglotError as e:
+        logger.debug(f"Could not parse SQL for pagination: {e}")
+        return None
+    if not isinstance(tree, (exp.Select, exp.Union)):
+        return None
+
+    limit, offset = tree.args.get("limit"), tree.args.get("offset")
+    requested = _literal_int(limit)
+    if (limit is not None and requested is None) or (offset is not None and _literal_int(offset) is None):
+        return None
+    page_size = min(requested if requested is not None else max(1, default_page_size), max_limit)
+
+    base = tree.copy()
+    base.set("limit", None)
+    base.set("offset", None)
+
+    keyset = _keyset_keys(base) if isinstance(base, exp.Select) else None
+    if keyset:
+        keys, ordered_items = keyset
+        base.set("order", exp.Order(expressions=ordered_items))
+    else:
+        keys = []
+
+    plan = {
+        "base": base,
+        "page_size": page_size,
+        "base_offset": _literal_int(offset) or 0,
+        "requested_limit": requested,
+        "clamped": requested is not None and requested > max_limit,
+        "mode": "keyset" if keys else "offset",
+        "keys": keys
+    }
+    plan["sql_query"] = page_sql(plan, offset=plan["base_offset"])
+    return plan
+
+
+def keyset_predicate(keys: List[Dict[str, Any]], values: List[Any]) -> Optional[exp.Expression]:
+    """
+    Predicate selecting rows strictly after the given key values in ORDER BY order
+
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... with < for DESC keys; rows with
+    NULL in a nullable DESC key sort last in MySQL and are kept. Returns None
+    when a value cannot be compared (NULL, binary, ...).
+    """
+    literals = [to_literal(value) for value in values]
+    if any(literal is None for literal in literals):
+        return None
+    disjuncts = []
+    for i, key in enumerate(keys):
+        parts: List[exp.Expression] = [
+            exp.EQ(this=prev["column"].copy(), expression=literal.copy())
+            for prev, literal in zip(keys[:i], literals[:i])
+        ]
+        comparison = (exp.LT if key["desc"] else exp.GT)(this=key["column"].copy(), expression=literals[i].copy())
+        if key["desc"] and key["nullable"]:
+            comparison = exp.or_(comparison, exp.Is(this=key["column"].copy(), expression=exp.Null()))
+        parts.append(comparison)
+        disjuncts.append(exp.and_(*parts))
+    return exp.or_(*disjuncts)
+
+
+def page_sql(plan: Dict[str, Any], offset: int = 0, after: Optional[List[Any]] = None) -> str:
+    """
+    SQL for one page: keyset predicate when the last row's key values are given, else OFFSET
+
+    Args:
+        plan: Result of plan_pages
+        offset: Rows to skip (offset mode or when keyset values are unusable)
+        after: Key values of the last row of the previous page (keyset mode)
+    """
+    tree = plan["base"].copy()
+    limit = plan["page_size"]
+    if plan["requested_limit"] is not None:
+        # Never page past the LIMIT the query asked for (offset counts the rows already served)
+        limit = max(0, min(limit, plan["requested_limit"] - (offset - plan["base_offset"])))
+    predicate = keyset_predicate(plan["keys"], after) if plan["keys"] and after is not None else None
+    if predicate is not None:
+        tree = tree.where(predicate, copy=False)
+        offset = 0
+    tree.set("limit", exp.Limit(expression=exp.Literal.number(limit)))
+    if offset:
+        tree.set("offset", exp.Offset(expression=exp.Literal.number(offset)))
+    return tree.sql(dialect=SQL_DIALECT)
@@ -0,0 +1,269 @@
+"""
+Local repair of misspelled or hallucinated identifiers in generated SQL
+
+When schema validation fails, unknown table and column names are matched
+against the schema catalog (trigram index + edit distance, with foreign-key
+aware re-qualification). Only unambiguous fixes are applied; anything else is
+reported as ambiguous so the caller can fall back to an LLM retry.
+"""
+import json
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple, Any
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from backend.config import settings
+from backend.utils.schema_catalog import SchemaCatalog, schema_catalog, SQL_DIALECT
+
+logger = logging.getLogger(__name__)
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Damerau-Levenshtein (optimal string alignment) distance; transpositions cost 1"""
+    if a == b:
+        return 0
+    rows = len(a) + 1
+    cols = len(b) + 1
+    dist = [[0] * cols for _ in range(rows)]
+    for i in range(rows):
+        dist[i][0] = i
+    for j in range(cols):
+        dist[0][j] = j
+    for i in range(1, rows):
+        for j in range(1, cols):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            dist[i][j] = min(
+                dist[i - 1][j] + 1,
+                dist[i][j - 1] + 1,
+                dist[i - 1][j - 1] + cost
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                dist[i][j] = min(dist[i][j], dist[i - 2][j - 2] + 1)
+    return dist[-1][-1]
+
+
+def trigrams(name: str) -> Set[str]:
+    padded = f"  {name.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(name: str) -> int:
+    """Edit distance allowed for a repair, scaled with identifier length"""
+    return max(1, min(settings.SQL_REPAIR_MAX_DISTANCE, len(name) // 4))
+
+
+class IdentifierIndex:
+    """Trigram index over a set of identifiers for fast fuzzy candidate lookup"""
+
+    def __init__(self, names: List[str]):
+        self.names = {name.lower(): name for name in names}
+        self._grams: Dict[str, Set[str]] = defaultdict(set)
+        for name in self.names:
+            for gram in trigrams(name):
+                self._grams[gram].add(name)
+
+    def candidates(self, name: str) -> List[Tuple[int, float, str]]:
+        """
+        Rank identifiers similar to name
+
+        Returns:
+            List of (edit_distance, -trigram_similarity, identifier), best first
+        """
+        query_grams = trigrams(name)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in query_grams:
+            for candidate in self._grams.get(gram, ()):
+                shared[candidate] += 1
+
+        limit = max_distance(name)
+        ranked = []
+        for candidate, overlap in shared.items():
+            distance = edit_distance(name.lower(), candidate)
+            if distance <= limit:
+                similarity = overlap / len(query_grams | trigrams(candidate))
+                ranked.append((distance, -similarity, self.names[candidate]))
+        ranked.sort()
+        return ranked
+
+
+def _pick_unique(ranked: List[Tuple[int, float, str]]) -> Optional[str]:
+    """Best candidate only if it is strictly better than the runner-up"""
+    if not ranked:
+        return None
+    if len(ranked) > 1 and ranked[0][:2] == ranked[1][:2]:
+        return None
+    return ranked[0][2]
+
+
+class SQLRepairer:
+    """Repairs unknown identifiers in SQL using the schema catalog"""
+
+    def __init__(self, catalog: SchemaCatalog):
+        self.catalog = catalog
+        self._table_index: Optional[IdentifierIndex] = None
+        self._column_indexes: Dict[str, IdentifierIndex] = {}
+        self._catalog_version: Optional[str] = None
+
+    def _ensure_indexes(self):
+        if self._catalog_version != self.catalog.version:
+            self._table_index = IdentifierIndex(self.catalog.table_names())
+            self._column_indexes = {}
+            self._catalog_version = self.catalog.version
+
+    def _column_index(self, table_name: str) -> IdentifierIndex:
+        key = table_name.lower()
+        if key not in self._column_indexes:
+            self._column_indexes[key] = IdentifierIndex(self.catalog.column_names(table_name))
+        return self._column_indexes[key]
+
+    def _related_aliases(self, table_name: str, aliases: Dict[str, str], column: str) -> List[str]:
+        """Aliases of FK-related tables in the query that actually have the column"""
+        related = {name.lower() for name in self.catalog.get_relationships(table_name)}
+        return [
+            alias for alias, other in aliases.items()
+            if other.lower() in related and self.catalog.has_column(other, column)
+        ]
+
+    def _fix_column(self, ref: Dict[str, Any], aliases: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """Find an unambiguous fix for one invalid column reference"""
+        column = ref["column"]
+        tables = ref["tables"]
+
+        ranked: List[Tuple[int, float, str]] = []
+        owner: Dict[str, str] = {}
+        for table in tables:
+            for candidate in self._column_index(table).candidates(column):
+                ranked.append(candidate)
+                owner.setdefault(candidate[2], table)
+        ranked.sort()
+        # The same column name on several in-scope tables is one candidate, not a tie
+        seen: Set[str] = set()
+        ranked = [c for c in ranked if not (c[2] in seen or seen.add(c[2]))]
+        replacement = _pick_unique(ranked)
+
+        # FK-aware hint: the column exists verbatim on a related table joined into the query
+        if ref["qualifier"] and len(tables) == 1:
+            related = self._related_aliases(tables[0], aliases, column)
+            if len(related) == 1 and (replacement is None or ranked[0][0] > 1):
+                return {
+                    "kind": "requalify",
+                    "qualifier": ref["qualifier"],
+                    "column": column,
+                    "new_qualifier": related[0],
+                    "new_column": self.catalog.get_column(aliases[related[0]], column)["name"]
+                }
+
+        if replacement is None:
+            return None
+        return {
+            "kind": "column",
+            "qualifier": ref["qualifier"],
+            "column": column,
+            "new_qualifier": ref["qualifier"],
+            "new_column": replacement,
+            "table": owner.get(replacement, "")
+        }
+
+    def repair(self, sql_query: str) -> Dict[str, Any]:
+        """
+        Attempt to repair invalid identifiers
+
+        Returns:
+            Dictionary with repaired_sql (None when not repairable), repairs
+            (list of applied fixes) and ambiguous (identifiers with no unique fix).
+        """
+        result = {"repaired_sql": None, "repairs": [], "ambiguous": []}
+        self._ensure_indexes()
+
+        try:
+            tree = sqlglot.parse_one(sql_query, read=SQL_DIALECT)
+            refs = self.catalog.resolve_references(sql_query)
+        except SqlglotError as e:
+            result["ambiguous"].append(f"unparseable: {e}")
+            return result
+
+        # Pass 1: table names
+        for table_name in refs["invalid_tables"]:
+            replacement = _pick_unique(self._table_index.candidates(table_name))
+            if replacement is None:
+                result["ambiguous"].append(table_name)
+                continue
+            for node in tree.find_all(exp.Table):
+                if node.name.lower() == table_name.lower():
+                    node.set("this", exp.to_identifier(replacement, quoted=node.this.quoted))
+            result["repairs"].append({"kind": "table", "from": table_name, "to": replacement})
+
+        if result["ambiguous"]:
+            return result
+
+        # Pass 2: columns (resolved again now that table names are fixed). Only the
+        # nodes that failed resolution are rewritten: the same name may be valid in
+        # another scope of the query
+        try:
+            refs = self.catalog.resolve_references(sql_query, tree=tree)
+        except SqlglotError as e:
+            result["ambiguous"].append(f"unparseable: {e}")
+            return result
+
+        for ref in refs["invalid_columns"]:
+            fix = self._fix_column(ref, ref["aliases"])
+            label = f"{ref['qualifier']}.{ref['column']}" if ref["qualifier"] else ref["column"]
+            if fix is None:
+                if label not in result["ambiguous"]:
+                    result["ambiguous"].append(label)
+                continue
+
+            node = ref["node"]
+            node.set("this", exp.to_identifier(fix["new_column"], quoted=node.this.quoted))
+            if fix["new_qualifier"] != fix["qualifier"]:
+                node.set("table", exp.to_identifier(fix["new_qualifier"]))
+
+            new_label = f"{fix['new_qualifier']}.{fix['new_column']}" if fix["new_qualifier"] else fix["new_column"]
+            repair = {"kind": fix["kind"], "from": label, "to": new_label}
+            if repair not in result["repairs"]:
+                result["repairs"].append(repair)
+
+        if result["ambiguous"] or not result["repairs"]:
+            return result
+
+        repaired_sql = tree.sql(dialect=SQL_DIALECT)
+        is_valid, message = self.catalog.validate_sql(repaired_sql)
+        if not is_valid:
+            result["ambiguous"].append(message)
+            return result
+
+        result["repaired_sql"] = repaired_sql
+        return result
+
+
+async def log_repair(user_query: str, original_sql: str, repair: Dict[str, Any]):
+    """Append a repair attempt to the JSONL analysis log (the file is written off the event loop)"""
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "query": user_query,
+        "original_sql": original_sql,
+        "repaired_sql": repair.get("repaired_sql"),
+        "repairs": repair.get("repairs", []),
+        "ambiguous": repair.get("ambiguous", [])
+    }
+    logger.info(f"SQL repair: {json.dumps(record)}")
+    if not settings.SQL_REPAIR_LOG_PATH:
+        return
+    try:
+        await asyncio.to_thread(_append_log, settings.SQL_REPAIR_LOG_PATH, json.dumps(record))
+    except Exception as e:
+        logger.warning(f"Failed to write SQL repair log: {e}")
+
+
+def _append_log(path: str, line: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+# Shared instance bound to the schema catalog
+sql_repairer = SQLRepairer(schema_catalog)
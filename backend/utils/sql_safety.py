@@ -0,0 +1,123 @@
+"""
+Deterministic SQL safety validation using a parsed syntax tree
+
+Proves that generated MySQL is a single read-only SELECT without running
+an LLM round-trip. MySQL executes the body of /*! ... */ comments (and reads
+/*+ ... */ as optimizer hints) while the parser drops them, so queries with
+such comments are rejected before the tree is inspected. Returns is_safe=None when the query cannot be parsed so
+callers can decide whether to fall back to the LLM check.
+"""
+import logging
+from typing import Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.dialects.dialect import Dialect
+from sqlglot.errors import SqlglotError
+from sqlglot.tokens import TokenType
+
+logger = logging.getLogger(__name__)
+
+SQL_DIALECT = "mysql"
+
+# Statement/expression types that must never appear anywhere in the tree
+FORBIDDEN_EXPRESSIONS = tuple(
+    getattr(exp, name) for name in (
+        "Insert", "Update", "Delete", "Drop", "Create", "AlterTable", "Merge",
+        "Command", "Use", "Set", "Transaction", "Commit", "Rollback", "LoadData",
+        "Kill", "Cache", "Uncache", "Pragma"
+    ) if hasattr(exp, name)
+)
+
+# Functions with side effects, that read server files, or that can stall the server
+SIDE_EFFECT_FUNCTIONS = {
+    "SLEEP", "BENCHMARK", "LOAD_FILE", "GET_LOCK", "RELEASE_LOCK", "RELEASE_ALL_LOCKS",
+    "IS_FREE_LOCK", "IS_USED_LOCK", "LAST_INSERT_ID", "NEXTVAL", "SETVAL",
+    "MASTER_POS_WAIT", "SOURCE_POS_WAIT", "WAIT_FOR_EXECUTED_GTID_SET",
+    "WAIT_UNTIL_SQL_THREAD_AFTER_GTIDS", "SYS_EXEC", "SYS_EVAL"
+}
+
+# Keywords following INTO that write to the server filesystem
+FILE_EXPORT_KEYWORDS = {"OUTFILE", "DUMPFILE"}
+
+
+def _function_name(node: exp.Func) -> str:
+    if isinstance(node, exp.Anonymous):
+        return str(node.name).upper()
+    return node.sql_name().upper()
+
+
+def _contains_executable_comment(tokens: list) -> bool:
+    """Detect /*! ... */ (executed by MySQL) and /*+ ... */ (optimizer hint) comments"""
+    return any(
+        token.token_type == TokenType.HINT or any(comment.startswith(("!", "+")) for comment in token.comments)
+        for token in tokens
+    )
+
+
+def _contains_file_export(tokens: list) -> bool:
+    """Detect INTO OUTFILE / INTO DUMPFILE at token level (the parser rejects these forms)"""
+    for current, following in zip(tokens, tokens[1:]):
+        if current.text.upper() == "INTO" and following.text.upper() in FILE_EXPORT_KEYWORDS:
+            return True
+    return False
+
+
+def parse_single_statement(sql_query: str) -> Tuple[Optional[exp.Expression], str]:
+    """
+    Parse SQL into a syntax tree, requiring exactly one statement
+
+    Returns:
+        Tuple of (tree or None, error message)
+    """
+    statements = [stmt for stmt in sqlglot.parse(sql_query, read=SQL_DIALECT) if stmt is not None]
+    if not statements:
+        return None, "Empty query"
+    if len(statements) > 1:
+        return None, f"Multiple statements are not allowed ({len(statements)} found)"
+    return statements[0], ""
+
+
+def check_read_only_select(sql_query: str) -> Tuple[Optional[bool], str]:
+    """
+    Check that a query is a single, read-only SELECT
+
+    Args:
+        sql_query: SQL query to check
+
+    Returns:
+        Tuple of (is_safe, reason). is_safe is None when the query could not
+        be parsed and the verdict is unknown.
+    """
+    try:
+        tokens = Dialect.get_or_raise(SQL_DIALECT).tokenize(sql_query)
+        if _contains_executable_comment(tokens):
+            return False, "Executable comments (/*! ... */) and optimizer hints (/*+ ... */) are not allowed"
+        if _contains_file_export(tokens):
+            return False, "SELECT ... INTO OUTFILE/DUMPFILE is not allowed"
+
+        tree, error = parse_single_statement(sql_query)
+    except SqlglotError as e:
+        logger.info(f"SQL safety parser could not parse query: {e}")
+        return None, f"Unable to parse query: {e}"
+
+    if tree is None:
+        return False, error
+
+    root = tree.unnest() if isinstance(tree, exp.Subquery) else tree
+    if not isinstance(root, (exp.Select, exp.Union)):
+        return False, f"Only SELECT queries are allowed (found {root.key.upper()})"
+
+    for node, _, _ in tree.walk():
+        if isinstance(node, FORBIDDEN_EXPRESSIONS):
+            return False, f"Query contains a forbidden {node.key.upper()} operation"
+        if isinstance(node, exp.Into):
+            return False, "SELECT ... INTO is not allowed"
+        if isinstance(node, exp.Lock):
+            return False, "Locking clauses (FOR UPDATE / LOCK IN SHARE MODE) are not allowed"
+        if isinstance(node, exp.PropertyEQ):
+            return False, "Variable assignment is not allowed"
+        if isinstance(node, exp.Func) and _function_name(node) in SIDE_EFFECT_FUNCTIONS:
+            return False, f"Function {_function_name(node)} is not allowed"
+
+    return True, "Read-only SELECT verified by syntax tree"
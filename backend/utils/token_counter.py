@@ -0,0 +1,97 @@
+"""
+Token counting with tiktoken
+
+Falls back to a characters-per-token estimate when the tokenizer encoding
+cannot be loaded (tiktoken downloads encodings on first use).
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough average for English text and SQL with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+# Per-message framing overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+# Memoized counts of static prompt text (digest -> count; the text itself is not kept)
+STATIC_COUNT_CACHE_SIZE = 4096
+
+_static_counts: "OrderedDict[Tuple[str, Optional[str]], int]" = OrderedDict()
+_static_counts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: Optional[str]):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens in text for the given model"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_static_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count tokens in text that repeats across requests (schema blocks), memoized
+
+    Keyed by a digest of the text, so only the digest and the count stay in
+    memory. Use count_tokens for per-request text (questions, result rows).
+    """
+    if not text:
+        return 0
+    key = (hashlib.sha1(text.encode("utf-8")).hexdigest(), model)
+    with _static_counts_lock:
+        count = _static_counts.get(key)
+        if count is not None:
+            _static_counts.move_to_end(key)
+            return count
+    count = count_tokens(text, model)
+    with _static_counts_lock:
+        _static_counts[key] = count
+        while len(_static_counts) > STATIC_COUNT_CACHE_SIZE:
+            _static_counts.popitem(last=False)
+    return count
+
+
+def count_message_tokens(messages: List[Dict[str, Any]], model: Optional[str] = None) -> int:
+    """Count prompt tokens for a list of chat messages"""
+    total = 0
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS + count_tokens(str(message.get("content") or ""), model)
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Cut text to at most max_tokens, preferring to end on a line boundary"""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    encoding = _get_encoding(model)
+    if encoding is None:
+        cut = text[:max_tokens * CHARS_PER_TOKEN]
+    else:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+    newline = cut.rfind("\n")
+    if newline > len(cut) // 2:
+        cut = cut[:newline]
+    return cut.rstrip()
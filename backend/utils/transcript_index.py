@@ -0,0 +1,324 @@
+"""
+Pre-built knowledge index over the transcript
+
+Parses the whole transcript once into headings, numbered step blocks and
+definition sentences ("X is ...", "X refers to ...", "What is X? ..."), keyed
+by normalized subject and tagged with the roles they relate to. Step and
+definition lookups are then dictionary / inverted-index hits instead of
+repeated regex scans over a truncated prefix of the document.
+"""
+import re
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple, Any
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = {
+    "a", "an", "the", "to", "of", "for", "in", "on", "and", "or", "how", "what", "is", "are",
+    "do", "does", "i", "we", "you", "can", "me", "my", "our", "please", "show", "tell", "about",
+    "steps", "step", "procedure", "process", "way", "guide", "definition", "define", "meaning", "explain"
+}
+
+# Topic phrases each role is interested in (used for role tagging and role-only lookups)
+ROLE_TOPICS = {
+    "hit-admin": ["help ticket", "hit ticket"],
+    "fms-admin": ["fms workflow", "fms"],
+    "recurring-admin": ["recurring task"],
+}
+
+ROLE_ALIASES = {
+    "hit": "hit-admin", "hit_admin": "hit-admin", "hit-admin": "hit-admin",
+    "fms": "fms-admin", "fms_admin": "fms-admin", "fms-admin": "fms-admin",
+    "recurring": "recurring-admin", "recurring_admin": "recurring-admin", "recurring-admin": "recurring-admin",
+}
+
+# Roles that see every topic
+GENERAL_ROLES = {"executive", "exec", "admin", "manager"}
+
+STEP_LINE = re.compile(r"^(?:\d+[\.\)]|step\s*\d+[:.\-]?|[\-\*•]\s+)\s*(.+)", re.I)
+HEADING_LINE = re.compile(r"^(?:#+\s*(.+)|(.{3,80}):)$")
+DEFINITION_SENTENCE = re.compile(
+    r"^(?:an?\s+|the\s+)?([a-z0-9][a-z0-9 \-/()]{1,60}?)\s+(?:is|are|refers to|means)\s+(.{10,})$", re.I
+)
+WHAT_IS = re.compile(r"what\s+(?:is|are)\s+(?:an?\s+|the\s+)?([a-z0-9][a-z0-9 \-/()]{1,60}?)\s*\?", re.I)
+SENTENCE_SPLIT = re.compile(r"(?<=[\.\?\!])\s+")
+
+
+def _stem(term: str) -> str:
+    return term[:-1] if len(term) > 3 and term.endswith("s") and not term.endswith("ss") else term
+
+
+def terms(text: str) -> List[str]:
+    """Normalized content terms of a phrase"""
+    return [_stem(t) for t in re.findall(r"[a-z0-9]+", (text or "").lower()) if t not in STOPWORDS]
+
+
+def normalize_subject(text: str) -> str:
+    """Canonical dictionary key for a subject phrase"""
+    return " ".join(terms(text))
+
+
+def normalize_role(role: Optional[str]) -> Optional[str]:
+    if not role:
+        return None
+    role_l = role.strip().lower()
+    return ROLE_ALIASES.get(role_l, role_l)
+
+
+def _step_like_sentences(text: str) -> List[str]:
+    """Short imperative sentences from prose that has no explicit numbered list"""
+    candidates = []
+    for sentence in SENTENCE_SPLIT.split(text):
+        sentence = sentence.strip()
+        if 5 < len(sentence) < 50 and re.match(
+            r"^(step\s*\d+|\d+\.|start|first|then|next|finally|to create|click|select|open|navigate)", sentence.lower()
+        ):
+            candidates.append(sentence)
+        elif len(candidates) < 5 and len(sentence) > 20 and sentence[0].isupper() and sentence.endswith("."):
+            candidates.append(sentence)
+    return [
+        re.sub(r"\s+", " ", re.sub(r"^(step\s*\d+[:.\-]?\s*)", "", c, flags=re.I)).strip().rstrip(".")
+        for c in candidates
+    ]
+
+
+class TranscriptIndex:
+    """Headings, step blocks and definitions of the transcript, with an inverted index"""
+
+    def __init__(self):
+        self.source: Optional[str] = None
+        self.signature: Optional[Tuple[float, int]] = None
+        self.sections: List[Dict[str, Any]] = []
+        self.step_blocks: List[Dict[str, Any]] = []
+        self.definitions: Dict[str, Dict[str, Any]] = {}
+        self._step_terms: Dict[str, Set[int]] = defaultdict(set)
+        self._definition_terms: Dict[str, Set[str]] = defaultdict(set)
+        self._section_terms: Dict[str, Set[int]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    # ==================== Build ====================
+
+    @staticmethod
+    def _roles_for(text: str) -> Set[str]:
+        text_l = text.lower()
+        return {role for role, topics in ROLE_TOPICS.items() if any(topic in text_l for topic in topics)}
+
+    def build(self, text: str, source: Optional[str] = None, signature: Optional[Tuple[float, int]] = None):
+        """(Re)build the index from the full transcript text"""
+        sections: List[Dict[str, Any]] = []
+        step_blocks: List[Dict[str, Any]] = []
+        definitions: Dict[str, Dict[str, Any]] = {}
+
+        heading = ""
+        lead = ""
+        current_steps: List[str] = []
+        body_lines: List[str] = []
+
+        def flush_steps():
+            if current_steps:
+                subject = lead or heading
+                step_blocks.append({
+                    "subject": subject,
+                    "heading": heading,
+                    "key": normalize_subject(subject),
+                    "steps": list(current_steps),
+                    "roles": self._roles_for(f"{heading} {subject}")
+                })
+                current_steps.clear()
+
+        def flush_section():
+            if heading or body_lines:
+                sections.append({
+                    "heading": heading,
+                    "text": "\n".join(body_lines).strip(),
+                    "roles": self._roles_for(heading + " " + " ".join(body_lines))
+                })
+            body_lines.clear()
+
+        # Drop generated summary headings (e.g. '### Summary of the Data')
+        text = re.sub(r"###\s*summary of the data", "", text, flags=re.I)
+
+        for raw in text.splitlines():
+            line = raw.strip()
+            if not line:
+                continue
+
+            step_match = STEP_LINE.match(line)
+            if step_match and len(step_match.group(1).strip()) > 3:
+                current_steps.append(step_match.group(1).strip().rstrip("."))
+                body_lines.append(line)
+                continue
+
+            flush_steps()
+            heading_match = HEADING_LINE.match(line)
+            if heading_match and not line.endswith("."):
+                flush_section()
+                heading = (heading_match.group(1) or heading_match.group(2)).strip()
+                lead = heading
+                continue
+
+            body_lines.append(line)
+            # The sentence right before a list usually names the procedure ("To create a help ticket:")
+            lead = line.rstrip(":")
+            for sentence in SENTENCE_SPLIT.split(line):
+                self._add_definition(definitions, sentence, heading)
+
+        flush_steps()
+        flush_section()
+
+        # "What is X? <answer>" pairs across sentence boundaries
+        sentences = SENTENCE_SPLIT.split(re.sub(r"\s+", " ", text))
+        for i, sentence in enumerate(sentences[:-1]):
+            match = WHAT_IS.search(sentence)
+            if match:
+                key = normalize_subject(match.group(1))
+                answer = sentences[i + 1].strip().rstrip(".")
+                if key and answer and key not in definitions:
+                    definitions[key] = {"subject": match.group(1).strip(), "definition": answer, "heading": ""}
+
+        step_terms: Dict[str, Set[int]] = defaultdict(set)
+        for block_id, block in enumerate(step_blocks):
+            for term in set(terms(block["subject"]) + terms(block["heading"])):
+                step_terms[term].add(block_id)
+
+        definition_terms: Dict[str, Set[str]] = defaultdict(set)
+        for key in definitions:
+            for term in key.split():
+                definition_terms[term].add(key)
+
+        section_terms: Dict[str, Set[int]] = defaultdict(set)
+        for section_id, section in enumerate(sections):
+            for term in set(terms(section["heading"])):
+                section_terms[term].add(section_id)
+
+        with self._lock:
+            self.source = source
+            self.signature = signature
+            self.sections = sections
+            self.step_blocks = step_blocks
+            self.definitions = definitions
+            self._step_terms = step_terms
+            self._definition_terms = definition_terms
+            self._section_terms = section_terms
+
+        logger.info(f"Transcript index built: {len(sections)} sections, {len(step_blocks)} step blocks, "
+                    f"{len(definitions)} definitions")
+
+    def _add_definition(self, definitions: Dict[str, Dict[str, Any]], sentence: str, heading: str):
+        sentence = sentence.strip()
+        match = DEFINITION_SENTENCE.match(sentence)
+        if not match:
+            return
+        key = normalize_subject(match.group(1))
+        if key and key not in definitions:
+            definitions[key] = {
+                "subject": match.group(1).strip(),
+                "definition": sentence.rstrip("."),
+                "heading": heading
+            }
+
+    # ==================== Lookup ====================
+
+    def find_steps(self, query: Optional[str] = None, role: Optional[str] = None) -> List[str]:
+        """
+        Best-matching numbered step block for a query (or the role's topics)
+
+        Blocks are scored by subject-term overlap via the inverted index; blocks
+        tagged with the caller's role win ties.
+        """
+        role_key = normalize_role(role)
+        phrases = [query] if query else []
+        if role_key in ROLE_TOPICS:
+            phrases += [f"create {topic}" for topic in ROLE_TOPICS[role_key]]
+        elif role_key in GENERAL_ROLES:
+            phrases += [f"create {topic}" for topics in ROLE_TOPICS.values() for topic in topics]
+
+        with self._lock:
+            for phrase in phrases:
+                query_terms = set(terms(phrase))
+                scores: Dict[int, int] = defaultdict(int)
+                for term in query_terms:
+                    for block_id in self._step_terms.get(term, ()):
+                        scores[block_id] += 1
+                if not scores:
+                    continue
+                best = max(
+                    scores,
+                    key=lambda b: (scores[b], role_key in self.step_blocks[b]["roles"], -b)
+                )
+                # Require most of the phrase's content terms to match
+                if scores[best] * 2 >= len(query_terms):
+                    return list(self.step_blocks[best]["steps"])
+
+            # No numbered list: fall back to step-like sentences of the best matching section
+            for phrase in phrases:
+                query_terms = set(terms(phrase))
+                scores = defaultdict(int)
+                for term in query_terms:
+                    for section_id in self._section_terms.get(term, ()):
+                        scores[section_id] += 1
+                if scores:
+                    best = max(scores, key=lambda s: (scores[s], -s))
+                    if scores[best] * 2 >= len(query_terms):
+                        steps = _step_like_sentences(self.sections[best]["text"])
+                        if steps:
+                            return steps
+        return []
+
+    def find_definition(self, subjects: List[str]) -> str:
+        """Definition sentence for the first subject phrase found (exact key, then best term overlap)"""
+        with self._lock:
+            for subject in subjects:
+                key = normalize_subject(subject)
+                if not key:
+                    continue
+                if key in self.definitions:
+                    return self.definitions[key]["definition"]
+
+                subject_terms = set(key.split())
+                scores: Dict[str, int] = defaultdict(int)
+                for term in subject_terms:
+                    for candidate in self._definition_terms.get(term, ()):
+                        scores[candidate] += 1
+                if scores:
+                    best = max(scores, key=lambda k: (scores[k], -len(k.split())))
+                    if scores[best] == len(subject_terms):
+                        return self.definitions[best]["definition"]
+        return ""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "sections": len(self.sections),
+            "step_blocks": len(self.step_blocks),
+            "definitions": len(self.definitions)
+        }
+
+
+# Shared index for settings.TRANSCRIPT_PATH (plus any explicitly requested paths)
+_indexes: Dict[str, TranscriptIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_transcript_index(transcript_path: Optional[str] = None, rebuild: bool = False) -> TranscriptIndex:
+    """
+    Get the index for a transcript, building it on first use or when the file changed
+
+    Args:
+        transcript_path: Optional path override (defaults to settings.TRANSCRIPT_PATH)
+        rebuild: Force a rebuild (e.g., at startup or after re-indexing)
+    """
+    from backend.utils.prompts import read_transcript, transcript_signature
+
+    path = transcript_path or settings.TRANSCRIPT_PATH
+    signature = transcript_signature(path)
+    with _indexes_lock:
+        index = _indexes.setdefault(path, TranscriptIndex())
+        if rebuild or index.signature != signature or index.source is None:
+            text = read_transcript(path, max_chars=10 ** 9) if signature else ""
+            index.build(text, source=path, signature=signature)
+    return index
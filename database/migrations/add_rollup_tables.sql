@@ -0,0 +1,96 @@
+-- Migration: Add Rollup Summary Tables
+-- Description: Precomputed aggregates for the hot dashboard query families (ticket status
+--              breakdowns, FMS running vs deleted counts, recurring task completion).
+--              Maintained by backend/services/rollup_service.py; generated SQL that
+--              matches a rollup is answered from it instead of the base table.
+-- Created: 2026-10-18
+--
+-- Each rollup holds one row per distinct combination of its dimension columns with
+-- row_count (COUNT(*)) and SUM() measures. Columns must stay in sync with ROLLUPS in
+-- rollup_service.py. Build them once after running this migration:
+--     python backend/scripts/refresh_rollups.py --full
+
+-- --------------------------------------------------------
+-- Table structure for table `rollup_hit_ticket_status`
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `rollup_hit_ticket_status` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  `user_id` INT NOT NULL COMMENT 'Ticket creator (refresh partition key)',
+  `helping_person_id` INT NOT NULL COMMENT 'Ticket assignee',
+  `hdepartment_id` INT NOT NULL,
+  `status` VARCHAR(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  `is_inprogress` TINYINT NOT NULL,
+  `done_status` INT DEFAULT NULL,
+  `not_done_status` TINYINT DEFAULT NULL,
+  `hold_status` INT DEFAULT NULL,
+  `archive` TINYINT(1) NOT NULL,
+  `row_count` BIGINT UNSIGNED NOT NULL COMMENT 'Number of hit_tickets rows in this group',
+  `total_hours` DOUBLE NOT NULL DEFAULT 0 COMMENT 'SUM(hit_tickets.hours)',
+  INDEX `idx_user_id` (`user_id`),
+  INDEX `idx_helping_person_id` (`helping_person_id`),
+  INDEX `idx_hdepartment_id` (`hdepartment_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Rollup of hit_tickets by assignment and status columns';
+
+-- --------------------------------------------------------
+-- Table structure for table `rollup_fms_master_status`
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `rollup_fms_master_status` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  `created_by` BIGINT NOT NULL COMMENT 'Refresh partition key',
+  `organization_id` BIGINT DEFAULT NULL,
+  `process_coordinator_id` BIGINT DEFAULT NULL,
+  `status` TINYINT DEFAULT NULL,
+  `deleted_at_is_null` TINYINT(1) NOT NULL COMMENT 'fms_masters.deleted_at IS NULL',
+  `row_count` BIGINT UNSIGNED NOT NULL COMMENT 'Number of fms_masters rows in this group',
+  INDEX `idx_created_by` (`created_by`),
+  INDEX `idx_process_coordinator_id` (`process_coordinator_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+COMMENT='Rollup of fms_masters by status and soft-delete state';
+
+-- --------------------------------------------------------
+-- Table structure for table `rollup_recurring_task_completion`
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `rollup_recurring_task_completion` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  `user_id` BIGINT UNSIGNED NOT NULL COMMENT 'Assignee (refresh partition key)',
+  `reviewer_status` TINYINT DEFAULT NULL,
+  `completed_at_is_null` TINYINT(1) NOT NULL COMMENT 'recurring_task_trackings.completed_at IS NULL',
+  `not_done_at_is_null` TINYINT(1) NOT NULL COMMENT 'recurring_task_trackings.not_done_at IS NULL',
+  `row_count` BIGINT UNSIGNED NOT NULL COMMENT 'Number of recurring_task_trackings rows in this group',
+  `total_rework_count` BIGINT NOT NULL DEFAULT 0 COMMENT 'SUM(recurring_task_trackings.rework_count)',
+  INDEX `idx_user_id` (`user_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Rollup of recurring_task_trackings by completion state';
+
+-- --------------------------------------------------------
+-- Table structure for table `rollup_refresh_state`
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `rollup_refresh_state` (
+  `rollup_name` VARCHAR(64) NOT NULL PRIMARY KEY,
+  `source_table` VARCHAR(64) NOT NULL,
+  `high_watermark` TIMESTAMP NULL DEFAULT NULL COMMENT 'MAX(updated_at) of the source table at the last refresh',
+  `refreshed_at` TIMESTAMP NULL DEFAULT NULL COMMENT 'Source data is reflected as of this time',
+  `last_full_refresh_at` TIMESTAMP NULL DEFAULT NULL,
+  `row_count` BIGINT UNSIGNED NOT NULL DEFAULT 0 COMMENT 'Rows in the rollup table',
+  `refresh_ms` FLOAT DEFAULT NULL COMMENT 'Duration of the last refresh',
+  `updated_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Refresh bookkeeping and freshness of the rollup tables';
+
+-- --------------------------------------------------------
+-- Indexes for incremental refresh
+-- --------------------------------------------------------
+
+-- Changed rows are found by updated_at on every refresh
+CREATE INDEX `idx_updated_at` ON `hit_tickets` (`updated_at`);
+CREATE INDEX `idx_updated_at` ON `fms_masters` (`updated_at`);
+CREATE INDEX `idx_updated_at` ON `recurring_task_trackings` (`updated_at`);
+
+-- Changed partitions are recomputed by their partition key
+CREATE INDEX `idx_user_id` ON `hit_tickets` (`user_id`);
+CREATE INDEX `idx_user_id` ON `recurring_task_trackings` (`user_id`);